@@ -2,6 +2,10 @@
 ASGI config for biometric_leads project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI worker so the notification stream holds no thread per
+connection, e.g.::
+
+    gunicorn biometric_leads.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biometric_leads.settings')
 
 application = get_asgi_application()
+
+# Load the in-memory search indexes in the background, off the request path
+from leads.autocomplete import ModelBackedIndex  # noqa: E402
+
+ModelBackedIndex.start_all()
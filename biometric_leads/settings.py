@@ -155,6 +155,56 @@ STATICFILES_DIRS = [
     BASE_DIR / 'leads' / 'static',
 ]
 
+# Search index backend: 'fts5', 'orm' or 'auto' (FTS5 when the database supports it)
+SEARCH_INDEX_BACKEND = 'auto'
+
+# Upper bound in seconds on how long cached search filter suggestions are kept
+FILTER_SUGGESTIONS_TIMEOUT = 3600
+
+# In-process cache of search result ids: maximum entries and lifetime in seconds
+SEARCH_RESULT_CACHE_SIZE = 256
+SEARCH_RESULT_CACHE_TIMEOUT = 300
+
+# Seconds between background reloads of the in-memory typeahead and fuzzy
+# indexes, which pick up other processes' writes (0 builds them only once)
+AUTOCOMPLETE_INDEX_TTL = 600
+
+# Typo-tolerant search: minimum trigram similarity and maximum number of ranked matches
+FUZZY_SEARCH_THRESHOLD = 0.3
+FUZZY_SEARCH_LIMIT = 200
+
+# Seconds a user's unread notification count stays cached
+UNREAD_COUNT_CACHE_TIMEOUT = 300
+
+# Notification stream: seconds between keepalive comments, and client
+# reconnection delays (ms) under ASGI and under WSGI, where the stream
+# degrades to one event per connection
+NOTIFICATION_STREAM_KEEPALIVE = 25
+NOTIFICATION_STREAM_RETRY = 5000
+NOTIFICATION_STREAM_WSGI_RETRY = 30000
+
+# Days read notifications stay in the hot table before archive_notifications
+# moves them to the archive, per type (None keeps a type forever), and days
+# archived notifications are kept (None keeps them forever)
+NOTIFICATION_RETENTION_DEFAULT_DAYS = 90
+NOTIFICATION_RETENTION_DAYS = {
+    'weekly_report': 30,
+    'system_alert': 30,
+}
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = None
+
+# Seconds within which repeated notifications of a type for the same user
+# are merged into one unread aggregate row, and the most related objects
+# such a row lists
+NOTIFICATION_COALESCE_WINDOWS = {
+    'lead_status_change': 600,
+    'biometric_status_change': 600,
+}
+NOTIFICATION_COALESCE_MAX_RELATED = 50
+
+# Rows fetched per database round trip by streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
 # Message storage backend
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
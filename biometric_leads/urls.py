@@ -37,8 +37,10 @@ urlpatterns = [
     path('lead/create/', views.create_lead, name='create_lead'),
     path('lead/update-status/<int:lead_id>/<str:new_status>/', 
          views.update_lead_status, name='update_lead_status'),
+    path('lead/bulk-status/', views.bulk_update_lead_status, name='bulk_update_lead_status'),
     path('lead/history/', views.lead_history, name='lead_history'),
     path('lead/<int:lead_id>/', views.lead_detail, name='lead_detail'),
+    path('lead/phone-lookup/', views.lead_phone_lookup, name='lead_phone_lookup'),
     
     # Biometric Management URLs
     path('biometric/process/<int:biometric_id>/<str:action>/', 
@@ -50,8 +52,11 @@ urlpatterns = [
     # Notification URLs
     path('notifications/', views.notifications_list, name='notifications_list'),
     path('notifications/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/broadcast/mark-read/<int:broadcast_id>/', views.mark_broadcast_read, name='mark_broadcast_read'),
     path('notifications/mark-all-read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
     path('notifications/unread-count/', views.get_unread_notifications_count, name='unread_notifications_count'),
+    path('notifications/archive/', views.notification_archive, name='notification_archive'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     
     # User Profile and Account Management URLs
     path('accounts/profile/', views.user_profile, name='user_profile'),
@@ -60,6 +65,10 @@ urlpatterns = [
     
     # Search and Utility URLs
     path('search/', views.global_search, name='global_search'),
+    path('search/export/', views.search_export, name='search_export'),
+    path('export/<str:model_key>/', views.record_export, name='record_export'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
+    path('search/cache-stats/', views.search_cache_stats, name='search_cache_stats'),
     
     # Password Reset URLs
     path('password_reset/', 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biometric_leads.settings')
 
 application = get_wsgi_application()
+
+# Load the in-memory search indexes in the background, off the request path
+from leads.autocomplete import ModelBackedIndex  # noqa: E402
+
+ModelBackedIndex.start_all()
@@ -1,27 +1,52 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.db.models import Count
 from django.utils.html import format_html
+from django.utils import timezone
 from import_export.admin import ImportExportModelAdmin
-from import_export import resources
 
-from .models import Lead, Biometric
+from .forms import LeadImportForm
+from .imports import IMPORT_COLUMNS, LeadImporter, import_format, read_rows
+from .models import Lead, Biometric, BroadcastNotification
+from .resources import LeadResource, BiometricResource, export_columns, export_rows
+from .streaming import streaming_export_response
+from .transitions import bulk_transition_leads
 
-# Resources for Import/Export functionality
-class LeadResource(resources.ModelResource):
-    class Meta:
-        model = Lead
-        fields = ('id', 'name', 'email', 'location', 'status', 'created_at')
+class StreamingExportMixin:
+    """
+    Admin actions exporting the selected rows as a streamed download
 
-class BiometricResource(resources.ModelResource):
-    class Meta:
-        model = Biometric
-        fields = ('id', 'user__username', 'name', 'location', 'status', 'created_at')
+    Unlike the import-export Export button, rows are written as they are read
+    instead of being collected into a Dataset first.
+    """
+    actions = ('export_csv_stream', 'export_ndjson_stream')
+
+    def stream_export(self, queryset, export_format):
+        model_key = self.model._meta.model_name
+        # Drop the changelist annotations so rows are read without a GROUP BY
+        queryset = self.model.objects.filter(pk__in=queryset.values('pk'))
+        return streaming_export_response(
+            export_rows(model_key, queryset),
+            export_format,
+            f"{model_key}-export-{timezone.now():%Y%m%d-%H%M%S}",
+            columns=export_columns(model_key)
+        )
+
+    @admin.action(description='Stream selected rows as CSV')
+    def export_csv_stream(self, request, queryset):
+        return self.stream_export(queryset, 'csv')
+
+    @admin.action(description='Stream selected rows as JSON lines')
+    def export_ndjson_stream(self, request, queryset):
+        return self.stream_export(queryset, 'ndjson')
 
 # Custom Admin Classes
 @admin.register(Lead)
-class LeadAdmin(ImportExportModelAdmin):
+class LeadAdmin(StreamingExportMixin, ImportExportModelAdmin):
     resource_class = LeadResource
     
     list_display = (
@@ -33,6 +58,8 @@ class LeadAdmin(ImportExportModelAdmin):
     list_editable = ('status',)
     list_per_page = 20
     date_hierarchy = 'created_at'
+    actions = StreamingExportMixin.actions + ('mark_in_progress', 'mark_approved', 'mark_rejected')
+    change_list_template = 'admin/leads/lead/change_list.html'
     
     def status_color(self, obj):
         color_map = {
@@ -57,8 +84,63 @@ class LeadAdmin(ImportExportModelAdmin):
         return obj.total_biometrics
     total_biometrics_count.short_description = 'Total Biometrics'
 
+    def move_leads(self, request, queryset, status):
+        updated = bulk_transition_leads(queryset, status)
+        skipped = queryset.count() - updated
+        self.message_user(
+            request,
+            f'{updated} lead(s) moved to {dict(Lead.STATUS_CHOICES)[status]}'
+            + (f', {skipped} skipped' if skipped else ''),
+            messages.SUCCESS
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                'bulk-import/',
+                self.admin_site.admin_view(self.bulk_import_view),
+                name='leads_lead_bulk_import'
+            ),
+        ] + super().get_urls()
+
+    def bulk_import_view(self, request):
+        """
+        Upload a CSV or XLSX file into the bulk import engine
+        """
+        if not self.has_add_permission(request):
+            return redirect('admin:leads_lead_changelist')
+
+        form = LeadImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            result = LeadImporter(user=request.user).run(read_rows(upload.file, import_format(upload.name)))
+            for line, error in result.errors[:10]:
+                self.message_user(request, f'Line {line}: {error}', messages.WARNING)
+            self.message_user(request, result.summary(), messages.SUCCESS)
+            return redirect('admin:leads_lead_changelist')
+
+        return TemplateResponse(request, 'admin/leads/lead/bulk_import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Bulk import leads',
+            'form': form,
+            'columns': IMPORT_COLUMNS,
+        })
+
+    @admin.action(description='Mark selected leads as In Progress')
+    def mark_in_progress(self, request, queryset):
+        self.move_leads(request, queryset, 'in_progress')
+
+    @admin.action(description='Mark selected leads as Approved')
+    def mark_approved(self, request, queryset):
+        self.move_leads(request, queryset, 'approved')
+
+    @admin.action(description='Mark selected leads as Rejected')
+    def mark_rejected(self, request, queryset):
+        self.move_leads(request, queryset, 'rejected')
+
 @admin.register(Biometric)
-class BiometricAdmin(ImportExportModelAdmin):
+class BiometricAdmin(StreamingExportMixin, ImportExportModelAdmin):
     resource_class = BiometricResource
     
     list_display = (
@@ -94,6 +176,15 @@ class UserProfileInline(admin.StackedInline):
     def has_add_permission(self, request, obj=None):
         return False
 
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    """
+    Send announcements to every user as a single broadcast row
+    """
+    list_display = ('type', 'message', 'created_at')
+    list_filter = ('type',)
+    search_fields = ('message',)
+
 class CustomUserAdmin(BaseUserAdmin):
     inlines = [UserProfileInline]
     list_display = (
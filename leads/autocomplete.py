@@ -0,0 +1,309 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# (model key, field) pairs offered as typeahead suggestions
+SUGGESTION_FIELDS = {
+    'lead': ('name', 'email', 'location'),
+    'biometric': ('name',),
+}
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over distinct (term, source, field) entries
+
+    Entries are kept in a sorted list keyed by the lowercased term, so a
+    prefix query is a binary search followed by a short forward scan. A
+    reference count per entry lets rows that share a value be added and
+    removed independently; add_row() remembers a row's entries so saving the
+    same row again replaces them instead of counting them twice.
+    """
+    def __init__(self):
+        self._entries = []
+        self._refcounts = {}
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(value, source, field):
+        return (value.lower(), value, source, field)
+
+    def add(self, value, source, field):
+        with self._lock:
+            self._add(value, source, field)
+
+    def remove(self, value, source, field):
+        with self._lock:
+            self._remove(value, source, field)
+
+    def add_row(self, key, triples):
+        """
+        Index a row's (value, source, field) triples under key, replacing its previous ones
+        """
+        triples = [triple for triple in triples if triple[0]]
+        with self._lock:
+            for triple in self._rows.pop(key, ()):
+                self._remove(*triple)
+            for triple in triples:
+                self._add(*triple)
+            if triples:
+                self._rows[key] = triples
+
+    def remove_row(self, key):
+        with self._lock:
+            for triple in self._rows.pop(key, ()):
+                self._remove(*triple)
+
+    def _add(self, value, source, field):
+        if not value:
+            return
+        entry = self._entry(value, source, field)
+        if entry in self._refcounts:
+            self._refcounts[entry] += 1
+        else:
+            self._refcounts[entry] = 1
+            insort(self._entries, entry)
+
+    def _remove(self, value, source, field):
+        if not value:
+            return
+        entry = self._entry(value, source, field)
+        count = self._refcounts.get(entry)
+        if count is None:
+            return
+        if count > 1:
+            self._refcounts[entry] = count - 1
+            return
+        del self._refcounts[entry]
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def load(self, rows):
+        """
+        Replace the contents with (key, [(value, source, field), ...]) rows
+        """
+        refcounts, row_triples = {}, {}
+        for key, triples in rows:
+            triples = [triple for triple in triples if triple[0]]
+            if not triples:
+                continue
+            row_triples[key] = triples
+            for triple in triples:
+                entry = self._entry(*triple)
+                refcounts[entry] = refcounts.get(entry, 0) + 1
+        with self._lock:
+            self._refcounts = refcounts
+            self._rows = row_triples
+            self._entries = sorted(refcounts)
+
+    def search(self, prefix, limit=10):
+        """
+        Return up to ``limit`` entries whose term starts with the prefix
+        """
+        prefix = prefix.lower()
+        results = []
+        with self._lock:
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(results) < limit:
+                term, value, source, field = self._entries[position]
+                if not term.startswith(prefix):
+                    break
+                results.append({'value': value, 'source': source, 'field': field})
+                position += 1
+        return results
+
+
+class ModelBackedIndex(ABC):
+    """
+    Process-wide in-memory index loaded from the database
+
+    The index is built in a background thread when a server process starts
+    (see start_all()) and then kept current by record_save()/record_delete(),
+    which the model signals call. Searches never build it: until the first
+    build finishes they find nothing. Every AUTOCOMPLETE_INDEX_TTL seconds
+    the thread builds a fresh copy and swaps it in, so writes made by other
+    processes eventually become visible.
+
+    Rows saved or deleted while a build is reading the tables are logged and
+    replayed on the new index when it is swapped in, so they are not lost
+    with the copy being replaced. Rows are indexed by (model key, id), which
+    makes replaying a change the build already saw harmless.
+    """
+    instances = []
+
+    def __init__(self):
+        self.built_at = None
+        self.index = None
+        self._build_lock = threading.Lock()
+        self._changes_lock = threading.Lock()
+        # Changes recorded during a build, None when no build is running
+        self._changes = None
+        self._thread = None
+        ModelBackedIndex.instances.append(self)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTOCOMPLETE_INDEX_TTL', 600)
+
+    def is_built(self):
+        return self.built_at is not None
+
+    @abstractmethod
+    def build(self, chunk_size=2000):
+        """
+        Load a complete index from the database and return it
+        """
+
+    @abstractmethod
+    def save_row(self, index, key, values):
+        """
+        Index the {field: value} of the row (model key, id) in an index, replacing its previous values
+        """
+
+    @abstractmethod
+    def delete_row(self, index, key):
+        """
+        Remove the row (model key, id) from an index
+        """
+
+    def refresh(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def ensure_built(self):
+        """
+        Build the index in the calling thread unless it has been built already
+        """
+        if not self.is_built():
+            with self._build_lock:
+                if not self.is_built():
+                    self._rebuild()
+
+    def _rebuild(self):
+        with self._changes_lock:
+            self._changes = []
+        try:
+            index = self.build()
+        except BaseException:
+            with self._changes_lock:
+                self._changes = None
+            raise
+        with self._changes_lock:
+            # Rows written while the tables were read may be missing from the new copy
+            for change, args in self._changes:
+                change(index, *args)
+            self._changes = None
+            self.index = index
+            self.built_at = time.monotonic()
+
+    def record_save(self, source, instance):
+        """
+        Index the current values of a saved row
+        """
+        values = {field: getattr(instance, field) for field in SUGGESTION_FIELDS[source]}
+        self._record(self.save_row, (source, instance.pk), values)
+
+    def record_delete(self, source, instance):
+        self._record(self.delete_row, (source, instance.pk))
+
+    def _record(self, change, *args):
+        with self._changes_lock:
+            if self._changes is not None:
+                self._changes.append((change, args))
+            if self.is_built():
+                change(self.index, *args)
+
+    def start(self):
+        """
+        Build the index in a daemon thread, then refresh it every ttl seconds
+        """
+        with self._build_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f'{type(self).__name__}-builder', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('Building %s failed', type(self).__name__)
+            finally:
+                # The thread's connection must not stay open between refreshes
+                connection.close()
+            if not self.ttl:
+                return
+            time.sleep(self.ttl)
+
+    @classmethod
+    def start_all(cls):
+        """
+        Start building every index in the background; called by the WSGI and ASGI entry points
+        """
+        for index in cls.instances:
+            index.start()
+
+    def reset(self):
+        self.built_at = None
+
+    @staticmethod
+    def rows(chunk_size=2000):
+        """
+        Stream (source, pk, {field: value}) for every row covered by SUGGESTION_FIELDS
+        """
+        from .search_index import get_model
+
+        for source, fields in SUGGESTION_FIELDS.items():
+            rows = get_model(source).objects.order_by().values_list('id', *fields)
+            for row in rows.iterator(chunk_size=chunk_size):
+                yield source, row[0], dict(zip(fields, row[1:]))
+
+
+class SuggestionIndex(ModelBackedIndex):
+    """
+    Typeahead index over the values in SUGGESTION_FIELDS
+    """
+    def __init__(self):
+        super().__init__()
+        self.index = PrefixIndex()
+
+    def build(self, chunk_size=2000):
+        index = PrefixIndex()
+        index.load(
+            ((source, pk), self.triples(source, values))
+            for source, pk, values in self.rows(chunk_size)
+        )
+        return index
+
+    @staticmethod
+    def triples(source, values):
+        return [(value, source, field) for field, value in values.items()]
+
+    def reset(self):
+        super().reset()
+        self.index = PrefixIndex()
+
+    def search(self, prefix, limit=10):
+        return self.index.search(prefix, limit)
+
+    def save_row(self, index, key, values):
+        index.add_row(key, self.triples(key[0], values))
+
+    def delete_row(self, index, key):
+        index.remove_row(key)
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class VersionedCache:
+    """
+    Two-level cache with an in-process LRU in front of the Django cache backend
+
+    Every entry is stored under the namespace's current version, which lives
+    in the Django cache so all processes share it. Bumping the version makes
+    every older entry unreachable in both levels at once.
+    """
+    def __init__(self, namespace, maxsize=128, timeout=None):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f'leads:{self.namespace}:version'
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Seed from the clock so an evicted version never repeats an old one
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, time.time_ns(), timeout=None)
+
+    def _cache_key(self, key, version):
+        return f'leads:{self.namespace}:{version}:{key}'
+
+    def peek(self, key):
+        """
+        Return the cached value without computing it, or None
+        """
+        cache_key = self._cache_key(key, self.version())
+        with self._lock:
+            entry = self._local.get(cache_key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._local.move_to_end(cache_key)
+                return entry[0]
+        value = cache.get(cache_key)
+        if value is not None:
+            self._remember(cache_key, value)
+        return value
+
+    def get(self, key, compute):
+        """
+        Return the cached value for key, computing and storing it on a miss
+        """
+        value = self.peek(key)
+        if value is None:
+            value = compute()
+            cache_key = self._cache_key(key, self.version())
+            cache.set(cache_key, value, timeout=self.timeout)
+            self._remember(cache_key, value)
+        return value
+
+    def _remember(self, cache_key, value):
+        expires = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._local[cache_key] = (value, expires)
+            self._local.move_to_end(cache_key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+
+# Distinct location values offered as search filters, one namespace per model
+location_suggestions = {
+    model_key: VersionedCache(
+        f'{model_key}_locations',
+        timeout=getattr(settings, 'FILTER_SUGGESTIONS_TIMEOUT', 3600)
+    )
+    for model_key in ('lead', 'biometric')
+}
+
+
+def get_location_suggestions(model_key):
+    """
+    Distinct locations for a model, served from cache when possible
+    """
+    from .search_index import get_model
+
+    def compute():
+        return list(
+            get_model(model_key).objects.order_by('location').values_list('location', flat=True).distinct()
+        )
+
+    # Hand out a copy so callers cannot mutate the shared cached list
+    return list(location_suggestions[model_key].get('all', compute))
+
+
+def location_changed(model_key, instance, created):
+    """
+    Invalidate the location suggestions if a save introduced or removed a location value
+    """
+    if created:
+        cached = location_suggestions[model_key].peek('all')
+        if cached is not None and instance.location in cached:
+            return
+    elif 'location' not in instance.changed_fields():
+        return
+    location_suggestions[model_key].invalidate()
+
+
+def generation(model_key):
+    """
+    Current write generation of a model, shared by all processes through the Django cache
+    """
+    key = f'leads:{model_key}:generation'
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump_generation(model_key):
+    """
+    Mark every cached search result involving the model as stale
+
+    The bump is repeated when the surrounding transaction commits, so a
+    search that ran against the old data in between cannot be cached under
+    the new generation.
+    """
+    def bump():
+        try:
+            cache.incr(f'leads:{model_key}:generation')
+        except ValueError:
+            cache.set(f'leads:{model_key}:generation', time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+class SearchResultCache:
+    """
+    Bounded, TTL-limited in-process cache of search results
+
+    Entries hold only the ordered (model key, id) pairs of a search, or the
+    row count of a paginated one, and are
+    keyed on the normalized search parameters together with the generation
+    of every searched model, so any write to one of those models makes the
+    entry unreachable.
+    """
+    def __init__(self, maxsize=256, timeout=300):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @staticmethod
+    def make_key(query, models, filters, mode='exact'):
+        normalized_filters = tuple(sorted(
+            (field, str(value).lower()) for field, value in (filters or {}).items()
+            if value not in (None, '')
+        ))
+        models = tuple(sorted(models))
+        generations = tuple(generation(model_key) for model_key in models)
+        return (mode, (query or '').strip().lower(), models, normalized_filters, generations)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        :param value: Ordered (model key, id) pairs, or a result count
+        """
+        if not isinstance(value, int):
+            value = tuple(value)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'timeout': self.timeout,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+search_result_cache = SearchResultCache(
+    maxsize=getattr(settings, 'SEARCH_RESULT_CACHE_SIZE', 256),
+    timeout=getattr(settings, 'SEARCH_RESULT_CACHE_TIMEOUT', 300)
+)
@@ -0,0 +1,304 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Lead, Biometric, Notification, StatusCounter, BroadcastNotification
+from .caching import bump_generation, generation
+from .pubsub import notification_broker
+
+# Model classes and the field that determines each row's counted status
+COUNTED_MODELS = {
+    'lead': (Lead, 'status'),
+    'biometric': (Biometric, 'status'),
+    'notification': (Notification, 'is_read'),
+}
+
+
+# Above this many per-user counters, adjust() switches to set-based statements
+BULK_ADJUST_THRESHOLD = 10
+
+
+def status_value(model_key, value):
+    """
+    Convert a raw status field value into the status stored on the counter
+    """
+    if model_key == 'notification':
+        return 'read' if value else 'unread'
+    return value
+
+
+def adjust(model_key, deltas):
+    """
+    Apply count deltas for a model
+
+    :param deltas: Mapping of (user_id, status) to the change in row count;
+                   every delta is applied to the global row as well
+    """
+    combined = Counter()
+    for (user_id, status), delta in deltas.items():
+        combined[(None, status)] += delta
+        if user_id is not None:
+            combined[(user_id, status)] += delta
+
+    changes = {key: delta for key, delta in combined.items() if delta}
+    user_changes = {key: delta for key, delta in changes.items() if key[0] is not None}
+    with transaction.atomic():
+        if len(user_changes) > BULK_ADJUST_THRESHOLD:
+            _increment_many(model_key, user_changes)
+            changes = {key: delta for key, delta in changes.items() if key[0] is None}
+        for (user_id, status), delta in changes.items():
+            _increment(model_key, user_id, status, delta)
+
+    if model_key == 'notification':
+        invalidate_unread_counts({user_id for user_id, status in combined if user_id is not None})
+
+
+def _increment(model_key, user_id, status, delta):
+    counter = StatusCounter.objects.filter(user_id=user_id, model_name=model_key, status=status)
+    if counter.update(total=F('total') + delta) or delta < 0:
+        # A decrement without a row means the owner is being deleted; nothing to track
+        return
+    try:
+        with transaction.atomic():
+            StatusCounter.objects.create(user_id=user_id, model_name=model_key, status=status, total=delta)
+    except IntegrityError:
+        # Another writer created the row first
+        counter.update(total=F('total') + delta)
+
+
+def _increment_many(model_key, deltas, batch_size=500):
+    """
+    Apply many per-user deltas with set-based statements
+
+    Missing rows are inserted first (ignoring rows another writer already
+    created), then every (status, delta) group is applied with one UPDATE
+    per batch of users.
+    """
+    StatusCounter.objects.bulk_create(
+        [
+            StatusCounter(user_id=user_id, model_name=model_key, status=status, total=0)
+            for (user_id, status), delta in deltas.items() if delta > 0
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    )
+
+    groups = {}
+    for (user_id, status), delta in deltas.items():
+        groups.setdefault((status, delta), []).append(user_id)
+    for (status, delta), user_ids in groups.items():
+        for i in range(0, len(user_ids), batch_size):
+            StatusCounter.objects.filter(
+                model_name=model_key, status=status, user_id__in=user_ids[i:i + batch_size]
+            ).update(total=F('total') + delta)
+
+
+def record_save(model_key, instance, previous):
+    """
+    Update counters after a single row was saved
+
+    :param previous: Tracked field values before the save, or None for a new row
+    """
+    field = COUNTED_MODELS[model_key][1]
+    deltas = Counter()
+    if previous is not None:
+        deltas[(previous['user_id'], status_value(model_key, previous[field]))] -= 1
+    deltas[(instance.user_id, status_value(model_key, getattr(instance, field)))] += 1
+    adjust(model_key, deltas)
+
+
+def record_delete(model_key, instance):
+    """
+    Update counters after a single row was deleted
+    """
+    previous = getattr(instance, '_loaded_values', None) or {}
+    field = COUNTED_MODELS[model_key][1]
+    status = previous.get(field, getattr(instance, field))
+    user_id = previous.get('user_id', instance.user_id)
+    adjust(model_key, {(user_id, status_value(model_key, status)): -1})
+
+
+def record_bulk_create(model_key, instances):
+    """
+    Update counters for rows inserted with bulk_create, which bypasses save()
+    """
+    field = COUNTED_MODELS[model_key][1]
+    adjust(model_key, Counter(
+        (instance.user_id, status_value(model_key, getattr(instance, field)))
+        for instance in instances
+    ))
+
+
+def record_bulk_delete(model_key, rows):
+    """
+    Update counters for rows removed without post_delete signals
+
+    :param rows: Dictionaries with 'user_id' and the model's counted field
+    """
+    field = COUNTED_MODELS[model_key][1]
+    adjust(model_key, {
+        key: -count for key, count in Counter(
+            (row['user_id'], status_value(model_key, row[field])) for row in rows
+        ).items()
+    })
+
+
+def update_status(queryset, value):
+    """
+    Set the counted status field on every row of a queryset with one UPDATE
+
+    The rows are grouped by owner and old status first so the counters can
+    be moved in the same transaction.
+
+    :return: Number of updated rows
+    """
+    model_key = queryset.model._meta.model_name
+    field = COUNTED_MODELS[model_key][1]
+    new_status = status_value(model_key, value)
+
+    with transaction.atomic():
+        groups = queryset.exclude(**{field: value}).order_by().values('user_id', field).annotate(rows=Count('id'))
+        deltas = Counter()
+        for group in groups:
+            deltas[(group['user_id'], status_value(model_key, group[field]))] -= group['rows']
+            deltas[(group['user_id'], new_status)] += group['rows']
+
+        updated = queryset.exclude(**{field: value}).update(**{field: value})
+        adjust(model_key, deltas)
+
+    # The UPDATE bypasses post_save, so expire cached search results here
+    bump_generation(model_key)
+    return updated
+
+
+def get_counts(model_key, user=None):
+    """
+    Read the counts by status for a model, globally or for one user
+
+    :param user: User instance or id, or None for the global counts
+    :return: Dictionary of status to count, including a 'total' key
+    """
+    rows = StatusCounter.objects.filter(model_name=model_key)
+    if user is None:
+        rows = rows.filter(user__isnull=True)
+    else:
+        rows = rows.filter(user=user)
+
+    counts = {status: total for status, total in rows.values_list('status', 'total')}
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def get_count(model_key, status, user=None):
+    """
+    Read a single status count
+    """
+    return get_counts(model_key, user).get(status, 0)
+
+
+def unread_cache_key(user_id):
+    # Every new broadcast changes everyone's count, so the key follows the broadcast generation
+    return f'leads:unread:{user_id}:{generation("broadcast")}'
+
+
+def unread_count(user):
+    """
+    Number of unread notifications of a user, personal and broadcast
+
+    Read from the Django cache, falling back to the user's counter row and
+    one count over the sparse broadcast read markers, so badge polling never
+    scans the notification table.
+    """
+    return unread_count_for(user.pk)
+
+
+def unread_count_for(user_id):
+    key = unread_cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = max(get_count('notification', 'unread', user_id), 0)
+        count += BroadcastNotification.objects.unread_by(user_id).count()
+        cache.set(key, count, timeout=getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 300))
+    return count
+
+
+def invalidate_unread_counts(user_ids):
+    """
+    Drop cached unread counts; repeated on commit so a read racing the
+    transaction cannot leave the old value cached
+
+    Users with an open notification stream are sent their new count once
+    the change is committed.
+    """
+    user_ids = list(user_ids)
+    keys = [unread_cache_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+
+    def committed():
+        cache.delete_many(keys)
+        for user_id in user_ids:
+            if notification_broker.has_subscribers(user_id):
+                notification_broker.publish(user_id, 'unread_count', {'unread_count': unread_count_for(user_id)})
+
+    cache.delete_many(keys)
+    transaction.on_commit(committed)
+
+
+def actual_counts(model_key):
+    """
+    Aggregate the real counts from the source table
+
+    :return: Mapping of (user_id, status) to count, global rows keyed with user_id None
+    """
+    model, field = COUNTED_MODELS[model_key]
+    counts = Counter()
+    for row in model.objects.order_by().values('user_id', field).annotate(rows=Count('id')):
+        status = status_value(model_key, row[field])
+        counts[(None, status)] += row['rows']
+        if row['user_id'] is not None:
+            counts[(row['user_id'], status)] += row['rows']
+    return counts
+
+
+def reconcile(model_keys=None, dry_run=False):
+    """
+    Compare counters against the source tables and repair any drift
+
+    :return: List of (model_key, user_id, status, stored, actual) for every wrong counter
+    """
+    drift = []
+    for model_key in model_keys or COUNTED_MODELS:
+        with transaction.atomic():
+            actual = actual_counts(model_key)
+            stored = {
+                (row.user_id, row.status): row
+                for row in StatusCounter.objects.select_for_update().filter(model_name=model_key)
+            }
+
+            for key in set(actual) | set(stored):
+                row = stored.get(key)
+                stored_total = row.total if row else 0
+                if stored_total == actual.get(key, 0):
+                    continue
+
+                drift.append((model_key, key[0], key[1], stored_total, actual.get(key, 0)))
+                if dry_run:
+                    continue
+                if row:
+                    row.total = actual.get(key, 0)
+                    row.save(update_fields=['total'])
+                else:
+                    StatusCounter.objects.create(
+                        user_id=key[0], model_name=model_key, status=key[1], total=actual[key]
+                    )
+
+    if not dry_run:
+        invalidate_unread_counts({
+            user_id for model_key, user_id, status, stored, actual in drift
+            if model_key == 'notification' and user_id is not None
+        })
+    return drift
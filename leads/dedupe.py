@@ -0,0 +1,60 @@
+from .models import Lead
+
+
+def email_taken(email, exclude_pk=None):
+    """
+    Whether another lead already has an email, ignoring case
+
+    One probe of the unique index on email_normalized. The placeholder
+    email is never taken.
+
+    :param exclude_pk: Lead being edited, which may keep its own email
+    """
+    key = Lead.unique_email(email)
+    return key is not None and Lead.email_holder_exists(key, exclude_pk=exclude_pk)
+
+
+def taken_emails(emails, batch_size=500):
+    """
+    Normalized forms of the emails that leads already have
+
+    Emails are checked against the unique index with one IN query per batch.
+    """
+    keys = list({key for key in map(Lead.unique_email, emails) if key is not None})
+    taken = set()
+    for start in range(0, len(keys), batch_size):
+        taken.update(
+            Lead.objects.filter(email_normalized__in=keys[start:start + batch_size])
+            .values_list('email_normalized', flat=True)
+        )
+    return taken
+
+
+class EmailDeduplicator:
+    """
+    Splits batches of new leads into unique ones and duplicates
+
+    A lead is a duplicate when its email, ignoring case, belongs to an
+    existing lead or to one accepted from an earlier batch. Each batch
+    costs one IN query per batch_size emails, however large the table.
+    """
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.seen = set()
+
+    def split(self, items, email=lambda item: item['email']):
+        """
+        :param email: Returns the email of an item
+        :return: (unique items, duplicate items)
+        """
+        keys = [Lead.unique_email(email(item)) for item in items]
+        taken = taken_emails([key for key in keys if key not in self.seen], self.batch_size)
+        unique, duplicates = [], []
+        for item, key in zip(items, keys):
+            if key is not None and (key in self.seen or key in taken):
+                duplicates.append(item)
+                continue
+            if key is not None:
+                self.seen.add(key)
+            unique.append(item)
+        return unique, duplicates
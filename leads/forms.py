@@ -1,4 +1,6 @@
 from django import forms
+from .dedupe import email_taken
+from .imports import import_format
 from .models import Lead
 
 class LeadForm(forms.ModelForm):
@@ -17,9 +19,21 @@ class LeadForm(forms.ModelForm):
 
     def clean_email(self):
         """
-        Validate email uniqueness
+        Validate email uniqueness, ignoring case
         """
         email = self.cleaned_data.get('email')
-        if Lead.objects.filter(email=email).exists():
+        if email_taken(email, exclude_pk=self.instance.pk):
             raise forms.ValidationError("A lead with this email already exists.")
         return email
+
+class LeadImportForm(forms.Form):
+    """
+    Upload form of the bulk lead import
+    """
+    file = forms.FileField(help_text='CSV or XLSX file with a header row')
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if import_format(upload.name) is None:
+            raise forms.ValidationError('Upload a .csv or .xlsx file.')
+        return upload
@@ -0,0 +1,175 @@
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from .autocomplete import ModelBackedIndex
+
+WORD_RE = re.compile(r'\w+')
+
+
+def words(value):
+    """
+    Split a value into lowercased words
+    """
+    return WORD_RE.findall((value or '').lower())
+
+
+def indexed_values(values):
+    """
+    Values of a row's suggestion fields as the trigram index stores them
+
+    Emails contribute only their local part: the domain is shared by most
+    leads, so a misspelled domain would otherwise match every one of them.
+    """
+    return [
+        value.partition('@')[0] if field == 'email' and value else value
+        for field, value in values.items()
+    ]
+
+
+def trigrams(word):
+    """
+    Trigrams of a single word, padded like PostgreSQL's pg_trgm
+    """
+    padded = f'  {word} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to the distinct words of the indexed rows
+
+    Postings point at words rather than rows: a query word first collects
+    the vocabulary words sharing at least one trigram with it, scores them
+    by Jaccard similarity, and only then expands the close words to rows.
+    The work therefore scales with the number of candidates, not the table.
+    """
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._word_trigrams = {}
+        self._word_rows = defaultdict(Counter)
+        self._row_words = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._row_words)
+
+    def add(self, key, values):
+        """
+        Index a row's values under key, replacing anything indexed for it before
+        """
+        with self._lock:
+            self._remove(key)
+            row_words = Counter(word for value in values for word in words(value))
+            if not row_words:
+                return
+            self._row_words[key] = row_words
+            for word, occurrences in row_words.items():
+                if word not in self._word_trigrams:
+                    self._word_trigrams[word] = trigrams(word)
+                    for trigram in self._word_trigrams[word]:
+                        self._postings[trigram].add(word)
+                self._word_rows[word][key] += occurrences
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        row_words = self._row_words.pop(key, None)
+        if not row_words:
+            return
+        for word in row_words:
+            rows = self._word_rows[word]
+            del rows[key]
+            if rows:
+                continue
+            # Last row using this word: drop it from the vocabulary
+            del self._word_rows[word]
+            for trigram in self._word_trigrams.pop(word):
+                postings = self._postings[trigram]
+                postings.discard(word)
+                if not postings:
+                    del self._postings[trigram]
+
+    def search(self, query, threshold=0.3, limit=100, where=None):
+        """
+        Rank rows by how closely their words match the words of the query
+
+        A row's score is the mean, over the query words, of the best Jaccard
+        trigram similarity between that query word and any word of the row.
+
+        :param where: Only rank keys for which this returns True
+        :return: List of (key, score) pairs, best first
+        """
+        query_words = words(query)
+        if not query_words:
+            return []
+
+        scores = defaultdict(lambda: [0.0] * len(query_words))
+        with self._lock:
+            for position, query_word in enumerate(query_words):
+                query_trigrams = trigrams(query_word)
+                shared = Counter()
+                for trigram in query_trigrams:
+                    for word in self._postings.get(trigram, ()):
+                        shared[word] += 1
+
+                for word, common in shared.items():
+                    similarity = common / (len(query_trigrams) + len(self._word_trigrams[word]) - common)
+                    if similarity < threshold:
+                        continue
+                    for key in self._word_rows[word]:
+                        if where is not None and not where(key):
+                            continue
+                        row_scores = scores[key]
+                        row_scores[position] = max(row_scores[position], similarity)
+
+        ranked = [
+            (key, sum(row_scores) / len(row_scores))
+            for key, row_scores in scores.items()
+        ]
+        ranked = [(key, score) for key, score in ranked if score >= threshold]
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+class FuzzySearchIndex(ModelBackedIndex):
+    """
+    Typo-tolerant index over Lead name, email and location and Biometric name
+    """
+    def __init__(self):
+        super().__init__()
+        self.index = TrigramIndex()
+
+    @property
+    def threshold(self):
+        return getattr(settings, 'FUZZY_SEARCH_THRESHOLD', 0.3)
+
+    def build(self, chunk_size=2000):
+        index = TrigramIndex()
+        for source, pk, values in self.rows(chunk_size):
+            index.add((source, pk), indexed_values(values))
+        return index
+
+    def reset(self):
+        super().reset()
+        self.index = TrigramIndex()
+
+    def search(self, query, models=None, limit=100):
+        """
+        :return: Ranked list of ((model key, id), score) pairs
+        """
+        where = None if models is None else (lambda key: key[0] in models)
+        return self.index.search(query, threshold=self.threshold, limit=limit, where=where)
+
+    def save_row(self, index, key, values):
+        index.add(key, indexed_values(values))
+
+    def delete_row(self, index, key):
+        index.remove(key)
+
+
+fuzzy_index = FuzzySearchIndex()
@@ -0,0 +1,364 @@
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import django
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .dedupe import EmailDeduplicator
+from .models import Lead, Notification
+from .notifications import absorb, notification_writer
+from .transitions import default_owner_id, open_biometrics, record_bulk_insert
+
+IMPORT_FORMATS = ('csv', 'xlsx')
+
+# Lead columns read from import files; others are ignored
+IMPORT_COLUMNS = ('name', 'email', 'location', 'phone', 'status', 'created_at')
+
+STATUSES = dict(Lead.STATUS_CHOICES)
+
+# Bytes of CSV handed to a validation worker at a time
+BLOCK_SIZE = 1 << 20
+
+
+def import_format(filename):
+    """
+    File format from a file name's extension, or None when unsupported
+    """
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def read_rows(file, file_format='csv'):
+    """
+    Stream the data rows of a CSV or XLSX file as dictionaries keyed by lowercased header
+
+    :param file: Path or binary file object
+    """
+    if file_format == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as handle:
+            yield from read_rows(handle, file_format)
+        return
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = [column.strip().lower() for column in next(reader, [])]
+    for values in reader:
+        if any(values):
+            yield dict(zip(header, values))
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def validate_row(row):
+    """
+    Clean one import row into Lead field values
+
+    Needs no database access, so rows can be validated anywhere.
+
+    :return: (fields, None) for a valid row, (None, error message) otherwise
+    """
+    email = _text(row.get('email'))
+    if not email:
+        return None, 'Email is required'
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, f'Invalid email: {email}'
+
+    status = _text(row.get('status')).lower().replace(' ', '_') or 'new'
+    if status not in STATUSES:
+        return None, f'Unknown status: {status}'
+
+    fields = {
+        'name': _text(row.get('name')) or 'Unknown',
+        'email': email,
+        'location': _text(row.get('location')) or 'Unspecified',
+        'phone': _text(row.get('phone')) or None,
+        'status': status,
+    }
+    for field in ('name', 'email', 'location', 'phone'):
+        max_length = Lead._meta.get_field(field).max_length
+        if fields[field] and len(fields[field]) > max_length:
+            return None, f'{field} is longer than {max_length} characters'
+
+    created_at = row.get('created_at')
+    if created_at and not hasattr(created_at, 'isoformat'):
+        text = _text(created_at)
+        created_at = parse_datetime(text) or parse_date(text)
+        if created_at is None:
+            return None, f'Invalid created_at: {text}'
+    if created_at:
+        if not hasattr(created_at, 'hour'):
+            created_at = datetime.combine(created_at, datetime.min.time())
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        fields['created_at'] = created_at
+    return fields, None
+
+
+def validate_chunk(rows, first_line):
+    """
+    Validate a chunk of rows
+
+    :param first_line: File line number of the first row, for error messages
+    :return: (list of valid field dictionaries, list of (line, error) pairs)
+    """
+    valid, errors = [], []
+    for line, row in enumerate(rows, first_line):
+        fields, error = validate_row(row)
+        if error:
+            errors.append((line, error))
+        else:
+            valid.append(fields)
+    return valid, errors
+
+
+def validated_chunks(rows, chunk_size):
+    """
+    Validate rows chunk by chunk in this process
+
+    :return: Iterator of (valid field dictionaries, (line, error) pairs, row count)
+    """
+    rows = iter(rows)
+    # Line 1 holds the header
+    line = 2
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        valid, errors = validate_chunk(chunk, line)
+        yield valid, errors, len(chunk)
+        line += len(chunk)
+
+
+def csv_blocks(file, block_size=BLOCK_SIZE):
+    """
+    Split a binary CSV file into its header and blocks of whole records
+
+    A block is extended line by line until it holds an even number of quote
+    characters, so it never ends inside a quoted field that spans lines.
+
+    :return: (header columns, iterator of byte blocks)
+    """
+    header = next(csv.reader([file.readline().decode('utf-8-sig')]), [])
+
+    def blocks():
+        while True:
+            block = file.read(block_size)
+            if not block:
+                return
+            block += file.readline()
+            while block.count(b'"') % 2:
+                line = file.readline()
+                if not line:
+                    break
+                block += line
+            yield block
+
+    return [column.strip().lower() for column in header], blocks()
+
+
+def validate_csv_block(block, header):
+    """
+    Parse and validate one block of CSV records; runs in a worker process
+
+    :return: (valid field dictionaries, (row offset, error) pairs, row count)
+    """
+    reader = csv.reader(io.StringIO(block.decode('utf-8'), newline=''))
+    rows = [dict(zip(header, values)) for values in reader if any(values)]
+    valid, errors = validate_chunk(rows, 0)
+    return valid, errors, len(rows)
+
+
+def validate_rows(rows):
+    """
+    Validate rows parsed by the main process; runs in a worker process
+
+    :return: (valid field dictionaries, (row offset, error) pairs, row count)
+    """
+    valid, errors = validate_chunk(rows, 0)
+    return valid, errors, len(rows)
+
+
+def parallel_validated_chunks(file, file_format, workers, chunk_size=1000, block_size=BLOCK_SIZE):
+    """
+    Validate a file in a process pool, yielding results in file order
+
+    CSV files are cut into blocks of whole records that workers both parse
+    and validate. XLSX sheets can only be read sequentially, so the sheet
+    is parsed here and chunks of rows are validated by the workers. At most
+    two tasks per worker are in flight, which bounds memory when the single
+    writer is slower than the validators.
+
+    :return: Iterator of (valid field dictionaries, (line, error) pairs, row count)
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as handle:
+            yield from parallel_validated_chunks(handle, file_format, workers, chunk_size, block_size)
+        return
+
+    if file_format == 'xlsx':
+        rows = iter(read_rows(file, file_format))
+        tasks = ((validate_rows, chunk) for chunk in iter(lambda: list(islice(rows, chunk_size)), []))
+    else:
+        header, blocks = csv_blocks(file, block_size)
+        tasks = ((validate_csv_block, block, header) for block in blocks)
+
+    # Worker processes must not inherit the open database connection
+    connections.close_all()
+    line = 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(*task))
+            if len(pending) >= workers * 2:
+                valid, errors, rows = pending.popleft().result()
+                yield valid, [(line + offset, error) for offset, error in errors], rows
+                line += rows
+        while pending:
+            valid, errors, rows = pending.popleft().result()
+            yield valid, [(line + offset, error) for offset, error in errors], rows
+            line += rows
+
+
+class ImportResult:
+    """
+    Counts and timing of an import run
+    """
+    def __init__(self):
+        self.rows = self.created = self.duplicates = self.invalid = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f'Imported {self.created} leads from {self.rows} rows '
+            f'({self.duplicates} duplicates, {self.invalid} invalid) '
+            f'in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s)'
+        )
+
+
+class LeadImporter:
+    """
+    Bulk lead import: streams rows, validates them in chunks and inserts them with bulk_create
+
+    Emails are deduplicated, ignoring case, with one indexed IN query per
+    chunk plus the emails accepted earlier in the file. Each chunk is written in
+    its own transaction: one bulk_create, the receivers' work applied in
+    bulk, biometrics for approved leads, and the notifications written as
+    one batch on commit, with the chunk's lead_assigned events folded into a
+    single aggregate row.
+    """
+    def __init__(self, user=None, chunk_size=1000, max_errors=100):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.deduplicator = EmailDeduplicator(batch_size=chunk_size)
+
+    def run(self, rows):
+        """
+        Import an iterable of raw row dictionaries, validating them in this process
+
+        :return: ImportResult
+        """
+        return self.run_validated(validated_chunks(rows, self.chunk_size))
+
+    def run_file(self, file, file_format='csv', workers=1, block_size=BLOCK_SIZE):
+        """
+        Import a CSV or XLSX file, parsing and validating it in worker processes when workers > 1
+
+        :return: ImportResult
+        """
+        if workers <= 1:
+            return self.run(read_rows(file, file_format))
+        return self.run_validated(parallel_validated_chunks(file, file_format, workers, self.chunk_size, block_size))
+
+    def run_validated(self, chunks):
+        """
+        Write validated chunks in file order; this process is the only writer
+
+        :param chunks: Iterator of (valid field dictionaries, (line, error) pairs, row count)
+        :return: ImportResult
+        """
+        result = ImportResult()
+        started = time.monotonic()
+
+        for valid, errors, rows in chunks:
+            self.record_errors(result, errors)
+            for start in range(0, len(valid), self.chunk_size):
+                self.write(valid[start:start + self.chunk_size], result)
+            result.rows += rows
+
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def record_errors(self, result, errors):
+        result.invalid += len(errors)
+        result.errors.extend(errors[:max(self.max_errors - len(result.errors), 0)])
+
+    def write(self, rows, result):
+        """
+        Insert one chunk of validated rows, skipping emails already present
+        """
+        rows, duplicates = self.deduplicator.split(rows)
+        result.duplicates += len(duplicates)
+        leads = [Lead(user=self.user, **fields) for fields in rows]
+        if not leads:
+            return
+
+        owner_id = self.user.pk if self.user else default_owner_id()
+        with transaction.atomic():
+            Lead.objects.bulk_create(leads, batch_size=self.chunk_size)
+            record_bulk_insert('lead', leads)
+
+            notifications = []
+            if owner_id:
+                assigned = [
+                    Notification(
+                        user_id=owner_id,
+                        type='lead_assigned',
+                        message=f'New lead assigned: {lead.name}',
+                        lead_id=lead.id
+                    )
+                    for lead in leads
+                ]
+                # One aggregate row per chunk in the coalesced format rather than a row per lead
+                absorb(assigned[0], assigned[1:])
+                notifications.append(assigned[0])
+            approved = [
+                {'id': lead.id, 'user_id': lead.user_id, 'name': lead.name, 'location': lead.location}
+                for lead in leads if lead.status == 'approved'
+            ]
+            if approved:
+                notifications.extend(open_biometrics(approved, owner_id))
+            notification_writer.add_many(notifications)
+        result.created += len(leads)
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from leads.models import Notification
+from leads.retention import archive_notifications, purge_archive, retention_policies
+
+class Command(BaseCommand):
+    help = 'Move read notifications past their retention period into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            choices=sorted(dict(Notification.NOTIFICATION_TYPES)),
+            action='append',
+            help='Notification type to archive (may be repeated, defaults to all)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of notifications moved per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to wait between chunks'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many notifications would be archived'
+        )
+
+    def handle(self, *args, **options):
+        policies = retention_policies()
+        results = archive_notifications(
+            types=options['type'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run']
+        )
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        for notification_type, total in results.items():
+            self.stdout.write(
+                f'{verb} {total} {notification_type} notifications older than {policies[notification_type]} days'
+            )
+
+        if not options['dry_run']:
+            purged = purge_archive(chunk_size=options['chunk_size'])
+            if purged:
+                self.stdout.write(f'Purged {purged} expired archived notifications')
+        self.stdout.write(self.style.SUCCESS(f'{verb} {sum(results.values())} notifications'))
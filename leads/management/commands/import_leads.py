@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from leads.imports import BLOCK_SIZE, IMPORT_FORMATS, LeadImporter, import_format
+
+class Command(BaseCommand):
+    help = 'Bulk import leads from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row')
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            help='File format, detected from the extension by default'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username the imported leads are assigned to'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes parsing and validating the file; inserts stay in this process'
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=BLOCK_SIZE,
+            help='Bytes of CSV handed to a worker at a time'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows validated and inserted per batch'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or import_format(options['path'])
+        if file_format is None:
+            raise CommandError(f'Cannot detect the format of {options["path"]}; pass --format')
+
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Unknown user: {options["user"]}')
+
+        importer = LeadImporter(user=user, chunk_size=options['chunk_size'])
+        try:
+            result = importer.run_file(
+                options['path'], file_format, workers=options['workers'], block_size=options['block_size']
+            )
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}')
+
+        for line, error in result.errors:
+            self.stdout.write(self.style.WARNING(f'Line {line}: {error}'))
+        self.stdout.write(self.style.SUCCESS(result.summary()))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from leads.models import Lead
+from leads.transitions import record_bulk_insert
 from faker import Faker
 import random
 from django.utils import timezone
@@ -31,7 +32,7 @@ class Command(BaseCommand):
         for _ in range(500):
             lead = Lead(
                 name=fake.name(),
-                email=fake.email(),
+                email=fake.unique.email(),
                 location=random.choice(locations),
                 status=random.choice(status_choices),
                 created_at=timezone.now() - timezone.timedelta(
@@ -45,4 +46,7 @@ class Command(BaseCommand):
         # Bulk create leads for efficiency
         Lead.objects.bulk_create(leads_to_create)
         
+        # bulk_create skips save() and post_save, so apply the receivers' work explicitly
+        record_bulk_insert('lead', leads_to_create)
+        
         self.stdout.write(self.style.SUCCESS(f'Successfully created 500 leads'))
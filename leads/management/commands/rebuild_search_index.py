@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from leads.search_index import INDEXED_FIELDS, get_search_index
+
+class Command(BaseCommand):
+    help = 'Build or rebuild the full-text search index in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=sorted(INDEXED_FIELDS),
+            action='append',
+            help='Model to reindex (may be repeated, defaults to all)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows indexed per transaction'
+        )
+
+    def handle(self, *args, **options):
+        search_index = get_search_index()
+        if search_index.name == 'orm':
+            self.stdout.write(self.style.WARNING(
+                'Full-text index is not available on this database; searches use the ORM fallback'
+            ))
+            return
+
+        for model_key in options['model'] or sorted(INDEXED_FIELDS):
+            indexed = search_index.rebuild(model_key, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} {model_key} records'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from leads import counters
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized status counters and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=sorted(counters.COUNTED_MODELS),
+            action='append',
+            help='Model to reconcile (may be repeated, defaults to all)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without changing any counter'
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile(options['model'], dry_run=options['dry_run'])
+
+        for model_key, user_id, status, stored, actual in drift:
+            scope = f'user {user_id}' if user_id is not None else 'global'
+            self.stdout.write(f'{model_key}/{status} ({scope}): stored {stored}, actual {actual}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All counters are accurate'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Found {len(drift)} drifted counters'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(drift)} drifted counters'))
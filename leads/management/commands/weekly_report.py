@@ -0,0 +1,61 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from leads.reports import generate_weekly_reports, generate_weekly_reports_parallel, last_full_week
+
+class Command(BaseCommand):
+    help = 'Create the weekly_report notification of every user for one week'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--week-start',
+            help='Monday of the reported week (YYYY-MM-DD), defaults to the last full week'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes, each handling one user id range'
+        )
+        parser.add_argument(
+            '--user-range',
+            nargs=2,
+            type=int,
+            metavar=('FIRST_ID', 'LAST_ID'),
+            help='Only report on users in this inclusive id range'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of reports inserted per batch'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            week_start = date.fromisoformat(options['week_start']) if options['week_start'] else last_full_week()
+        except ValueError:
+            raise CommandError('--week-start must be a date in YYYY-MM-DD format')
+        if week_start.weekday() != 0:
+            raise CommandError('--week-start must be a Monday')
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            # SQLite allows a single writer, so parallel workers would only wait on each other
+            self.stdout.write(self.style.WARNING('SQLite does not support parallel writers; using one worker'))
+            workers = 1
+
+        started = time.monotonic()
+        if workers > 1 and not options['user_range']:
+            created = generate_weekly_reports_parallel(week_start, workers, chunk_size=options['chunk_size'])
+        else:
+            created = generate_weekly_reports(
+                week_start, user_range=options['user_range'], chunk_size=options['chunk_size']
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} weekly reports for the week of {week_start:%Y-%m-%d} in {elapsed:.1f}s'
+        ))
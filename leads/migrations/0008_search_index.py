@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Mirrors leads.search_index.INDEXED_FIELDS at the time of this migration
+INDEXED_TABLES = {
+    'leads_lead': ('name', 'email', 'phone', 'location'),
+    'leads_biometric': ('name', 'location'),
+    'leads_notification': ('message', 'type'),
+}
+
+
+def fts5_available(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_fts_tables(apps, schema_editor):
+    if not fts5_available(schema_editor):
+        return
+    for table, columns in INDEXED_TABLES.items():
+        column_list = ', '.join(columns)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts "
+            f"USING fts5({column_list}, tokenize='trigram')"
+        )
+        coalesced = ', '.join(f"COALESCE({column}, '')" for column in columns)
+        schema_editor.execute(
+            f"INSERT INTO {table}_fts (rowid, {column_list}) SELECT id, {coalesced} FROM {table}"
+        )
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in INDEXED_TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0007_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
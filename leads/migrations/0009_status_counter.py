@@ -0,0 +1,63 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    StatusCounter = apps.get_model('leads', 'StatusCounter')
+    sources = {
+        'lead': (apps.get_model('leads', 'Lead'), 'status'),
+        'biometric': (apps.get_model('leads', 'Biometric'), 'status'),
+        'notification': (apps.get_model('leads', 'Notification'), 'is_read'),
+    }
+
+    counters = {}
+    for model_name, (model, field) in sources.items():
+        for row in model.objects.order_by().values('user_id', field).annotate(rows=Count('id')):
+            status = row[field]
+            if model_name == 'notification':
+                status = 'read' if status else 'unread'
+            for user_id in {None, row['user_id']}:
+                key = (user_id, model_name, status)
+                counters[key] = counters.get(key, 0) + row['rows']
+
+    StatusCounter.objects.bulk_create([
+        StatusCounter(user_id=user_id, model_name=model_name, status=status, total=total)
+        for (user_id, model_name, status), total in counters.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0008_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('total', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='status_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Status Counters',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statuscounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'model_name', 'status'), name='unique_user_status_counter'),
+        ),
+        migrations.AddConstraint(
+            model_name='statuscounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('model_name', 'status'), name='unique_global_status_counter'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
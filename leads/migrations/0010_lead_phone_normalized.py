@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+from leads.normalization import normalize_phone
+
+
+def backfill_phone_normalized(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    batch_size = 1000
+    last_id = 0
+    while True:
+        batch = list(
+            Lead.objects.filter(id__gt=last_id, phone__isnull=False)
+            .order_by('id')
+            .only('id', 'phone')[:batch_size]
+        )
+        if not batch:
+            break
+        for lead in batch:
+            lead.phone_normalized = normalize_phone(lead.phone)
+        Lead.objects.bulk_update(batch, ['phone_normalized'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0009_status_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_phone_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0010_lead_phone_normalized'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('type', models.CharField(choices=[('lead_assigned', 'Lead Assigned'), ('lead_status_change', 'Lead Status Changed'), ('biometric_status_change', 'Biometric Status Changed'), ('weekly_report', 'Weekly Report'), ('system_alert', 'System Alert')], max_length=30)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('lead_id', models.IntegerField(blank=True, null=True)),
+                ('biometric_id', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived notifications',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notification_user_recent'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivednotification',
+            index=models.Index(fields=['user', '-created_at'], name='archived_user_recent'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+from leads.normalization import normalize_email
+
+PLACEHOLDER_EMAIL = 'default@example.com'
+
+
+def backfill_email_normalized(apps, schema_editor):
+    """
+    Fill email_normalized; of leads sharing an email only the oldest keeps it, so the unique index can be built
+    """
+    Lead = apps.get_model('leads', 'Lead')
+    batch_size = 1000
+    seen = set()
+    last_id = 0
+    while True:
+        batch = list(Lead.objects.filter(id__gt=last_id).order_by('id').only('id', 'email')[:batch_size])
+        if not batch:
+            break
+        for lead in batch:
+            email = normalize_email(lead.email)
+            if email == PLACEHOLDER_EMAIL or email in seen:
+                email = None
+            elif email:
+                seen.add(email)
+            lead.email_normalized = email
+        Lead.objects.bulk_update(batch, ['email_normalized'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0013_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='email_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(backfill_email_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lead',
+            name='email_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0014_lead_email_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivednotification',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='related_objects',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0015_archived_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='verb',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:03
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_report_weeks(apps, schema_editor):
+    """
+    Move the week stored as related_objects=[{'week': ...}] into report_week, keeping one report per user and week
+    """
+    Notification = apps.get_model('leads', 'Notification')
+    weeks = {}
+    reports = Notification.objects.filter(type='weekly_report').order_by('id').values_list('id', 'user_id', 'related_objects')
+    for pk, user_id, related_objects in reports:
+        entry = related_objects[0] if related_objects else None
+        if isinstance(entry, dict) and 'week' in entry:
+            weeks.setdefault((user_id, entry['week']), pk)
+    for (user_id, week), pk in weeks.items():
+        Notification.objects.filter(pk=pk).update(report_week=date.fromisoformat(week), related_objects=[])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0016_notification_verb'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='report_week',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(move_report_weeks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('report_week__isnull', False)), fields=('user', 'report_week'), name='notification_user_report_week'),
+        ),
+    ]
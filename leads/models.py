@@ -1,10 +1,82 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from .normalization import normalize_email, normalize_phone
 
-class Lead(models.Model):
+class TrackedFieldsMixin:
+    """
+    Remember the database values of ``tracked_fields`` so a save can tell what changed
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_tracked_fields()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.snapshot_tracked_fields()
+
+    def snapshot_tracked_fields(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field: getattr(self, field)
+            for field in self.tracked_fields
+            if field not in deferred
+        }
+
+    def loaded_values(self):
+        """
+        Database values of the tracked fields, or None for rows that are not saved yet
+        """
+        if self._state.adding:
+            return None
+        values = getattr(self, '_loaded_values', {})
+        if len(values) < len(self.tracked_fields):
+            # Instance was built by hand or loaded with deferred fields
+            values = type(self)._base_manager.filter(pk=self.pk).values(*self.tracked_fields).first()
+        return values
+
+    def changed_fields(self):
+        """
+        Tracked fields whose value was changed by the most recent save
+
+        Every tracked field counts as changed for a newly created row.
+        """
+        previous = getattr(self, '_previous_values', None)
+        if previous is None:
+            return set(self.tracked_fields)
+        return {field for field in self.tracked_fields if previous[field] != getattr(self, field)}
+
+class LeadQuerySet(models.QuerySet):
+    """
+    Keeps the denormalized lead columns filled on paths that bypass Lead.save
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_normalized_fields()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if 'phone' in kwargs and isinstance(kwargs['phone'], (str, type(None))):
+            kwargs['phone_normalized'] = normalize_phone(kwargs['phone'])
+        if 'email' in kwargs and isinstance(kwargs['email'], (str, type(None))):
+            key = Lead.unique_email(kwargs['email'])
+            if key is not None:
+                # Only a single lead can hold the email, and only if no other lead does
+                pks = list(self.values_list('pk', flat=True)[:2])
+                if len(pks) != 1 or Lead.email_holder_exists(key, exclude_pk=pks[0]):
+                    key = None
+            kwargs['email_normalized'] = key
+        return super().update(**kwargs)
+
+class Lead(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('new', 'New'),
         ('in_progress', 'In Progress'),
@@ -12,33 +84,109 @@ class Lead(models.Model):
         ('rejected', 'Rejected')
     ]
 
+    # Stored when a lead is created without an email; exempt from uniqueness
+    PLACEHOLDER_EMAIL = 'default@example.com'
+
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leads')
     name = models.CharField(max_length=100, default='Unknown')
-    email = models.EmailField(default='default@example.com')
+    email = models.EmailField(default=PLACEHOLDER_EMAIL)
+    # Lowercased copy of email with a unique index, so duplicate checks are one index probe
+    email_normalized = models.CharField(max_length=254, null=True, blank=True, editable=False, unique=True)
     location = models.CharField(max_length=100, null=True, blank=True, default='Unspecified')
     phone = models.CharField(max_length=20, null=True, blank=True)
+    # Digits-only copy of phone, indexed for caller ID lookups
+    phone_normalized = models.CharField(max_length=20, null=True, blank=True, editable=False, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
     created_at = models.DateTimeField(default=timezone.now)
+
+    objects = LeadQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.name} - {self.email}"
 
+    @classmethod
+    def unique_email(cls, email):
+        """
+        Value of email_normalized for an email, None for the placeholder
+        """
+        email = normalize_email(email)
+        return None if email == cls.PLACEHOLDER_EMAIL else email
+
+    @classmethod
+    def email_holder_exists(cls, key, exclude_pk=None):
+        queryset = cls._base_manager.filter(email_normalized=key)
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        return queryset.exists()
+
+    def claim_email(self):
+        """
+        Value of email_normalized for a save
+
+        Leads that shared an email before the unique index existed keep NULL
+        while their email is unchanged, so saving them never collides with
+        the lead that holds the email. New leads and changed emails always
+        get the key, so the unique index rejects duplicates that differ only
+        by case. The index is only probed for those legacy rows.
+        """
+        key = self.unique_email(self.email)
+        if key is None or key == self.email_normalized or not self.email_unchanged(key):
+            return key
+        return None if self.email_holder_exists(key, exclude_pk=self.pk) else key
+
+    def email_unchanged(self, key):
+        """
+        Whether a saved lead still has the email it was loaded with
+        """
+        return not self._state.adding and self.unique_email(self.loaded_values()['email']) == key
+
+    def clean(self):
+        """
+        Reject an email another lead already has, ignoring case, in model forms such as the admin's
+        """
+        super().clean()
+        key = self.unique_email(self.email)
+        if key is None or key == self.email_normalized:
+            return
+        if self.email_unchanged(key):
+            return
+        if self.email_holder_exists(key, exclude_pk=self.pk):
+            raise ValidationError({'email': 'A lead with this email already exists.'})
+
+    def fill_normalized_fields(self):
+        self.phone_normalized = normalize_phone(self.phone)
+        self.email_normalized = self.unique_email(self.email)
+
+    tracked_fields = ('status', 'user_id', 'location', 'name', 'email', 'phone')
+
     def save(self, *args, **kwargs):
-        # Automatically create a biometric if lead is approved
-        super().save(*args, **kwargs)
-        if self.status == 'approved' and not hasattr(self, 'biometric'):
-            Biometric.objects.create(
-                user=self.user or User.objects.first(),
-                name=self.name,
-                location=self.location,
-                status='pending'
-            )
+        from . import counters
+        from .transitions import lead_states
+
+        update_fields = kwargs.get('update_fields')
+        self.phone_normalized = normalize_phone(self.phone)
+        if update_fields is None or 'email' in update_fields:
+            self.email_normalized = self.claim_email()
+        if update_fields is not None:
+            normalized = {f'{field}_normalized' for field in ('phone', 'email') if field in update_fields}
+            if normalized:
+                kwargs['update_fields'] = set(update_fields) | normalized
+
+        # No savepoint, like Model.save_base, so the notifications a save
+        # raises share the caller's notification buffer (see NotificationWriter)
+        with transaction.atomic(savepoint=False):
+            previous = self._previous_values = self.loaded_values()
+            super().save(*args, **kwargs)
+            counters.record_save('lead', self, previous)
+            self.snapshot_tracked_fields()
+            # Side effects of a status change, such as the biometric of an approved lead
+            lead_states.entered(self, previous)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Leads"
 
-class Biometric(models.Model):
+class Biometric(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('approved', 'Approved'),
@@ -58,20 +206,36 @@ class Biometric(models.Model):
     def __str__(self):
         return f"{self.name} - {self.location} ({self.status})"
 
+    tracked_fields = ('status', 'user_id', 'location', 'name')
+
     def save(self, *args, **kwargs):
+        from . import counters
+        from .transitions import biometric_states
+
         # Update status timestamps
+        stamped = None
         if self.status == 'approved' and not self.approved_at:
             self.approved_at = timezone.now()
+            stamped = 'approved_at'
         elif self.status == 'rejected' and not self.rejected_at:
             self.rejected_at = timezone.now()
+            stamped = 'rejected_at'
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and stamped:
+            kwargs['update_fields'] = set(update_fields) | {stamped}
         
-        super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            previous = self._previous_values = self.loaded_values()
+            super().save(*args, **kwargs)
+            counters.record_save('biometric', self, previous)
+            self.snapshot_tracked_fields()
+            biometric_states.entered(self, previous)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Biometrics"
 
-class Notification(models.Model):
+class Notification(TrackedFieldsMixin, models.Model):
     NOTIFICATION_TYPES = [
         ('lead_assigned', 'Lead Assigned'),
         ('lead_status_change', 'Lead Status Changed'),
@@ -89,10 +253,153 @@ class Notification(models.Model):
     # Optional related objects
     lead = models.ForeignKey(Lead, on_delete=models.SET_NULL, null=True, blank=True)
     biometric = models.ForeignKey(Biometric, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Coalesced notifications stand for several events; related_objects lists
+    # {'lead': id} / {'biometric': id} entries for every merged event. Only
+    # events with the same verb (the new status, or 'created') are merged.
+    occurrences = models.PositiveIntegerField(default=1)
+    related_objects = models.JSONField(default=list, blank=True)
+    verb = models.CharField(max_length=20, blank=True, default='')
+
+    # Monday of the week a weekly_report covers
+    report_week = models.DateField(null=True, blank=True)
     
+    tracked_fields = ('is_read', 'user_id')
+
     def __str__(self):
         return f"{self.type} - {self.message[:50]}"
 
+    def save(self, *args, **kwargs):
+        from . import counters
+
+        with transaction.atomic():
+            previous = self._previous_values = self.loaded_values()
+            super().save(*args, **kwargs)
+            counters.record_save('notification', self, previous)
+            self.snapshot_tracked_fields()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Notifications"
+        indexes = [
+            # Serves the per-user listing, newest first
+            models.Index(fields=['user', '-created_at'], name='notification_user_recent'),
+        ]
+        constraints = [
+            # One weekly report per user and week; also serves the report job's lookup
+            models.UniqueConstraint(
+                fields=['user', 'report_week'],
+                condition=models.Q(report_week__isnull=False),
+                name='notification_user_report_week'
+            ),
+        ]
+
+class BroadcastQuerySet(models.QuerySet):
+    def visible_to(self, user_id):
+        """
+        Broadcasts sent since the user joined
+        """
+        joined = User.objects.filter(pk=user_id).values('date_joined')[:1]
+        return self.filter(created_at__gte=models.Subquery(joined))
+
+    def unread_by(self, user_id):
+        return self.visible_to(user_id).exclude(
+            models.Exists(BroadcastReadMarker.objects.filter(user_id=user_id, broadcast=models.OuterRef('pk')))
+        )
+
+class BroadcastNotification(models.Model):
+    """
+    Announcement addressed to every user, stored once
+
+    A broadcast is shown to users who joined before it was sent. Reading it
+    is recorded in BroadcastReadMarker, so unread broadcasts cost no rows.
+    """
+    BROADCAST_TYPES = [
+        ('system_alert', 'System Alert'),
+        ('weekly_report', 'Weekly Report'),
+    ]
+
+    type = models.CharField(max_length=30, choices=BROADCAST_TYPES)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = BroadcastQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.type} (broadcast) - {self.message[:50]}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = "Broadcast notifications"
+
+class BroadcastReadMarker(models.Model):
+    """
+    Records that a user has read a broadcast; absent rows mean unread
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_read_markers')
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='read_markers')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'broadcast'], name='unique_broadcast_read_marker'),
+        ]
+
+class ArchivedNotification(models.Model):
+    """
+    Compact copy of a read notification moved out of the hot Notification table
+
+    Related rows are kept as plain ids, without foreign key constraints, so
+    archiving never depends on the lead or biometric still existing.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    type = models.CharField(max_length=30, choices=Notification.NOTIFICATION_TYPES)
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    lead_id = models.IntegerField(null=True, blank=True)
+    biometric_id = models.IntegerField(null=True, blank=True)
+    occurrences = models.PositiveIntegerField(default=1)
+    related_objects = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.type} - {self.message[:50]}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = "Archived notifications"
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_user_recent'),
+        ]
+
+class StatusCounter(models.Model):
+    """
+    Denormalized number of Lead, Biometric and Notification rows per status
+
+    Rows with no user hold the global totals; rows with a user hold that
+    user's share. Notifications are counted as 'read' and 'unread'.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='status_counters')
+    model_name = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    total = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        scope = self.user or 'all users'
+        return f"{self.model_name}/{self.status} ({scope}): {self.total}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'model_name', 'status'],
+                condition=models.Q(user__isnull=False),
+                name='unique_user_status_counter'
+            ),
+            models.UniqueConstraint(
+                fields=['model_name', 'status'],
+                condition=models.Q(user__isnull=True),
+                name='unique_global_status_counter'
+            ),
+        ]
+        verbose_name_plural = "Status Counters"
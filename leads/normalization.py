@@ -0,0 +1,47 @@
+import re
+
+NON_DIGITS_RE = re.compile(r'\D')
+PHONE_QUERY_RE = re.compile(r'^\+?[\d\s\-().]+$')
+
+# Shortest digit string treated as a phone number in search queries
+MIN_PHONE_QUERY_DIGITS = 4
+
+
+def normalize_phone(value):
+    """
+    Reduce a free-form phone number to its digits
+
+    A leading international prefix ('+' or '00') is dropped, so
+    '+1 (555) 010-2030', '001 555 010 2030' and '1.555.010.2030' all
+    normalize to '15550102030'. Returns None when no digits are present.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    digits = NON_DIGITS_RE.sub('', value)
+    if value.startswith('00') and not value.startswith('+'):
+        digits = digits[2:]
+    return digits or None
+
+
+def phone_query_digits(query):
+    """
+    Return the normalized digits if a search query looks like a phone number, else None
+    """
+    if not query or not PHONE_QUERY_RE.match(query.strip()):
+        return None
+    digits = normalize_phone(query)
+    if digits is None or len(digits) < MIN_PHONE_QUERY_DIGITS:
+        return None
+    return digits
+
+
+def normalize_email(value):
+    """
+    Case-insensitive form of an email address, used for uniqueness checks
+
+    Returns None for blank values.
+    """
+    if not value:
+        return None
+    return value.strip().lower() or None
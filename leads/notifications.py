@@ -0,0 +1,490 @@
+import asyncio
+import threading
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Exists, F, IntegerField, OuterRef, Value
+from django.utils import timezone
+
+from . import counters
+from .caching import bump_generation
+from .models import Lead, Biometric, Notification, BroadcastNotification, BroadcastReadMarker
+from .pubsub import notification_broker
+from .search_index import get_search_index
+from .streaming import sse_event
+
+# Notifications every new account starts with
+WELCOME_NOTIFICATIONS = [
+    ('system_alert', 'Welcome to Biometric Leads! You have no active notifications yet.'),
+    ('weekly_report', 'Your weekly system overview will be available soon.'),
+]
+
+
+def related_entry(notification):
+    if notification.lead_id:
+        return {'lead': notification.lead_id}
+    if notification.biometric_id:
+        return {'biometric': notification.biometric_id}
+    return None
+
+
+def absorb(target, events):
+    """
+    Fold events into an aggregate notification, which takes the latest event's message and objects
+
+    The aggregate is dated by its latest event and becomes unread again.
+    """
+    limit = getattr(settings, 'NOTIFICATION_COALESCE_MAX_RELATED', 50)
+    if not target.related_objects and related_entry(target):
+        target.related_objects = [related_entry(target)]
+
+    for event in events:
+        target.occurrences += event.occurrences
+        entry = related_entry(event)
+        if entry and len(target.related_objects) < limit:
+            target.related_objects.append(entry)
+        target.lead_id = event.lead_id
+        target.biometric_id = event.biometric_id
+
+    if events:
+        target.message = f'{events[-1].message} (and {target.occurrences - 1} more)'
+        target.created_at = timezone.now()
+        target.is_read = False
+
+
+def coalesce(notifications):
+    """
+    Merge repeated events of the same type and verb for the same user
+
+    For types with a window in NOTIFICATION_COALESCE_WINDOWS, the events of
+    one user are folded into a single row with an occurrence counter and the
+    list of related objects. If that user already has an unread row of the
+    type created within the window, the events are added to it instead of
+    inserting anything.
+
+    :return: (notifications still to insert, existing rows that were updated)
+    """
+    windows = getattr(settings, 'NOTIFICATION_COALESCE_WINDOWS', {})
+    remaining, groups = [], {}
+    for notification in notifications:
+        if windows.get(notification.type):
+            key = (notification.user_id, notification.type, notification.verb)
+            groups.setdefault(key, []).append(notification)
+        else:
+            remaining.append(notification)
+    if not groups:
+        return notifications, []
+
+    now = timezone.now()
+    candidates = Notification.objects.select_for_update().filter(
+        user_id__in={user_id for user_id, notification_type, verb in groups},
+        type__in={notification_type for user_id, notification_type, verb in groups},
+        verb__in={verb for user_id, notification_type, verb in groups},
+        is_read=False,
+        created_at__gte=now - timedelta(seconds=max(windows[t] for u, t, v in groups)),
+    ).order_by('created_at')
+    open_aggregates = {
+        (row.user_id, row.type, row.verb): row
+        for row in candidates
+        if row.created_at >= now - timedelta(seconds=windows[row.type])
+    }
+
+    merged = []
+    for key, events in groups.items():
+        target = open_aggregates.get(key)
+        if target is None:
+            target, events = events[0], events[1:]
+            remaining.append(target)
+        else:
+            merged.append(target)
+        absorb(target, events)
+
+    if merged:
+        Notification.objects.bulk_update(
+            merged, ['message', 'occurrences', 'related_objects', 'lead', 'biometric', 'created_at', 'is_read']
+        )
+    return remaining, merged
+
+
+class NotificationBuffer:
+    """
+    Notifications queued within one transaction scope, deduplicated by event
+
+    The scope is the outermost atomic block plus the savepoints open when the
+    buffer was created, and the buffer's on_commit hook is registered in that
+    same scope. Django runs the hook when the transaction commits and
+    discards it, with its events, when the transaction or one of those
+    savepoints rolls back.
+    """
+    def __init__(self, scope):
+        self.scope = scope
+        self.events = {}
+
+    def add(self, notification):
+        key = (notification.user_id, notification.type, notification.lead_id, notification.biometric_id)
+        existing = self.events.get(key)
+        if existing is None:
+            self.events[key] = notification
+        else:
+            # The same event raised twice keeps one row with the latest message
+            existing.message = notification.message
+            existing.verb = notification.verb
+
+
+class NotificationWriter:
+    """
+    Collect notifications per transaction and insert them with one bulk_create on commit
+
+    Inside an atomic block notifications are buffered per transaction scope
+    (the outermost block and the open savepoints) and each buffer is written
+    by a single transaction.on_commit hook, so a rolled back transaction or
+    savepoint discards them together with the data they describe. Model saves
+    open no savepoint, so the notifications of one transaction usually share
+    a single buffer. Identical events, such as the
+    lead_assigned notification raised by both create_lead and the post_save
+    receiver, are written once. Outside a transaction notifications are
+    written immediately.
+
+    bulk_create bypasses save() and post_save, so write() applies the same
+    side effects in bulk: counters, search index, cached search results and
+    the notification stream.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def add(self, user, type, message, lead=None, biometric=None, verb=''):
+        """
+        Queue a notification for a user or user id; events without a user are dropped
+        """
+        if user is None:
+            return
+        user_id = getattr(user, 'pk', user)
+        self.add_many([
+            Notification(user_id=user_id, type=type, message=message, lead=lead, biometric=biometric, verb=verb)
+        ])
+
+    def add_many(self, notifications):
+        """
+        Queue unsaved Notification instances
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.write(notifications)
+            return
+
+        buffer = self._current_buffer(connection)
+        for notification in notifications:
+            buffer.add(notification)
+
+    def pending(self):
+        """
+        Number of notifications queued in the atomic blocks that are still open
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            return 0
+        return sum(len(buffer.events) for buffer in self._open_buffers(connection).values())
+
+    @staticmethod
+    def _scope(connection):
+        """
+        Key of the innermost open transaction scope
+
+        Savepoint ids are never reused on a connection, so a scope that was
+        committed or rolled back never matches again. The outermost atomic
+        block tells apart transactions that open no savepoint.
+        """
+        return (connection.atomic_blocks[0], *(sid for sid in connection.savepoint_ids if sid))
+
+    def _open_buffers(self, connection):
+        """
+        Buffers of the scopes that are still open
+
+        Buffers of closed scopes are forgotten: a rolled back savepoint took
+        their hook with it, and a released one leaves the hook to write them
+        on commit.
+        """
+        scope = self._scope(connection)
+        self._local.buffers = {
+            key: buffer for key, buffer in getattr(self._local, 'buffers', {}).items()
+            if scope[:len(key)] == key
+        }
+        return self._local.buffers
+
+    def _current_buffer(self, connection):
+        buffers = self._open_buffers(connection)
+        scope = self._scope(connection)
+        buffer = buffers.get(scope)
+        if buffer is None:
+            buffer = buffers[scope] = NotificationBuffer(scope)
+            transaction.on_commit(partial(self._flush, buffer))
+        return buffer
+
+    def _flush(self, buffer):
+        buffers = getattr(self._local, 'buffers', {})
+        if buffers.get(buffer.scope) is buffer:
+            del buffers[buffer.scope]
+        self.write(self._existing_targets(list(buffer.events.values())))
+
+    @staticmethod
+    def _existing_targets(notifications):
+        """
+        Drop events about leads or biometrics that no longer exist
+
+        Rows created in a savepoint that was rolled back, or deleted before
+        the commit, would otherwise fail the foreign key on insert.
+        """
+        lead_ids = {n.lead_id for n in notifications if n.lead_id}
+        biometric_ids = {n.biometric_id for n in notifications if n.biometric_id}
+        if lead_ids:
+            lead_ids = set(Lead.objects.filter(id__in=lead_ids).values_list('id', flat=True))
+        if biometric_ids:
+            biometric_ids = set(Biometric.objects.filter(id__in=biometric_ids).values_list('id', flat=True))
+        return [
+            n for n in notifications
+            if (not n.lead_id or n.lead_id in lead_ids) and (not n.biometric_id or n.biometric_id in biometric_ids)
+        ]
+
+    def write(self, notifications, batch_size=1000):
+        """
+        Insert notifications and apply the post-save side effects in bulk
+
+        Types listed in NOTIFICATION_COALESCE_WINDOWS are first merged into
+        aggregate rows (see coalesce()); streams receive updated aggregates as
+        notification_update events.
+
+        :return: The inserted notifications
+        """
+        if not notifications:
+            return []
+
+        with transaction.atomic():
+            notifications, merged = coalesce(notifications)
+            created = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+            counters.record_bulk_create('notification', created)
+            get_search_index().update_many('notification', created + merged)
+            bump_generation('notification')
+        publish_new_notifications(created)
+        publish_new_notifications(merged, event='notification_update')
+        return created
+
+
+notification_writer = NotificationWriter()
+
+
+def seed_welcome_notifications(user):
+    """
+    Create the welcome notifications for a newly registered user
+    """
+    notification_writer.add_many([
+        Notification(user=user, type=notification_type, message=message)
+        for notification_type, message in WELCOME_NOTIFICATIONS
+    ])
+
+
+def send_broadcast(type, message):
+    """
+    Announce something to every user with a single row
+
+    The post_save receiver expires every cached unread count and pushes the
+    broadcast to open notification streams.
+    """
+    return BroadcastNotification.objects.create(type=type, message=message)
+
+
+def mark_broadcasts_read(user, broadcast_ids=None):
+    """
+    Record read markers for the given broadcasts, or for every unread one
+
+    :return: Number of broadcasts newly marked as read
+    """
+    unread = BroadcastNotification.objects.unread_by(user.pk)
+    if broadcast_ids is not None:
+        unread = unread.filter(id__in=broadcast_ids)
+    ids = list(unread.values_list('id', flat=True))
+    if ids:
+        BroadcastReadMarker.objects.bulk_create(
+            [BroadcastReadMarker(user=user, broadcast_id=broadcast_id) for broadcast_id in ids],
+            ignore_conflicts=True
+        )
+        counters.invalidate_unread_counts([user.pk])
+    return len(ids)
+
+
+class FeedItem:
+    """
+    A personal notification or a broadcast as shown in a user's notification list
+    """
+    TYPE_LABELS = dict(Notification.NOTIFICATION_TYPES)
+
+    def __init__(self, id, type, message, is_read, created_at, lead_id, biometric_id, occurrences, source):
+        self.id = id
+        self.type = type
+        self.message = message
+        self.is_read = is_read
+        self.created_at = created_at
+        self.lead_id = lead_id
+        self.biometric_id = biometric_id
+        self.occurrences = occurrences
+        self.is_broadcast = source == 'broadcast'
+
+    def get_type_display(self):
+        return self.TYPE_LABELS.get(self.type, self.type)
+
+
+class NotificationFeed:
+    """
+    A user's personal notifications merged with the broadcasts addressed to them
+
+    Both sources are projected onto the same columns and combined with
+    UNION ALL, ordered and sliced in the database, so a page costs one query
+    however many broadcasts or notifications exist. A broadcast's read state
+    comes from an EXISTS over the user's read markers.
+    """
+    COLUMNS = ('id', 'kind', 'text', 'read', 'sent_at', 'lead_ref', 'biometric_ref', 'times', 'source')
+
+    def __init__(self, user, personal_count=None):
+        self.user = user
+        self._count = None
+        self._personal_count = personal_count
+
+    def _personal(self):
+        return Notification.objects.filter(user=self.user).order_by().annotate(
+            kind=F('type'),
+            text=F('message'),
+            read=F('is_read'),
+            sent_at=F('created_at'),
+            lead_ref=F('lead_id'),
+            biometric_ref=F('biometric_id'),
+            times=F('occurrences'),
+            source=Value('personal', output_field=CharField()),
+        ).values_list(*self.COLUMNS)
+
+    def _broadcasts(self):
+        markers = BroadcastReadMarker.objects.filter(user=self.user, broadcast=OuterRef('pk'))
+        return BroadcastNotification.objects.visible_to(self.user.pk).order_by().annotate(
+            kind=F('type'),
+            text=F('message'),
+            read=Exists(markers),
+            sent_at=F('created_at'),
+            lead_ref=Value(None, output_field=IntegerField()),
+            biometric_ref=Value(None, output_field=IntegerField()),
+            times=Value(1, output_field=IntegerField()),
+            source=Value('broadcast', output_field=CharField()),
+        ).values_list(*self.COLUMNS)
+
+    def _stream(self):
+        return self._personal().union(self._broadcasts(), all=True).order_by('-sent_at', '-id')
+
+    def count(self):
+        if self._count is None:
+            personal = self._personal_count
+            if personal is None:
+                personal = counters.get_counts('notification', user=self.user)['total']
+            self._count = personal + BroadcastNotification.objects.visible_to(self.user.pk).count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        return [FeedItem(*row) for row in self._stream()[index]]
+
+
+def serialize_notification(notification):
+    """
+    Convert a notification into the dictionary used by the header dropdown
+    """
+    return {
+        'id': notification.id,
+        'type': notification.type,
+        'message': notification.message,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+        'ref_id': notification.lead_id or notification.biometric_id,
+        'occurrences': getattr(notification, 'occurrences', 1),
+        'is_broadcast': getattr(notification, 'is_broadcast', False),
+    }
+
+
+def publish_new_notifications(notifications, event='notification'):
+    """
+    Push new notifications to their users' open streams once the transaction commits
+
+    :param event: Stream event name; updated aggregates use notification_update
+    """
+    events = [
+        (notification.user_id, serialize_notification(notification))
+        for notification in notifications
+        if notification_broker.has_subscribers(notification.user_id)
+    ]
+    if not events:
+        return
+
+    def publish():
+        for user_id, data in events:
+            notification_broker.publish(user_id, event, data)
+
+    transaction.on_commit(publish)
+
+
+def publish_broadcast(broadcast):
+    """
+    Push a new broadcast to every open stream once committed
+
+    One broker event reaches every connection, and each stream raises its
+    own unread count (see notification_events()), so sending a broadcast
+    runs no per-subscriber queries.
+    """
+    data = {
+        'id': broadcast.id,
+        'type': broadcast.type,
+        'message': broadcast.message,
+        'is_read': False,
+        'created_at': broadcast.created_at.isoformat(),
+        'ref_id': None,
+        'occurrences': 1,
+        'is_broadcast': True,
+    }
+
+    transaction.on_commit(partial(notification_broker.publish_all, 'broadcast', data))
+
+
+async def notification_events(user_id):
+    """
+    Server-Sent Events stream of a user's unread count and new notifications
+
+    Starts with the current unread count, then relays broker events as they
+    are published. A broadcast is relayed as a notification followed by the
+    stream's last known count plus one; every connected user joined before
+    it was sent, so it is unread for all of them. A comment line is sent
+    every NOTIFICATION_STREAM_KEEPALIVE seconds so proxies keep idle
+    connections open.
+    """
+    keepalive = getattr(settings, 'NOTIFICATION_STREAM_KEEPALIVE', 25)
+    retry = getattr(settings, 'NOTIFICATION_STREAM_RETRY', 5000)
+
+    # Subscribe before reading the count so no change can slip in between
+    with notification_broker.subscribe(user_id) as queue:
+        count = await sync_to_async(counters.unread_count_for)(user_id)
+        yield sse_event('unread_count', {'unread_count': count}, retry=retry)
+
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event == 'broadcast':
+                count += 1
+                yield sse_event('notification', data)
+                yield sse_event('unread_count', {'unread_count': count})
+                continue
+            if event == 'unread_count':
+                count = data['unread_count']
+            yield sse_event(event, data)
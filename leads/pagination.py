@@ -0,0 +1,166 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """
+    Page-number paginator that uses a known row count instead of running COUNT(*)
+    """
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        return self._known_count
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a pagination cursor cannot be decoded
+    """
+
+
+class KeysetPage:
+    """
+    A single page produced by KeysetPaginator
+    """
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) pagination over a queryset
+
+    Rows are ordered by (sort_field, id) and each page is fetched with a
+    WHERE clause that continues from the boundary row of the previous page,
+    so fetching a deep page costs the same as fetching the first one and no
+    COUNT(*) is issued. NULL sort values are placed first in ascending and
+    last in descending order on every database backend.
+    """
+    def __init__(self, queryset, per_page, sort_field='created_at', descending=True):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.sort_field = sort_field
+        self.descending = descending
+        self.field = queryset.model._meta.get_field(sort_field)
+
+    def _ordering(self, descending):
+        if descending:
+            return [F(self.sort_field).desc(nulls_last=True), F('id').desc()]
+        return [F(self.sort_field).asc(nulls_first=True), F('id').asc()]
+
+    def _after(self, value, pk, descending):
+        """
+        Rows that come after (value, pk) in the given direction
+        """
+        field = self.sort_field
+        if value is None:
+            if descending:
+                # NULLs are last: only NULL rows with a smaller id remain
+                return Q(**{f'{field}__isnull': True, 'id__lt': pk})
+            return Q(**{f'{field}__isnull': True, 'id__gt': pk}) | Q(**{f'{field}__isnull': False})
+
+        if descending:
+            return (
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'id__lt': pk})
+                | Q(**{f'{field}__isnull': True})
+            )
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+
+    def encode_cursor(self, obj, direction):
+        value = getattr(obj, self.field.attname)
+        value = self.field.value_to_string(obj) if value is not None else None
+        payload = json.dumps([direction, value, obj.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            if value is not None:
+                value = self.field.to_python(value)
+            return direction, value, int(pk)
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor(str(e))
+
+    def page(self, cursor=None):
+        """
+        Return the page following (or preceding) the given cursor, or the first page
+        """
+        if not cursor:
+            rows = list(self.queryset.order_by(*self._ordering(self.descending))[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            return self._build_page(rows[:self.per_page], has_next=has_next, has_previous=False)
+
+        direction, value, pk = self.decode_cursor(cursor)
+        if direction == 'next':
+            rows = list(
+                self.queryset.filter(self._after(value, pk, self.descending))
+                .order_by(*self._ordering(self.descending))[:self.per_page + 1]
+            )
+            has_next = len(rows) > self.per_page
+            return self._build_page(rows[:self.per_page], has_next=has_next, has_previous=True)
+
+        # Walk backwards in reverse order, then restore the display order
+        rows = list(
+            self.queryset.filter(self._after(value, pk, not self.descending))
+            .order_by(*self._ordering(not self.descending))[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._build_page(rows, has_next=True, has_previous=has_previous)
+
+    def _build_page(self, rows, has_next, has_previous):
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+        )
+
+
+def keyset_page(request, queryset, per_page, sort_field='created_at', descending=True):
+    """
+    Paginate a queryset using the 'cursor' request parameter
+
+    Invalid cursors fall back to the first page, mirroring how the
+    page-number views treat invalid page numbers.
+    """
+    paginator = KeysetPaginator(queryset, per_page, sort_field=sort_field, descending=descending)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
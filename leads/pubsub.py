@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+
+class NotificationBroker:
+    """
+    In-process publish/subscribe hub for per-user notification events
+
+    Each subscriber is an asyncio.Queue owned by the event loop of the
+    connection that created it. publish() may be called from any thread
+    (sync views run in a worker thread under ASGI) and hands events to the
+    owning loop with call_soon_threadsafe, so no thread is held per
+    connection. Events only reach subscribers connected to this process.
+    """
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, user_id):
+        return bool(self._subscribers.get(user_id))
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    @contextmanager
+    def subscribe(self, user_id):
+        """
+        Register a queue for the user's events; must be entered inside a running event loop
+        """
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_queued))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                queues = self._subscribers.get(user_id)
+                if queues is not None:
+                    queues.discard(entry)
+                    if not queues:
+                        del self._subscribers[user_id]
+
+    def publish(self, user_id, event, data):
+        """
+        Send an event to every connection of a user
+        """
+        with self._lock:
+            entries = list(self._subscribers.get(user_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, (event, data))
+            except RuntimeError:
+                # The connection's loop has already closed
+                pass
+
+    def publish_all(self, event, data):
+        """
+        Send an event to every open connection of every user
+        """
+        with self._lock:
+            entries = [entry for queues in self._subscribers.values() for entry in queues]
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, (event, data))
+            except RuntimeError:
+                pass
+
+    @staticmethod
+    def _put(queue, item):
+        if queue.full():
+            # A slow client loses its oldest event rather than growing without bound
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+
+notification_broker = NotificationBroker()
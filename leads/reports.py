@@ -0,0 +1,148 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+
+import django
+from django.db import connections
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from .models import Lead, Biometric, Notification, User
+from .notifications import notification_writer
+
+
+def last_full_week(today=None):
+    """
+    Monday of the most recent week that has fully ended
+    """
+    today = today or timezone.localdate()
+    return today - timedelta(days=today.weekday() + 7)
+
+
+def week_bounds(week_start):
+    """
+    Aware datetimes delimiting the week that starts on the given date
+    """
+    start = timezone.make_aware(datetime.combine(week_start, time.min))
+    return start, start + timedelta(days=7)
+
+
+def grouped_counts(model, statuses, user_range, start, end):
+    """
+    Per-user totals and status counts of the rows created during the week
+
+    One GROUP BY query over the whole user id range.
+
+    :return: Dictionary of user id to {'total': n, <status>: n, ...}
+    """
+    first_id, last_id = user_range
+    annotations = {'total': Count('id')}
+    for status in statuses:
+        annotations[status] = Count('id', filter=Q(status=status))
+
+    rows = model.objects.filter(
+        user_id__gte=first_id, user_id__lte=last_id, created_at__gte=start, created_at__lt=end
+    ).order_by().values('user_id').annotate(**annotations)
+    return {row.pop('user_id'): row for row in rows}
+
+
+def report_message(week_start, leads, biometrics):
+    week_end = week_start + timedelta(days=6)
+    return (
+        f"Weekly report {week_start:%b %d} - {week_end:%b %d}: "
+        f"{leads.get('total', 0)} new leads ({leads.get('approved', 0)} approved, "
+        f"{leads.get('rejected', 0)} rejected), "
+        f"{biometrics.get('total', 0)} biometrics ({biometrics.get('approved', 0)} approved, "
+        f"{biometrics.get('pending', 0)} pending)"
+    )
+
+
+def generate_weekly_reports(week_start, user_range=None, chunk_size=1000):
+    """
+    Create the weekly_report notification of every user in an id range
+
+    Lead and biometric statistics are computed with one grouped query per
+    model for the whole range. Users are then walked in id order and their
+    reports written in chunks through the notification writer. Each report
+    records the week it covers in report_week, and users who already have a
+    report for that week are skipped, so the job can be re-run or backfilled
+    for older weeks safely.
+
+    :param week_start: Monday of the reported week
+    :param user_range: Inclusive (first id, last id), defaults to all users
+    :return: Number of reports created
+    """
+    if week_start.weekday() != 0:
+        raise ValueError(f'Weekly reports start on a Monday, not on {week_start:%A %Y-%m-%d}')
+
+    if user_range is None:
+        bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return 0
+        user_range = (bounds['first'], bounds['last'])
+
+    start, end = week_bounds(week_start)
+    leads = grouped_counts(Lead, ('approved', 'rejected'), user_range, start, end)
+    biometrics = grouped_counts(Biometric, ('approved', 'pending'), user_range, start, end)
+
+    created = 0
+    last_id = user_range[0] - 1
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_id, id__lte=user_range[1], is_active=True)
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return created
+        last_id = user_ids[-1]
+
+        reported = set(
+            Notification.objects.filter(type='weekly_report', user_id__in=user_ids, report_week=week_start)
+            .values_list('user_id', flat=True)
+        )
+        notification_writer.write([
+            Notification(
+                user_id=user_id,
+                type='weekly_report',
+                message=report_message(week_start, leads.get(user_id, {}), biometrics.get(user_id, {})),
+                report_week=week_start
+            )
+            for user_id in user_ids
+            if user_id not in reported
+        ], batch_size=chunk_size)
+        created += len(user_ids) - len(reported)
+
+
+def split_user_ranges(workers):
+    """
+    Split the user id space into contiguous inclusive ranges, one per worker
+    """
+    bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return []
+    span = bounds['last'] - bounds['first'] + 1
+    step = -(-span // workers)
+    return [
+        (first, min(first + step - 1, bounds['last']))
+        for first in range(bounds['first'], bounds['last'] + 1, step)
+    ]
+
+
+def _report_worker(week_start, user_range, chunk_size):
+    try:
+        return generate_weekly_reports(week_start, user_range, chunk_size)
+    finally:
+        connections.close_all()
+
+
+def generate_weekly_reports_parallel(week_start, workers, chunk_size=1000):
+    """
+    Run generate_weekly_reports in worker processes, one user id range each
+
+    :return: Number of reports created
+    """
+    ranges = split_user_ranges(workers)
+    # Connections must not be shared with the forked workers
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        futures = [pool.submit(_report_worker, week_start, user_range, chunk_size) for user_range in ranges]
+        return sum(future.result() for future in futures)
@@ -0,0 +1,86 @@
+from django.utils.dateparse import parse_date
+from import_export import resources
+
+from .dedupe import taken_emails
+from .models import Lead, Biometric
+from .streaming import iterate_values
+
+# Resources for Import/Export functionality
+class LeadResource(resources.ModelResource):
+    class Meta:
+        model = Lead
+        fields = ('id', 'name', 'email', 'location', 'status', 'created_at')
+
+    def before_import(self, dataset, using_transactions, dry_run, **kwargs):
+        """
+        Look up the file's emails among existing leads with batched IN queries
+        """
+        emails = dataset['email'] if 'email' in (dataset.headers or ()) else []
+        self.taken_emails = taken_emails(emails)
+        self.seen_emails = set()
+
+    def skip_row(self, instance, original, row, import_validation_errors=None):
+        """
+        Skip new leads whose email, ignoring case, another lead already has
+        """
+        if not instance._state.adding:
+            return super().skip_row(instance, original, row, import_validation_errors)
+        key = Lead.unique_email(instance.email)
+        if key is not None:
+            if key in self.taken_emails or key in self.seen_emails:
+                return True
+            self.seen_emails.add(key)
+        return super().skip_row(instance, original, row, import_validation_errors)
+
+class BiometricResource(resources.ModelResource):
+    class Meta:
+        model = Biometric
+        fields = ('id', 'user__username', 'name', 'location', 'status', 'created_at')
+
+EXPORT_RESOURCES = {
+    'lead': LeadResource,
+    'biometric': BiometricResource,
+}
+
+
+def export_columns(model_key):
+    """
+    Exported columns of a model, the field list of its import/export resource
+    """
+    return list(EXPORT_RESOURCES[model_key]._meta.fields)
+
+
+def export_queryset(model_key, status=None, created_from=None, created_to=None, after_id=None):
+    """
+    Rows to export in id order, optionally filtered and resumed after the last id received
+
+    :param created_from: First creation date included, as YYYY-MM-DD
+    :param created_to: Last creation date included, as YYYY-MM-DD
+    :raises ValueError: A filter value is not valid
+    """
+    model = EXPORT_RESOURCES[model_key]._meta.model
+    queryset = model.objects.order_by('id')
+
+    if status:
+        if status not in dict(model.STATUS_CHOICES):
+            raise ValueError(f'Unknown {model_key} status: {status}')
+        queryset = queryset.filter(status=status)
+    for lookup, value in (('created_at__date__gte', created_from), ('created_at__date__lte', created_to)):
+        if value:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f'Invalid date: {value}')
+            queryset = queryset.filter(**{lookup: day})
+    if after_id:
+        queryset = queryset.filter(id__gt=int(after_id))
+    return queryset
+
+
+def export_rows(model_key, queryset, chunk_size=None):
+    """
+    Stream the resource columns of a queryset without loading it into a Dataset
+
+    Rows come in id order, so an interrupted download can be resumed by
+    passing the last id received as after_id.
+    """
+    return iterate_values(queryset.order_by('id'), export_columns(model_key), chunk_size)
@@ -0,0 +1,138 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import counters
+from .caching import bump_generation
+from .models import ArchivedNotification, Notification
+from .search_index import get_search_index
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'type', 'message', 'is_read', 'created_at', 'lead_id', 'biometric_id',
+    'occurrences', 'related_objects',
+)
+
+
+def retention_policies():
+    """
+    Days a read notification stays in the hot table, per notification type
+
+    NOTIFICATION_RETENTION_DAYS overrides NOTIFICATION_RETENTION_DEFAULT_DAYS
+    per type; None keeps a type forever.
+    """
+    default = getattr(settings, 'NOTIFICATION_RETENTION_DEFAULT_DAYS', 90)
+    overrides = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})
+    return {
+        notification_type: overrides.get(notification_type, default)
+        for notification_type, label in Notification.NOTIFICATION_TYPES
+    }
+
+
+def archive_chunk(notification_type, cutoff, chunk_size):
+    """
+    Move one chunk of expired read notifications into the archive
+
+    Each chunk runs in its own short transaction, so writers are never
+    blocked for longer than one chunk takes.
+
+    :return: Number of archived notifications
+    """
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.filter(type=notification_type, is_read=True, created_at__lt=cutoff)
+            .order_by('id')
+            .values(*ARCHIVED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+
+        ArchivedNotification.objects.bulk_create([
+            ArchivedNotification(
+                original_id=row['id'],
+                user_id=row['user_id'],
+                type=row['type'],
+                message=row['message'],
+                created_at=row['created_at'],
+                lead_id=row['lead_id'],
+                biometric_id=row['biometric_id'],
+                occurrences=row['occurrences'],
+                related_objects=row['related_objects'],
+            )
+            for row in rows
+        ], ignore_conflicts=True)
+
+        ids = [row['id'] for row in rows]
+        # A plain DELETE instead of QuerySet.delete(): nothing references a
+        # notification, so there is no cascade to collect, and the post_delete
+        # receivers' work (counters, search index, cached results) is done
+        # below once per chunk rather than once per row
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(Notification._meta.db_table)} '
+                f'WHERE id IN ({", ".join(["%s"] * len(ids))})',
+                ids
+            )
+        counters.record_bulk_delete('notification', rows)
+        get_search_index().remove_many('notification', ids)
+        bump_generation('notification')
+    return len(rows)
+
+
+def archive_notifications(types=None, now=None, chunk_size=500, pause=0, dry_run=False):
+    """
+    Archive every read notification older than its type's retention period
+
+    :param types: Notification types to process, defaults to all with a policy
+    :param pause: Seconds to sleep between chunks to leave room for other writers
+    :param dry_run: Only count the notifications that would be archived
+    :return: Dictionary of notification type to number archived (or eligible)
+    """
+    now = now or timezone.now()
+    results = {}
+    for notification_type, days in retention_policies().items():
+        if days is None or (types and notification_type not in types):
+            continue
+
+        cutoff = now - timedelta(days=days)
+        if dry_run:
+            results[notification_type] = Notification.objects.filter(
+                type=notification_type, is_read=True, created_at__lt=cutoff
+            ).count()
+            continue
+
+        archived = 0
+        while True:
+            moved = archive_chunk(notification_type, cutoff, chunk_size)
+            archived += moved
+            if moved < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+        results[notification_type] = archived
+    return results
+
+
+def purge_archive(now=None, chunk_size=500):
+    """
+    Delete archived notifications older than NOTIFICATION_ARCHIVE_RETENTION_DAYS
+
+    :return: Number of deleted archive rows
+    """
+    days = getattr(settings, 'NOTIFICATION_ARCHIVE_RETENTION_DAYS', None)
+    if days is None:
+        return 0
+
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(
+            ArchivedNotification.objects.filter(created_at__lt=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += ArchivedNotification.objects.filter(id__in=ids).delete()[0]
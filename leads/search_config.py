@@ -1,5 +1,23 @@
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import CharField, Q, Value
+from django.utils import timezone
 from .models import Lead, Biometric, Notification
+from .search_index import get_search_index
+from .caching import get_location_suggestions, search_result_cache
+from .autocomplete import SUGGESTION_FIELDS
+from .fuzzy import fuzzy_index
+from .normalization import phone_query_digits
+from .streaming import iterate_values
+
+
+def phone_prefix_filter(digits):
+    """
+    Match leads whose normalized phone starts with the digits
+
+    Expressed as a range so the phone_normalized index is used on every backend
+    (':' is the character right after '9').
+    """
+    return Q(phone_normalized__gte=digits, phone_normalized__lt=digits + ':')
 
 class SearchConfiguration:
     """
@@ -32,119 +50,247 @@ class SearchConfiguration:
             ]
         }
 
+    # Fields that may be filtered exactly for each model
+    FILTER_FIELDS = {
+        'lead': ['name', 'email', 'phone', 'location', 'status'],
+        'biometric': ['name', 'location', 'status'],
+        'notification': ['type', 'is_read'],
+    }
+
     @staticmethod
-    def advanced_search(query=None, model=None, filters=None):
+    def normalize_models(model=None):
         """
-        Perform an advanced, configurable search across multiple models
-        
-        :param query: Global search term
-        :param model: Specific model to search ('lead', 'biometric', 'notification')
-        :param filters: Dictionary of specific field filters
-        :return: Queryset of search results
+        Turn the model argument into a list of model keys
         """
-        results = []
-        
         # Default to searching all models if not specified
         if not model:
-            model = ['lead', 'biometric', 'notification']
-        elif isinstance(model, str):
-            model = [model]
-        
-        # Normalize filters
+            return ['lead', 'biometric', 'notification']
+        if isinstance(model, str):
+            return [model]
+        return list(model)
+
+    # Search modes accepted by advanced_search
+    SEARCH_MODES = ('exact', 'fuzzy')
+
+    @staticmethod
+    def fuzzy_ranking(query, model=None):
+        """
+        Rank rows by trigram similarity to the query
+
+        :return: Dictionary mapping (model key, id) to a similarity score
+        """
+        models = SearchConfiguration.normalize_models(model)
+        limit = getattr(settings, 'FUZZY_SEARCH_LIMIT', 200)
+        return dict(fuzzy_index.search(query, models=models, limit=limit))
+
+    @staticmethod
+    def build_querysets(query=None, model=None, filters=None, ranking=None, user=None):
+        """
+        Build the filtered, unevaluated queryset for each searched model
+
+        Filters may be given as plain field names ('status') or prefixed with
+        the model key ('lead_status') to target a single model.
+
+        :param ranking: Optional fuzzy ranking; models covered by the fuzzy
+                        index are then restricted to the ranked ids instead
+                        of the exact text match
+        :param user: When given, notifications are limited to this user's own
+        :return: Dictionary mapping model key to queryset
+        """
         filters = filters or {}
-        
-        # Search Leads
-        if 'lead' in model:
-            lead_query = Lead.objects.all()
-            
-            # Global text search
-            if query:
-                lead_query = lead_query.filter(
-                    Q(name__icontains=query) | 
-                    Q(email__icontains=query) | 
-                    Q(phone__icontains=query) | 
-                    Q(location__icontains=query)
-                )
-            
-            # Apply specific filters
-            for field, value in filters.items():
-                if field in ['name', 'email', 'phone', 'location', 'status']:
-                    lead_query = lead_query.filter(**{f'{field}__iexact': value})
-            
-            results.extend([
-                {
-                    'type': 'Lead',
-                    'id': lead.id,
-                    'name': lead.name,
-                    'email': lead.email,
-                    'phone': lead.phone,
-                    'location': lead.location,
-                    'status': lead.get_status_display(),
-                    'created_at': lead.created_at,
-                    'detail_url': f'/lead/{lead.id}/'
-                } for lead in lead_query
-            ])
-        
-        # Search Biometrics
-        if 'biometric' in model:
-            biometric_query = Biometric.objects.all()
-            
+        search_index = get_search_index()
+        model_classes = {'lead': Lead, 'biometric': Biometric, 'notification': Notification}
+
+        querysets = {}
+        for model_key in SearchConfiguration.normalize_models(model):
+            queryset = model_classes[model_key].objects.all()
+            if model_key == 'notification' and user is not None:
+                queryset = queryset.filter(user=user)
+
             # Global text search
-            if query:
-                biometric_query = biometric_query.filter(
-                    Q(name__icontains=query) | 
-                    Q(location__icontains=query)
-                )
-            
+            if query and ranking is not None and model_key in SUGGESTION_FIELDS:
+                queryset = queryset.filter(id__in=[pk for source, pk in ranking if source == model_key])
+            elif query:
+                condition = search_index.text_filter(model_key, query)
+                phone_digits = phone_query_digits(query) if model_key == 'lead' else None
+                if phone_digits:
+                    # Differently formatted numbers match on the indexed digits-only column
+                    condition |= phone_prefix_filter(phone_digits)
+                queryset = queryset.filter(condition)
+
             # Apply specific filters
-            for field, value in filters.items():
-                if field in ['name', 'location', 'status']:
-                    biometric_query = biometric_query.filter(**{f'{field}__iexact': value})
-            
-            results.extend([
-                {
-                    'type': 'Biometric',
-                    'id': biometric.id,
-                    'name': biometric.name,
-                    'location': biometric.location,
-                    'status': biometric.get_status_display(),
-                    'created_at': biometric.created_at,
-                    'detail_url': f'/biometric/{biometric.id}/'
-                } for biometric in biometric_query
-            ])
+            for field in SearchConfiguration.FILTER_FIELDS[model_key]:
+                value = filters.get(f'{model_key}_{field}', filters.get(field))
+                if value not in (None, ''):
+                    queryset = queryset.filter(**{f'{field}__iexact': value})
+
+            querysets[model_key] = queryset
+        return querysets
+
+    @staticmethod
+    def serialize_result(model_key, obj):
+        """
+        Convert a model instance into the dictionary rendered by the search templates
+        """
+        if model_key == 'lead':
+            return {
+                'type': 'Lead',
+                'id': obj.id,
+                'name': obj.name,
+                'email': obj.email,
+                'phone': obj.phone,
+                'location': obj.location,
+                'status': obj.get_status_display(),
+                'created_at': obj.created_at,
+                'detail_url': f'/lead/{obj.id}/'
+            }
+        if model_key == 'biometric':
+            return {
+                'type': 'Biometric',
+                'id': obj.id,
+                'name': obj.name,
+                'location': obj.location,
+                'status': obj.get_status_display(),
+                'created_at': obj.created_at,
+                'detail_url': f'/biometric/{obj.id}/'
+            }
+        return {
+            'type': 'Notification',
+            'id': obj.id,
+            'message': obj.message,
+            'type': obj.get_type_display(),
+            'is_read': 'Read' if obj.is_read else 'Unread',
+            'created_at': obj.created_at,
+            'detail_url': '/notifications/'
+        }
+
+    @staticmethod
+    def hydrate(pairs):
+        """
+        Load and serialize results from ordered (model key, id) pairs
+
+        Uses one query per model; rows deleted since the ids were collected are skipped.
+        """
+        ids_by_model = {}
+        for model_key, object_id in pairs:
+            ids_by_model.setdefault(model_key, []).append(object_id)
+
+        model_classes = {'lead': Lead, 'biometric': Biometric, 'notification': Notification}
+        objects = {
+            model_key: model_classes[model_key].objects.in_bulk(ids)
+            for model_key, ids in ids_by_model.items()
+        }
+
+        return [
+            SearchConfiguration.serialize_result(model_key, objects[model_key][object_id])
+            for model_key, object_id in pairs
+            if object_id in objects[model_key]
+        ]
+
+    @staticmethod
+    def advanced_search(query=None, model=None, filters=None, use_cache=True, mode='exact'):
+        """
+        Perform an advanced, configurable search across multiple models
         
-        # Search Notifications
-        if 'notification' in model:
-            notification_query = Notification.objects.all()
-            
-            # Global text search
-            if query:
-                notification_query = notification_query.filter(
-                    Q(message__icontains=query) | 
-                    Q(type__icontains=query)
-                )
-            
-            # Apply specific filters
-            for field, value in filters.items():
-                if field in ['type', 'is_read']:
-                    notification_query = notification_query.filter(**{f'{field}__iexact': value})
-            
-            results.extend([
-                {
-                    'type': 'Notification',
-                    'id': notification.id,
-                    'message': notification.message,
-                    'type': notification.get_type_display(),
-                    'is_read': 'Read' if notification.is_read else 'Unread',
-                    'created_at': notification.created_at,
-                    'detail_url': '/notifications/'
-                } for notification in notification_query
-            ])
+        Repeated searches are answered from the search result cache, which
+        stores the ordered ids and is invalidated by model write generations.
+
+        :param query: Global search term
+        :param model: Specific model to search ('lead', 'biometric', 'notification')
+        :param filters: Dictionary of specific field filters
+        :param use_cache: Set to False to bypass the search result cache
+        :param mode: 'exact' for substring matching, 'fuzzy' for typo-tolerant
+                     trigram matching ranked by similarity
+        :return: List of search results
+        """
+        models = SearchConfiguration.normalize_models(model)
+        fuzzy = mode == 'fuzzy' and bool(query)
+        if use_cache:
+            cache_key = search_result_cache.make_key(query, models, filters, mode if fuzzy else 'exact')
+            cached_ids = search_result_cache.get(cache_key)
+            if cached_ids is not None:
+                return SearchConfiguration.hydrate(cached_ids)
+
+        ranking = SearchConfiguration.fuzzy_ranking(query, models) if fuzzy else None
+
+        matches = []
+        querysets = SearchConfiguration.build_querysets(query, models, filters, ranking=ranking)
+        for model_key, queryset in querysets.items():
+            matches.extend(
+                (model_key, SearchConfiguration.serialize_result(model_key, obj)) for obj in queryset
+            )
         
         # Sort results by created_at
-        results.sort(key=lambda x: x.get('created_at', timezone.now()), reverse=True)
+        matches.sort(key=lambda x: x[1].get('created_at', timezone.now()), reverse=True)
+        if fuzzy:
+            # Best matches first; the stable sort keeps newest first among equal scores
+            matches.sort(key=lambda x: ranking.get((x[0], x[1]['id']), 0), reverse=True)
+
+        if use_cache:
+            search_result_cache.set(cache_key, [(model_key, result['id']) for model_key, result in matches])
         
-        return results
+        return [result for model_key, result in matches]
+
+    @staticmethod
+    def merged_search(query=None, model=None, filters=None, use_cache=True):
+        """
+        Lazy, database-paginated variant of advanced_search
+
+        The total and the ids of each requested page go through the search
+        result cache, keyed on the same model generations as advanced_search.
+
+        :param use_cache: Set to False to bypass the search result cache
+        :return: MergedSearchResults that can be handed straight to a Paginator
+        """
+        models = SearchConfiguration.normalize_models(model)
+        querysets = SearchConfiguration.build_querysets(query, models, filters)
+        cache_key = search_result_cache.make_key(query, models, filters, 'merged') if use_cache else None
+        return MergedSearchResults(querysets, cache_key)
+
+    # Columns written for each model by search exports
+    EXPORT_FIELDS = {
+        'lead': ['id', 'name', 'email', 'phone', 'location', 'status', 'created_at'],
+        'biometric': ['id', 'name', 'location', 'status', 'created_at'],
+        'notification': ['id', 'type', 'message', 'is_read', 'created_at'],
+    }
+
+    @staticmethod
+    def export_columns(model=None):
+        """
+        Ordered union of the export columns of the searched models, led by the model key
+        """
+        columns = ['model']
+        for model_key in SearchConfiguration.normalize_models(model):
+            columns.extend(
+                field for field in SearchConfiguration.EXPORT_FIELDS[model_key] if field not in columns
+            )
+        return columns
+
+    @staticmethod
+    def export_rows(query=None, model=None, filters=None, mode='exact', chunk_size=None, user=None):
+        """
+        Lazily yield every search match as a flat dictionary
+
+        Models are walked one after another, newest rows first, each with a
+        chunked server-side iterator, so nothing is materialized up front.
+
+        :param user: When given, notifications are limited to this user's own
+        """
+        models = SearchConfiguration.normalize_models(model)
+        ranking = None
+        if mode == 'fuzzy' and query:
+            ranking = SearchConfiguration.fuzzy_ranking(query, models)
+
+        querysets = SearchConfiguration.build_querysets(query, models, filters, ranking=ranking, user=user)
+        for model_key, queryset in querysets.items():
+            rows = iterate_values(
+                queryset.order_by('-created_at', '-id'),
+                SearchConfiguration.EXPORT_FIELDS[model_key],
+                chunk_size
+            )
+            for row in rows:
+                row['model'] = model_key
+                yield row
 
     @staticmethod
     def get_filter_suggestions(model=None):
@@ -159,13 +305,13 @@ class SearchConfiguration:
         if not model or model == 'lead':
             suggestions['lead'] = {
                 'status_options': dict(Lead.STATUS_CHOICES),
-                'locations': list(Lead.objects.values_list('location', flat=True).distinct()),
+                'locations': get_location_suggestions('lead'),
             }
         
         if not model or model == 'biometric':
             suggestions['biometric'] = {
                 'status_options': dict(Biometric.STATUS_CHOICES),
-                'locations': list(Biometric.objects.values_list('location', flat=True).distinct()),
+                'locations': get_location_suggestions('biometric'),
             }
         
         if not model or model == 'notification':
@@ -174,3 +320,65 @@ class SearchConfiguration:
             }
         
         return suggestions
+
+
+class MergedSearchResults:
+    """
+    Search results merged across models inside the database
+
+    Each model contributes an (id, created_at, model key) projection; the
+    projections are combined with UNION ALL, ordered by created_at and sliced
+    with LIMIT/OFFSET, so only the rows of the requested page are fetched and
+    turned into result dictionaries. With a cache key, the count and the ids
+    of every page are stored in the search result cache.
+    """
+    def __init__(self, querysets, cache_key=None):
+        self.querysets = querysets
+        self.cache_key = cache_key
+        self._count = None
+
+    def _stream(self):
+        projections = [
+            queryset.order_by().annotate(
+                result_model=Value(model_key, output_field=CharField())
+            ).values_list('id', 'created_at', 'result_model')
+            for model_key, queryset in self.querysets.items()
+        ]
+        if not projections:
+            return None
+        return projections[0].union(*projections[1:], all=True).order_by('-created_at', '-id')
+
+    def _cached(self, suffix, compute):
+        if self.cache_key is None:
+            return compute()
+        key = self.cache_key + suffix
+        value = search_result_cache.get(key)
+        if value is None:
+            value = compute()
+            search_result_cache.set(key, value)
+        return value
+
+    def count(self):
+        if self._count is None:
+            def compute():
+                stream = self._stream()
+                return stream.count() if stream is not None else 0
+            self._count = self._cached(('count',), compute)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        def compute():
+            stream = self._stream()
+            if stream is None:
+                return []
+            return [(model_key, object_id) for object_id, created_at, model_key in stream[index]]
+
+        pairs = self._cached(('page', index.start, index.stop), compute)
+        # Fetch the full rows for this page with one query per model
+        return SearchConfiguration.hydrate(pairs)
@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .caching import bump_generation
+
+# Text columns covered by the index for each searchable model
+INDEXED_FIELDS = {
+    'lead': ('name', 'email', 'phone', 'location'),
+    'biometric': ('name', 'location'),
+    'notification': ('message', 'type'),
+}
+
+
+def indexed_fields_changed(model_key, instance, created, update_fields=None):
+    """
+    Whether a save may have changed the indexed text of a row
+
+    Saves limited to other fields, such as status transitions, and saves
+    whose tracked indexed fields kept their values leave the index alone.
+    """
+    if created:
+        return True
+    fields = set(INDEXED_FIELDS[model_key])
+    if update_fields is not None and not fields & set(update_fields):
+        return False
+    if fields <= set(getattr(instance, 'tracked_fields', ())):
+        return bool(fields & instance.changed_fields())
+    return True
+
+
+def get_model(model_key):
+    """
+    Resolve a search model key ('lead', 'biometric', 'notification') to its model class
+    """
+    from .models import Lead, Biometric, Notification
+    return {'lead': Lead, 'biometric': Biometric, 'notification': Notification}[model_key]
+
+
+class ORMSearchIndex:
+    """
+    Fallback index that keeps the original icontains behaviour and stores nothing
+    """
+    name = 'orm'
+
+    def text_filter(self, model_key, query):
+        """
+        Build a Q object matching the query against every indexed field of the model
+        """
+        condition = Q()
+        for field in INDEXED_FIELDS[model_key]:
+            condition |= Q(**{f'{field}__icontains': query})
+        return condition
+
+    def update(self, model_key, instance):
+        pass
+
+    def update_many(self, model_key, instances):
+        pass
+
+    def remove(self, model_key, pk):
+        pass
+
+    def remove_many(self, model_key, pks):
+        pass
+
+    def rebuild(self, model_key, batch_size=1000):
+        return 0
+
+
+class FTS5SearchIndex(ORMSearchIndex):
+    """
+    SQLite FTS5 index using the trigram tokenizer, so MATCH keeps the
+    case-insensitive substring semantics of icontains without a table scan
+    """
+    name = 'fts5'
+
+    # The trigram tokenizer cannot match anything shorter than three characters
+    MIN_QUERY_LENGTH = 3
+
+    @staticmethod
+    def table_name(model_key):
+        return f'leads_{model_key}_fts'
+
+    @classmethod
+    def is_supported(cls):
+        """
+        Check that the database is SQLite and the FTS5 tables have been migrated
+        """
+        if connection.vendor != 'sqlite':
+            return False
+        tables = set(connection.introspection.table_names())
+        return all(cls.table_name(key) in tables for key in INDEXED_FIELDS)
+
+    def text_filter(self, model_key, query):
+        if len(query) < self.MIN_QUERY_LENGTH:
+            return super().text_filter(model_key, query)
+
+        table = self.table_name(model_key)
+        # Quote the query as a single FTS5 string so operators are matched literally
+        match = '"{}"'.format(query.replace('"', '""'))
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match]))
+
+    def _rows(self, model_key, instances):
+        fields = INDEXED_FIELDS[model_key]
+        return [
+            [instance.pk] + [getattr(instance, field) or '' for field in fields]
+            for instance in instances
+        ]
+
+    def _write(self, model_key, rows):
+        if not rows:
+            return
+        table = self.table_name(model_key)
+        columns = ', '.join(INDEXED_FIELDS[model_key])
+        placeholders = ', '.join(['%s'] * (len(INDEXED_FIELDS[model_key]) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [[row[0]] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, {columns}) VALUES ({placeholders})',
+                rows
+            )
+
+    def update(self, model_key, instance):
+        self._write(model_key, self._rows(model_key, [instance]))
+
+    def update_many(self, model_key, instances):
+        self._write(model_key, self._rows(model_key, instances))
+
+    def remove(self, model_key, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table_name(model_key)} WHERE rowid = %s', [pk])
+
+    def remove_many(self, model_key, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table_name(model_key)} WHERE rowid = %s', [[pk] for pk in pks])
+
+    def rebuild(self, model_key, batch_size=1000):
+        """
+        Repopulate the index for a model, walking the table in primary key batches
+
+        The DELETE and the refill run in one transaction, so searches keep
+        seeing the old index until the new one is committed and a failed
+        rebuild leaves it untouched.
+        """
+        model = get_model(model_key)
+        fields = INDEXED_FIELDS[model_key]
+
+        indexed = 0
+        last_id = 0
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table_name(model_key)}')
+
+            while True:
+                batch = list(
+                    model.objects.filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', *fields)[:batch_size]
+                )
+                if not batch:
+                    break
+
+                rows = [[row[0]] + [value or '' for value in row[1:]] for row in batch]
+                self._write(model_key, rows)
+
+                indexed += len(batch)
+                last_id = batch[-1][0]
+
+        # Rows that were missing from the index may now match cached searches
+        bump_generation(model_key)
+        return indexed
+
+
+_search_index = None
+
+
+def get_search_index():
+    """
+    Return the configured search index backend
+
+    SEARCH_INDEX_BACKEND may be 'fts5', 'orm' or 'auto' (FTS5 when available)
+    """
+    global _search_index
+    if _search_index is None:
+        backend = getattr(settings, 'SEARCH_INDEX_BACKEND', 'auto')
+        if backend == 'fts5' or (backend == 'auto' and FTS5SearchIndex.is_supported()):
+            _search_index = FTS5SearchIndex()
+        else:
+            _search_index = ORMSearchIndex()
+    return _search_index
@@ -1,48 +1,145 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Lead, Biometric, Notification
+from .models import Lead, Biometric, Notification, BroadcastNotification
+from .search_index import get_search_index, indexed_fields_changed
+from . import counters
+from .caching import bump_generation, location_changed, location_suggestions
+from .autocomplete import suggestion_index
+from .fuzzy import fuzzy_index
+from .notifications import notification_writer, publish_broadcast, publish_new_notifications
+from .transitions import default_owner_id, forget_default_owner
 
 @receiver(post_save, sender=Lead)
 def create_lead_notification(sender, instance, created, **kwargs):
     """
-    Create a notification when a lead is created or its status changes
+    Queue a notification when a lead is created or its status changes
     """
     if created:
         # Notification for lead assignment
-        Notification.objects.create(
-            user=instance.user or User.objects.first(),
+        notification_writer.add(
+            user=instance.user_id or default_owner_id(),
             type='lead_assigned',
             message=f'New lead assigned: {instance.name}',
             lead=instance
         )
-    elif hasattr(kwargs, 'update_fields') and 'status' in kwargs['update_fields']:
+    elif 'status' in instance.changed_fields():
         # Notification for lead status change
-        Notification.objects.create(
-            user=instance.user or User.objects.first(),
+        notification_writer.add(
+            user=instance.user_id or default_owner_id(),
             type='lead_status_change',
             message=f'Lead status changed to {instance.get_status_display()}',
-            lead=instance
+            lead=instance,
+            verb=instance.status
         )
 
+    location_changed('lead', instance, created)
+    if indexed_fields_changed('lead', instance, created, kwargs.get('update_fields')):
+        get_search_index().update('lead', instance)
+        suggestion_index.record_save('lead', instance)
+        fuzzy_index.record_save('lead', instance)
+
 @receiver(post_save, sender=Biometric)
 def create_biometric_notification(sender, instance, created, **kwargs):
     """
-    Create a notification when a biometric is created or its status changes
+    Queue a notification when a biometric is created or its status changes
     """
     if created:
         # Notification for biometric creation
-        Notification.objects.create(
-            user=instance.user,
+        notification_writer.add(
+            user=instance.user_id,
             type='biometric_status_change',
             message=f'New biometric record created for {instance.name}',
-            biometric=instance
+            biometric=instance,
+            verb='created'
         )
-    elif hasattr(kwargs, 'update_fields') and 'status' in kwargs['update_fields']:
+    elif 'status' in instance.changed_fields():
         # Notification for biometric status change
-        Notification.objects.create(
-            user=instance.user,
+        notification_writer.add(
+            user=instance.user_id,
             type='biometric_status_change',
             message=f'Biometric status changed to {instance.get_status_display()}',
-            biometric=instance
+            biometric=instance,
+            verb=instance.status
         )
+
+    location_changed('biometric', instance, created)
+    if indexed_fields_changed('biometric', instance, created, kwargs.get('update_fields')):
+        get_search_index().update('biometric', instance)
+        suggestion_index.record_save('biometric', instance)
+        fuzzy_index.record_save('biometric', instance)
+
+@receiver(post_save, sender=Notification)
+def index_notification(sender, instance, created, **kwargs):
+    """
+    Keep the search index in sync with saved notifications
+    """
+    if indexed_fields_changed('notification', instance, created, kwargs.get('update_fields')):
+        get_search_index().update('notification', instance)
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    """
+    Send new notifications to the user's open notification streams
+    """
+    if created:
+        publish_new_notifications([instance])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, created=True, **kwargs):
+    """
+    A created or deleted user may change who owns records saved without an owner
+    """
+    if created:
+        forget_default_owner()
+
+@receiver(post_save, sender=BroadcastNotification)
+@receiver(post_delete, sender=BroadcastNotification)
+def announce_broadcast(sender, instance, created=False, **kwargs):
+    """
+    Expire every cached unread count when broadcasts change, and push new ones
+    """
+    bump_generation('broadcast')
+    if created:
+        publish_broadcast(instance)
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Biometric)
+@receiver(post_delete, sender=Notification)
+def remove_from_search_index(sender, instance, **kwargs):
+    """
+    Drop deleted records from the search index
+    """
+    get_search_index().remove(sender._meta.model_name, instance.pk)
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Biometric)
+@receiver(post_delete, sender=Notification)
+def update_status_counters_on_delete(sender, instance, **kwargs):
+    """
+    Keep the status counters in sync with deleted records
+    """
+    counters.record_delete(sender._meta.model_name, instance)
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Biometric)
+def invalidate_location_suggestions(sender, instance, **kwargs):
+    """
+    A deleted record may have held the last occurrence of its location
+    """
+    location_suggestions[sender._meta.model_name].invalidate()
+    suggestion_index.record_delete(sender._meta.model_name, instance)
+    fuzzy_index.record_delete(sender._meta.model_name, instance)
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Biometric)
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Biometric)
+@receiver(post_delete, sender=Notification)
+def invalidate_search_results(sender, **kwargs):
+    """
+    Any write makes cached search results for the model stale
+    """
+    bump_generation(sender._meta.model_name)
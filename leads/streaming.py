@@ -0,0 +1,93 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Content types of the supported export formats
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+class Echo:
+    """
+    File-like object whose write() hands the value back, so csv.writer can format single rows
+    """
+    def write(self, value):
+        return value
+
+
+def iterate_values(queryset, fields, chunk_size=None):
+    """
+    Stream rows of a queryset as dictionaries using a server-side chunked cursor
+
+    The queryset result cache is never filled, so memory stays bounded by
+    one chunk however many rows match.
+    """
+    return queryset.values(*fields).iterator(chunk_size=chunk_size or export_chunk_size())
+
+
+def ndjson_lines(rows):
+    """
+    Encode dictionaries as newline-delimited JSON
+    """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows, columns):
+    """
+    Encode dictionaries as CSV lines, header first; keys missing from a row are left empty
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row.get(column)) for column in columns])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def sse_event(event, data, retry=None):
+    """
+    Format one Server-Sent Events message
+
+    :param retry: Optional reconnection delay in milliseconds for the client
+    """
+    message = f'retry: {retry}\n' if retry else ''
+    return message + f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+def streaming_export_response(rows, export_format, filename, columns=None):
+    """
+    Wrap a row iterator in a StreamingHttpResponse of the requested format
+
+    :param rows: Iterator of dictionaries, consumed lazily while the response is sent
+    :param export_format: 'ndjson' or 'csv'
+    :param filename: Download name without extension
+    :param columns: CSV column order (required for CSV)
+    """
+    if export_format == 'csv':
+        lines = csv_lines(rows, columns)
+    else:
+        export_format = 'ndjson'
+        lines = ndjson_lines(rows)
+
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    # Ask proxies such as nginx not to buffer the body so rows reach the client as they are produced
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,8 +1,40 @@
-from django.test import TestCase, Client
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Lead, Biometric, Notification
+from .models import Lead, Biometric, Notification, ArchivedNotification, BroadcastReadMarker
 from .forms import LeadForm
+from .search_config import SearchConfiguration
+from .search_index import FTS5SearchIndex, get_search_index
+from .pagination import KeysetPaginator
+from . import counters
+from .caching import SearchResultCache, search_result_cache
+from .autocomplete import PrefixIndex, suggestion_index
+from .fuzzy import TrigramIndex, fuzzy_index
+from .normalization import normalize_phone
+from .pubsub import NotificationBroker, notification_broker
+from .notifications import notification_writer, send_broadcast
+from .retention import archive_notifications
+from .dedupe import EmailDeduplicator, email_taken
+from .imports import LeadImporter, csv_blocks, read_rows
+from .resources import LeadResource
+from .reports import generate_weekly_reports, last_full_week, split_user_ranges, week_bounds
+from .transitions import InvalidTransition, biometric_states, bulk_transition_leads, default_owner_id, lead_states
 
 class LeadViewTests(TestCase):
     def setUp(self):
@@ -200,6 +232,1725 @@ class GlobalSearchTests(TestCase):
         response = self.client.get(url, {'q': ''})
         self.assertEqual(response.status_code, 200)
 
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        """
+        Set up test data for the full-text search index
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.lead = Lead.objects.create(
+            name='Jonathan Smith',
+            email='jonathan@example.com',
+            location='Springfield',
+            user=self.user
+        )
+
+    def search_lead_ids(self, query):
+        results = SearchConfiguration.advanced_search(query=query, model='lead')
+        return [result['id'] for result in results]
+
+    def test_index_tracks_saves_and_deletes(self):
+        """
+        Test that the index follows creates, updates and deletes
+        """
+        self.assertEqual(get_search_index().name, 'fts5')
+        self.assertEqual(self.search_lead_ids('ATHAN sm'), [self.lead.id])
+        self.assertEqual(self.search_lead_ids('ring'), [self.lead.id])
+
+        self.lead.location = 'Shelbyville'
+        self.lead.save()
+        self.assertEqual(self.search_lead_ids('ring'), [])
+        self.assertEqual(self.search_lead_ids('helby'), [self.lead.id])
+
+        lead_id = self.lead.id
+        self.lead.delete()
+        self.assertEqual(self.search_lead_ids('helby'), [])
+        self.assertNotIn(lead_id, self.search_lead_ids('Jonathan'))
+
+    def test_short_queries_fall_back_to_orm(self):
+        """
+        Test that queries below the trigram length still match
+        """
+        self.assertEqual(self.search_lead_ids('sm'), [self.lead.id])
+
+    def test_rebuild_command(self):
+        """
+        Test that the rebuild command restores rows written without signals
+        """
+        Lead.objects.bulk_create([
+            Lead(name=f'Bulk Lead {i}', email=f'bulk{i}@example.com', user=self.user)
+            for i in range(5)
+        ])
+        self.assertEqual(self.search_lead_ids('Bulk Lead'), [])
+
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(self.search_lead_ids('Bulk Lead')), 5)
+        self.assertEqual(self.search_lead_ids('Jonathan'), [self.lead.id])
+
+    def test_failed_rebuild_keeps_index(self):
+        """
+        Test that a rebuild failing part way leaves the previous index in place
+        """
+        class FailingIndex(FTS5SearchIndex):
+            def _write(self, model_key, rows):
+                raise RuntimeError('disk full')
+
+        with self.assertRaises(RuntimeError):
+            FailingIndex().rebuild('lead', batch_size=1)
+        self.assertEqual(self.search_lead_ids('Jonathan'), [self.lead.id])
+
+class MergedSearchTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads and biometrics with interleaved creation times
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        for i in range(15):
+            lead = Lead.objects.create(
+                name=f'Merged Lead {i}',
+                email=f'merged{i}@example.com',
+                user=self.user
+            )
+            Biometric.objects.create(name=f'Merged Biometric {i}', user=self.user, location='Test City')
+
+    def test_merged_search_matches_advanced_search(self):
+        """
+        Test that database pagination returns the same ordering as the in-memory search
+        """
+        expected = SearchConfiguration.advanced_search(query='Merged', model=['lead', 'biometric'])
+        merged = SearchConfiguration.merged_search(query='Merged', model=['lead', 'biometric'])
+
+        self.assertEqual(merged.count(), 30)
+        page = merged[10:20]
+        self.assertEqual(
+            [(r['type'], r['id']) for r in page],
+            [(r['type'], r['id']) for r in expected[10:20]]
+        )
+
+    def test_global_search_fetches_one_page(self):
+        """
+        Test that the search view only builds the requested page
+        """
+        response = self.client.get(reverse('global_search'), {'query': 'Merged', 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_results'], 30)
+        self.assertEqual(len(response.context['results'].object_list), 10)
+        self.assertTrue(response.context['is_paginated'])
+
+    def test_prefixed_filters(self):
+        """
+        Test that model-prefixed filters only constrain their own model
+        """
+        Lead.objects.filter(name='Merged Lead 3').update(status='approved')
+        results = SearchConfiguration.merged_search(
+            query='Merged', model=['lead', 'biometric'], filters={'lead_status': 'approved'}
+        )
+        self.assertEqual(results.count(), 16)
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads with duplicate and missing sort values
+        """
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        locations = ['Austin', None, 'Boston', 'Austin', None, 'Chicago', 'Boston']
+        for i in range(13):
+            Lead.objects.create(
+                name=f'Lead {i % 4}',
+                email=f'lead{i}@example.com',
+                location=locations[i % len(locations)],
+                user=self.user
+            )
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_walks_every_sort_in_both_directions(self):
+        """
+        Test that following cursors forwards and backwards visits every row once
+        """
+        queryset = Lead.objects.filter(status='new')
+        for sort_field in ['id', 'name', 'location', 'created_at', 'email']:
+            for descending in [True, False]:
+                paginator = KeysetPaginator(queryset, 5, sort_field=sort_field, descending=descending)
+                pages = self.walk(paginator)
+                ids = [lead.id for page in pages for lead in page]
+
+                expected = list(queryset.order_by(*paginator._ordering(descending)).values_list('id', flat=True))
+                self.assertEqual(ids, expected, (sort_field, descending))
+
+                # Walk back from the last page using previous cursors
+                page = pages[-1]
+                back = [[lead.id for lead in page]]
+                while page.has_previous():
+                    page = paginator.page(page.previous_cursor)
+                    back.insert(0, [lead.id for lead in page])
+                self.assertEqual([i for chunk in back for i in chunk], expected, (sort_field, descending))
+
+    def test_home_cursor_mode(self):
+        """
+        Test that the home view serves cursor pages and ignores bad cursors
+        """
+        response = self.client.get(reverse('home'), {'cursor': '', 'sort': 'name', 'order': 'asc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['use_cursor'])
+        self.assertEqual(len(response.context['new_leads']), 13)
+
+        response = self.client.get(reverse('home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['new_leads']), 13)
+
+class StatusCounterTests(TestCase):
+    def setUp(self):
+        """
+        Set up two users with leads in several states
+        """
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.other = User.objects.create_user(username='otheruser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        # Notifications for the new leads are written when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leads = [
+                Lead.objects.create(name=f'Lead {i}', email=f'lead{i}@example.com', user=self.user)
+                for i in range(4)
+            ]
+            Lead.objects.create(name='Other Lead', email='other@example.com', user=self.other)
+
+    def assertCountersAccurate(self):
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+
+    def test_counters_follow_saves_and_deletes(self):
+        """
+        Test that single-row saves and deletes keep the counters exact
+        """
+        self.assertEqual(counters.get_count('lead', 'new'), 5)
+        self.assertEqual(counters.get_counts('lead', user=self.user)['total'], 4)
+
+        self.leads[0].status = 'rejected'
+        self.leads[0].save()
+        self.leads[1].user = self.other
+        self.leads[1].save()
+        Biometric.objects.create(name='Bio', location='Test City', user=self.user, status='approved')
+        self.leads[2].delete()
+
+        self.assertEqual(counters.get_counts('lead', user=self.user), {'new': 1, 'rejected': 1, 'total': 2})
+        self.assertEqual(counters.get_count('biometric', 'approved', user=self.user), 1)
+        self.assertCountersAccurate()
+
+    def test_bulk_status_update(self):
+        """
+        Test that set-based status updates move the counters in one step
+        """
+        updated = counters.update_status(Notification.objects.filter(user=self.user), True)
+        self.assertEqual(updated, 4)
+        self.assertEqual(counters.get_count('notification', 'unread', user=self.user), 0)
+        self.assertEqual(counters.get_count('notification', 'read', user=self.user), 4)
+        self.assertCountersAccurate()
+
+    def test_reconcile_repairs_drift(self):
+        """
+        Test that the reconcile command fixes counters after an untracked write
+        """
+        Lead.objects.filter(user=self.other).update(status='approved')
+        self.assertEqual(len(counters.reconcile(dry_run=True)), 4)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Repaired 4 drifted counters', out.getvalue())
+        self.assertCountersAccurate()
+
+    def test_user_details_reads_counters(self):
+        """
+        Test that the user details page reads one counter query for biometric stats
+        """
+        Biometric.objects.create(name='Bio', location='Test City', user=self.user)
+        response = self.client.get(reverse('user_details'))
+        self.assertEqual(response.context['biometric_status_count']['total'], 1)
+        self.assertEqual(response.context['biometric_status_count']['pending'], 1)
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user with unread notifications
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        self.notifications = [
+            Notification.objects.create(user=self.user, type='system_alert', message=f'Alert {i}')
+            for i in range(3)
+        ]
+
+    def test_count_is_cached(self):
+        """
+        Test that repeated reads are served without queries
+        """
+        self.assertEqual(counters.unread_count(self.user), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.unread_count(self.user), 3)
+
+    def test_mark_read_updates_count(self):
+        """
+        Test that marking one notification read adjusts the count
+        """
+        counters.unread_count(self.user)
+        response = self.client.get(
+            reverse('mark_notification_read', args=[self.notifications[0].id]),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json()['unread_count'], 2)
+
+    def test_mark_all_read_updates_count(self):
+        """
+        Test that marking everything read zeroes the count
+        """
+        counters.unread_count(self.user)
+        self.client.get(reverse('mark_all_notifications_read'))
+        self.assertEqual(counters.unread_count(self.user), 0)
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+    def test_reconcile_repairs_cached_count(self):
+        """
+        Test that the reconcile command repairs drift and expires the cached value
+        """
+        Notification.objects.filter(id=self.notifications[0].id).update(is_read=True)
+        self.assertEqual(counters.unread_count(self.user), 3)
+
+        call_command('reconcile_counters', model=['notification'], stdout=StringIO())
+        self.assertEqual(counters.unread_count(self.user), 2)
+
+class ReadOnlyNotificationTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user without notifications
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='idleuser', password='12345')
+        self.client.login(username='idleuser', password='12345')
+
+    def test_sign_up_seeds_welcome_notifications(self):
+        """
+        Test that welcome notifications are created once at sign-up
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('signup'), {
+                'username': 'newuser', 'password1': 'S3cure-pass-123', 'password2': 'S3cure-pass-123'
+            })
+        new_user = User.objects.get(username='newuser')
+        self.assertEqual(new_user.notifications.count(), 2)
+        self.assertEqual(counters.unread_count(new_user), 2)
+
+    def test_get_traffic_does_not_insert(self):
+        """
+        Test that polling the badge and listing notifications never writes
+        """
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(20):
+                response = self.client.get(reverse('unread_notifications_count'))
+                self.assertEqual(response.json()['unread_count'], 0)
+                self.client.get(reverse('notifications_list'))
+
+        inserts = [query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('INSERT')]
+        self.assertEqual(inserts, [])
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user with one unread notification
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        Notification.objects.create(user=self.user, type='system_alert', message='Existing alert')
+
+    def create_committed_notification(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, type='lead_assigned', message='Pushed alert')
+
+    async def test_broker_delivers_across_threads(self):
+        """
+        Test that events published from a worker thread reach the subscriber
+        """
+        broker = NotificationBroker()
+        with broker.subscribe(7) as queue:
+            thread = threading.Thread(target=broker.publish, args=(7, 'unread_count', {'unread_count': 1}))
+            thread.start()
+            thread.join()
+            self.assertEqual(await asyncio.wait_for(queue.get(), 1), ('unread_count', {'unread_count': 1}))
+        self.assertFalse(broker.has_subscribers(7))
+
+    async def test_new_notification_is_published(self):
+        """
+        Test that creating a notification pushes it and the new unread count
+        """
+        with notification_broker.subscribe(self.user.pk) as queue:
+            await sync_to_async(self.create_committed_notification)()
+            events = dict([
+                await asyncio.wait_for(queue.get(), 1),
+                await asyncio.wait_for(queue.get(), 1),
+            ])
+        self.assertEqual(events['notification']['message'], 'Pushed alert')
+        self.assertEqual(events['unread_count'], {'unread_count': 2})
+
+    async def test_asgi_stream(self):
+        """
+        Test that the stream opens with the unread count and relays published events
+        """
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = aiter(response.streaming_content)
+        self.assertIn(b'"unread_count": 1', await anext(events))
+
+        notification_broker.publish(self.user.pk, 'unread_count', {'unread_count': 5})
+        self.assertIn(b'"unread_count": 5', await asyncio.wait_for(anext(events), 1))
+        await events.aclose()
+
+    async def test_broadcast_raises_stream_counts(self):
+        """
+        Test that a broadcast is one broker event and each stream raises its own count without queries
+        """
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('notification_stream'))
+        events = aiter(response.streaming_content)
+        self.assertIn(b'"unread_count": 1', await anext(events))
+
+        def broadcast():
+            with self.captureOnCommitCallbacks() as callbacks:
+                send_broadcast('system_alert', 'Maintenance tonight')
+            with self.assertNumQueries(0):
+                for callback in callbacks:
+                    callback()
+
+        await sync_to_async(broadcast)()
+        self.assertIn(b'Maintenance tonight', await asyncio.wait_for(anext(events), 1))
+        self.assertIn(b'"unread_count": 2', await asyncio.wait_for(anext(events), 1))
+        await events.aclose()
+        self.assertEqual(await sync_to_async(counters.unread_count)(self.user), 2)
+
+    def test_wsgi_stream_sends_single_event(self):
+        """
+        Test that WSGI clients get the current count and a reconnection delay
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notification_stream'))
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('retry: 30000', body)
+        self.assertIn('"unread_count": 1', body)
+
+class NotificationWriterTests(TestCase):
+    def setUp(self):
+        """
+        Set up a logged in user
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+    def test_notifications_written_in_one_insert_on_commit(self):
+        """
+        Test that notifications raised in a transaction share one INSERT after commit
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for i in range(5):
+                    Lead.objects.create(name=f'Buffered {i}', email=f'buffered{i}@example.com', user=self.user)
+                self.assertEqual(notification_writer.pending(), 5)
+            self.assertFalse(Notification.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "leads_notification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Notification.objects.filter(type='lead_assigned').count(), 5)
+        self.assertEqual(counters.unread_count(self.user), 5)
+
+    def test_rollback_discards_notifications(self):
+        """
+        Test that a rolled back transaction leaves no queued notifications behind
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Lead.objects.create(name='Rolled Back', email='rolled@example.com', user=self.user)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertEqual(notification_writer.pending(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_buffer_outlives_rolled_back_savepoint(self):
+        """
+        Test that events queued after a rolled back savepoint get a new buffer and are written
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        Lead.objects.create(name='Rolled Back', email='rolled@example.com', user=self.user)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.assertEqual(notification_writer.pending(), 0)
+                Lead.objects.create(name='Kept', email='kept@example.com', user=self.user)
+                self.assertEqual(notification_writer.pending(), 1)
+
+        self.assertEqual([n.message for n in Notification.objects.all()], ['New lead assigned: Kept'])
+
+    def test_rolled_back_savepoint_discards_its_events(self):
+        """
+        Test that events queued in a rolled back savepoint are dropped while the enclosing block's are written
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                lead = Lead.objects.create(name='Kept', email='kept@example.com', user=self.user)
+                try:
+                    with transaction.atomic():
+                        lead.status = 'in_progress'
+                        lead.save()
+                        self.assertEqual(notification_writer.pending(), 2)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.assertEqual(notification_writer.pending(), 1)
+
+        self.assertEqual([n.type for n in Notification.objects.all()], ['lead_assigned'])
+
+    def test_create_lead_writes_single_assignment(self):
+        """
+        Test that create_lead and the post_save receiver produce one lead_assigned row
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                lead = Lead.objects.create(name='Dedupe', email='dedupe@example.com', user=self.user)
+                notification_writer.add(self.user, 'lead_assigned', 'New lead created: Dedupe', lead=lead)
+
+        notifications = Notification.objects.filter(lead=lead, type='lead_assigned')
+        self.assertEqual([n.message for n in notifications], ['New lead created: Dedupe'])
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        """
+        Set up old and recent, read and unread notifications
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        for i in range(5):
+            Notification.objects.create(user=self.user, type='lead_assigned', message=f'Old read {i}', is_read=True)
+        Notification.objects.create(user=self.user, type='lead_assigned', message='Old unread')
+        Notification.objects.create(user=self.user, type='system_alert', message='Old alert', is_read=True)
+        Notification.objects.create(
+            user=self.user, type='lead_status_change', message='Old merged', is_read=True,
+            occurrences=3, related_objects=[{'lead': 1}, {'lead': 2}, {'lead': 3}]
+        )
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=120))
+        Notification.objects.create(user=self.user, type='lead_assigned', message='Recent read', is_read=True)
+
+    def test_archives_expired_read_notifications_in_chunks(self):
+        """
+        Test that only expired read notifications move, and counters stay exact
+        """
+        out = StringIO()
+        call_command('archive_notifications', chunk_size=2, stdout=out)
+        self.assertIn('Archived 7 notifications', out.getvalue())
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list('message', flat=True)),
+            ['Old unread', 'Recent read']
+        )
+        self.assertEqual(ArchivedNotification.objects.filter(user=self.user).count(), 7)
+        merged = ArchivedNotification.objects.get(message='Old merged')
+        self.assertEqual(merged.occurrences, 3)
+        self.assertEqual(merged.related_objects, [{'lead': 1}, {'lead': 2}, {'lead': 3}])
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+        self.assertEqual(counters.unread_count(self.user), 1)
+
+    @override_settings(NOTIFICATION_RETENTION_DAYS={'system_alert': None})
+    def test_policy_can_keep_a_type(self):
+        """
+        Test that a None policy keeps a type in the hot table
+        """
+        results = archive_notifications()
+        self.assertEqual(results['lead_assigned'], 5)
+        self.assertNotIn('system_alert', results)
+        self.assertTrue(Notification.objects.filter(type='system_alert').exists())
+
+    def test_dry_run_moves_nothing(self):
+        """
+        Test that a dry run only counts
+        """
+        self.assertEqual(archive_notifications(dry_run=True), {
+            'lead_assigned': 5, 'lead_status_change': 1, 'biometric_status_change': 0,
+            'weekly_report': 0, 'system_alert': 1
+        })
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_archive_view(self):
+        """
+        Test browsing and filtering the archive
+        """
+        archive_notifications()
+        response = self.client.get(reverse('notification_archive'), {'type': 'system_alert'})
+        self.assertEqual([n.message for n in response.context['notifications']], ['Old alert'])
+
+class RecentNotificationsTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user with more notifications than the dropdown shows
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        for i in range(12):
+            Notification.objects.create(user=self.user, type='system_alert', message=f'Alert {i}', is_read=i < 4)
+
+    def test_recent_json(self):
+        """
+        Test that the dropdown gets the latest notifications and unread count as JSON
+        """
+        response = self.client.get(reverse('notifications_list'), {'recent': 'true', 'limit': 5})
+        data = response.json()
+        self.assertEqual(len(data['notifications']), 5)
+        self.assertEqual(data['notifications'][0]['message'], 'Alert 11')
+        self.assertEqual(data['unread_count'], 8)
+
+    def test_recent_json_query_count(self):
+        """
+        Test that a warm request runs a single notification query besides the session lookup
+        """
+        counters.unread_count(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('notifications_list'), {'recent': 'true'})
+        notification_queries = [q['sql'] for q in queries if 'leads_notification' in q['sql']]
+        self.assertEqual(len(notification_queries), 1)
+        self.assertIn('LIMIT 10', notification_queries[0])
+
+class BroadcastNotificationTests(TestCase):
+    def setUp(self):
+        """
+        Set up several users and one personal notification
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.others = [User.objects.create_user(username=f'user{i}', password='12345') for i in range(5)]
+        self.client.login(username='testuser', password='12345')
+        Notification.objects.create(user=self.user, type='lead_assigned', message='Personal')
+
+    def test_broadcast_is_stored_once(self):
+        """
+        Test that a broadcast writes one row and reaches every existing user
+        """
+        with CaptureQueriesContext(connection) as queries:
+            send_broadcast('system_alert', 'Maintenance tonight')
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT')]), 1)
+
+        self.assertEqual(counters.unread_count(self.user), 2)
+        for other in self.others:
+            self.assertEqual(counters.unread_count(other), 1)
+
+        late = User.objects.create_user(username='latecomer', password='12345')
+        self.assertEqual(counters.unread_count(late), 0)
+
+    def test_list_merges_broadcasts(self):
+        """
+        Test that the list and dropdown show broadcasts alongside personal notifications
+        """
+        send_broadcast('system_alert', 'Maintenance tonight')
+
+        response = self.client.get(reverse('notifications_list'))
+        self.assertEqual(response.context['total_notifications'], 2)
+        self.assertEqual(
+            [n.message for n in response.context['notifications']],
+            ['Maintenance tonight', 'Personal']
+        )
+
+        data = self.client.get(reverse('notifications_list'), {'recent': 'true'}).json()
+        self.assertEqual([n['is_broadcast'] for n in data['notifications']], [True, False])
+
+    def test_read_markers(self):
+        """
+        Test that reading broadcasts only writes markers for the reader
+        """
+        first = send_broadcast('system_alert', 'First')
+        send_broadcast('weekly_report', 'Second')
+
+        response = self.client.get(
+            reverse('mark_broadcast_read', args=[first.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json()['unread_count'], 2)
+
+        self.client.get(reverse('mark_all_notifications_read'))
+        self.assertEqual(counters.unread_count(self.user), 0)
+        self.assertEqual(BroadcastReadMarker.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(counters.unread_count(self.others[0]), 2)
+
+class NotificationCoalescingTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user with pending biometrics
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.biometrics = Biometric.objects.bulk_create([
+            Biometric(name=f'Bio {i}', location='Pune', user=self.user) for i in range(6)
+        ])
+
+    def status_events(self, biometrics, status='approved'):
+        return [
+            Notification(user=self.user, type='biometric_status_change', verb=status,
+                         message=f'Biometric status changed to {status.title()}', biometric=biometric)
+            for biometric in biometrics
+        ]
+
+    def committed_write(self, biometrics):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification_writer.write(self.status_events(biometrics))
+
+    def test_events_in_one_write_become_one_row(self):
+        """
+        Test that a burst of same-type events is stored as one aggregate
+        """
+        notification_writer.write(self.status_events(self.biometrics[:4]))
+
+        notification = Notification.objects.get(type='biometric_status_change')
+        self.assertEqual(notification.occurrences, 4)
+        self.assertEqual(
+            notification.related_objects,
+            [{'biometric': biometric.id} for biometric in self.biometrics[:4]]
+        )
+        self.assertEqual(counters.unread_count(self.user), 1)
+
+    def test_later_events_join_the_open_aggregate(self):
+        """
+        Test that events within the window update the unread aggregate instead of inserting
+        """
+        notification_writer.write(self.status_events(self.biometrics[:2]))
+        with CaptureQueriesContext(connection) as queries:
+            notification_writer.write(self.status_events(self.biometrics[2:]))
+        self.assertFalse([q for q in queries if q['sql'].startswith('INSERT INTO "leads_notification"')])
+
+        notification = Notification.objects.get(type='biometric_status_change')
+        self.assertEqual(notification.occurrences, 6)
+        self.assertEqual(notification.message, 'Biometric status changed to Approved (and 5 more)')
+        self.assertEqual(counters.reconcile(['notification'], dry_run=True), [])
+
+    def test_read_or_expired_aggregates_are_not_reused(self):
+        """
+        Test that read rows and rows outside the window start a new aggregate
+        """
+        notification_writer.write(self.status_events(self.biometrics[:2]))
+        Notification.objects.update(is_read=True)
+        notification_writer.write(self.status_events(self.biometrics[2:3]))
+        Notification.objects.filter(is_read=False).update(created_at=timezone.now() - timedelta(hours=1))
+        notification_writer.write(self.status_events(self.biometrics[3:4]))
+
+        self.assertEqual(Notification.objects.filter(type='biometric_status_change').count(), 3)
+
+    def test_verbs_are_not_merged(self):
+        """
+        Test that approvals and rejections stay in separate aggregates
+        """
+        notification_writer.write(self.status_events(self.biometrics[:2]))
+        notification_writer.write(self.status_events(self.biometrics[2:4], status='rejected'))
+        notification_writer.write(self.status_events(self.biometrics[4:], status='rejected'))
+
+        self.assertEqual(
+            dict(Notification.objects.values_list('verb', 'occurrences')),
+            {'approved': 2, 'rejected': 4}
+        )
+        self.assertEqual(
+            Notification.objects.get(verb='rejected').message, 'Biometric status changed to Rejected (and 3 more)'
+        )
+
+    def test_merging_moves_the_aggregate_to_the_latest_event(self):
+        """
+        Test that an aggregate takes the time of the event that joined it
+        """
+        notification_writer.write(self.status_events(self.biometrics[:1]))
+        earlier = timezone.now() - timedelta(minutes=5)
+        Notification.objects.update(created_at=earlier)
+        notification_writer.write(self.status_events(self.biometrics[1:2]))
+
+        notification = Notification.objects.get()
+        self.assertGreater(notification.created_at, earlier + timedelta(minutes=4))
+        self.assertFalse(notification.is_read)
+
+    async def test_merged_rows_are_published_as_updates(self):
+        """
+        Test that streams receive an aggregate once as new and then as updates
+        """
+        with notification_broker.subscribe(self.user.pk) as queue:
+            await sync_to_async(self.committed_write)(self.biometrics[:1])
+            await sync_to_async(self.committed_write)(self.biometrics[1:2])
+            events = []
+            while True:
+                try:
+                    events.append(await asyncio.wait_for(queue.get(), 0.2))
+                except asyncio.TimeoutError:
+                    break
+        self.assertEqual(
+            [event for event, data in events if event != 'unread_count'], ['notification', 'notification_update']
+        )
+        self.assertEqual(events[-1][1]['occurrences'], 2)
+
+class WeeklyReportTests(TestCase):
+    def setUp(self):
+        """
+        Set up two users with activity in the reported week
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.idle = User.objects.create_user(username='idleuser', password='12345')
+        self.week_start = last_full_week()
+        in_week, _ = week_bounds(self.week_start)
+
+        for status in ('new', 'approved', 'approved', 'rejected'):
+            Lead.objects.create(name=f'{status} lead', email=f'{status}{Lead.objects.count()}@example.com',
+                                status=status, user=self.user)
+        Biometric.objects.create(name='Pending bio', user=self.user)
+        Lead.objects.create(name='Old lead', email='old@example.com', user=self.user)
+        Lead.objects.exclude(name='Old lead').update(created_at=in_week + timedelta(days=1))
+        Biometric.objects.update(created_at=in_week + timedelta(days=2))
+
+    def test_reports_for_every_user(self):
+        """
+        Test that each user receives one report with their own numbers
+        """
+        out = StringIO()
+        call_command('weekly_report', week_start=self.week_start.isoformat(), chunk_size=1, stdout=out)
+        self.assertIn('Created 2 weekly reports', out.getvalue())
+
+        report = Notification.objects.get(user=self.user, type='weekly_report')
+        self.assertIn('4 new leads (2 approved, 1 rejected)', report.message)
+        # Approved leads created their own pending biometrics
+        self.assertIn('3 biometrics (0 approved, 3 pending)', report.message)
+        idle_report = Notification.objects.get(user=self.idle, type='weekly_report')
+        self.assertIn('0 new leads', idle_report.message)
+
+    def test_rerun_does_not_duplicate(self):
+        """
+        Test that running the job twice for a week creates no second report
+        """
+        self.assertEqual(generate_weekly_reports(self.week_start), 2)
+        self.assertEqual(generate_weekly_reports(self.week_start), 0)
+        self.assertEqual(Notification.objects.filter(type='weekly_report').count(), 2)
+
+    def test_backfill_older_week(self):
+        """
+        Test that reports are deduplicated by the week they cover, not by when they were written
+        """
+        Notification.objects.create(user=self.user, type='weekly_report', message='Welcome overview')
+        self.assertEqual(generate_weekly_reports(self.week_start), 2)
+        self.assertEqual(generate_weekly_reports(self.week_start - timedelta(days=7)), 2)
+        self.assertEqual(generate_weekly_reports(self.week_start - timedelta(days=7)), 0)
+        self.assertEqual(
+            Notification.objects.filter(user=self.user, report_week=self.week_start).count(), 1
+        )
+
+    def test_week_must_start_on_monday(self):
+        """
+        Test that a week starting on another day is refused
+        """
+        tuesday = self.week_start + timedelta(days=1)
+        with self.assertRaises(ValueError):
+            generate_weekly_reports(tuesday)
+        with self.assertRaisesMessage(CommandError, 'must be a Monday'):
+            call_command('weekly_report', week_start=tuesday.isoformat(), stdout=StringIO())
+        self.assertFalse(Notification.objects.filter(type='weekly_report').exists())
+
+    def test_user_ranges(self):
+        """
+        Test that user id ranges cover every user exactly once
+        """
+        ranges = split_user_ranges(3)
+        self.assertEqual(ranges[0][0], self.user.id)
+        self.assertEqual(ranges[-1][1], self.idle.id)
+        self.assertEqual(generate_weekly_reports(self.week_start, user_range=(self.idle.id, self.idle.id)), 1)
+
+class StatusTransitionTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user, a warmed up lead and a fresh lead loaded from the database
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Walk one lead through every status so all counter rows exist
+            warm = Lead.objects.create(name='Warm Lead', email='warm@example.com', user=self.user)
+            for status in ('in_progress', 'approved', 'rejected'):
+                lead_states.transition(warm, status)
+            for status in ('approved', 'rejected'):
+                biometric_states.transition(warm.biometric, status)
+            self.lead = Lead.objects.create(name='Test Lead', email='test@example.com', user=self.user)
+        self.lead = Lead.objects.get(pk=self.lead.pk)
+
+    def test_query_counts(self):
+        """
+        Test that each transition runs a fixed number of queries, with no hidden lookups or reindexing
+        """
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertNumQueries(7):
+                lead_states.transition(self.lead, 'in_progress')
+            # Approving also looks up and creates the lead's biometric
+            with self.assertNumQueries(15):
+                lead_states.transition(self.lead, 'approved')
+            with self.assertNumQueries(0):
+                lead_states.transition(self.lead, 'approved')
+
+        biometric = Biometric.objects.select_related('lead').get(lead=self.lead)
+        # The lead is already approved, so only the biometric is saved
+        with self.assertNumQueries(7):
+            biometric_states.transition(biometric, 'approved')
+        # Rejecting saves the biometric and the lead that follows it, once each
+        with CaptureQueriesContext(connection) as rejection:
+            with self.assertNumQueries(14):
+                biometric_states.transition(biometric, 'rejected')
+        self.assertFalse(any('auth_user' in query['sql'] for query in queries.captured_queries))
+        self.assertFalse(any('_fts' in query['sql'] for query in rejection.captured_queries))
+
+    def test_invalid_transition(self):
+        """
+        Test that statuses that cannot be reached are refused without saving
+        """
+        with self.assertRaises(InvalidTransition):
+            lead_states.transition(self.lead, 'unknown')
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.status, 'new')
+
+    def test_biometric_outcome_moves_lead(self):
+        """
+        Test that rejecting a biometric rejects its lead and re-approving the lead reopens it
+        """
+        lead_states.transition(self.lead, 'approved')
+        biometric = self.lead.biometric
+        biometric_states.transition(biometric, 'rejected', rejection_reason='Blurred')
+
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.status, 'rejected')
+        self.assertIsNotNone(biometric.rejected_at)
+
+        lead_states.transition(self.lead, 'approved')
+        biometric.refresh_from_db()
+        self.assertEqual(biometric.status, 'pending')
+        self.assertEqual(Biometric.objects.filter(lead=self.lead).count(), 1)
+
+    def test_status_change_notification(self):
+        """
+        Test that a status change queues a notification and other saves do not
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('update_lead_status', args=[self.lead.id, 'in_progress']))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lead.refresh_from_db()
+            self.lead.save(update_fields=['name'])
+
+        self.assertEqual(Notification.objects.filter(lead=self.lead, type='lead_status_change').count(), 1)
+
+    def test_indexed_fields_reindexed(self):
+        """
+        Test that a save changing indexed text still updates the search index
+        """
+        self.lead.name = 'Renamed Lead'
+        self.lead.save(update_fields=['name'])
+        results = SearchConfiguration.advanced_search(query='Renamed', model='lead', use_cache=False)
+        self.assertEqual([r['id'] for r in results], [self.lead.id])
+
+    def test_default_owner_cached(self):
+        """
+        Test that the default owner is looked up once and forgotten when users change
+        """
+        self.assertEqual(default_owner_id(), self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(default_owner_id(), self.user.id)
+
+        User.objects.create_user(username='otheruser', password='12345')
+        self.user.delete()
+        self.assertEqual(default_owner_id(), User.objects.get(username='otheruser').id)
+
+class BulkLeadStatusTests(TestCase):
+    def setUp(self):
+        """
+        Set up a staff user and leads; the first is rejected along with its biometric
+        """
+        cache.clear()
+        self.user = User.objects.create_superuser(username='admin', password='12345', email='admin@example.com')
+        self.client.login(username='admin', password='12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leads = [
+                Lead.objects.create(name=f'Lead {i}', email=f'lead{i}@example.com', location='Pune', user=self.user)
+                for i in range(30)
+            ]
+            self.reopened = Biometric.objects.create(
+                name='Old Biometric', location='Pune', lead=self.leads[0], user=self.user, status='rejected'
+            )
+
+    def test_bulk_approve(self):
+        """
+        Test that approving through the API moves every lead and opens their biometrics
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('bulk_update_lead_status'),
+                data=json.dumps({'ids': [lead.id for lead in self.leads], 'status': 'approved'}),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.json()['updated'], 30)
+        self.assertEqual(Lead.objects.filter(status='approved').count(), 30)
+        self.assertEqual(Biometric.objects.filter(lead__in=self.leads).count(), 30)
+        self.reopened.refresh_from_db()
+        self.assertEqual(self.reopened.status, 'pending')
+        self.assertTrue(Notification.objects.filter(type='lead_status_change').exists())
+        self.assertEqual(counters.reconcile(['lead', 'biometric', 'notification']), [])
+
+        # A second request finds nothing left to move
+        response = self.client.post(reverse('bulk_update_lead_status'), data={'ids': [self.leads[0].id], 'status': 'approved'})
+        self.assertEqual(response.json()['updated'], 0)
+
+    def test_query_count_independent_of_size(self):
+        """
+        Test that a batch of leads costs the same queries whatever its size
+        """
+        bulk_transition_leads(Lead.objects.filter(id=self.leads[0].id), 'approved')
+        with CaptureQueriesContext(connection) as small:
+            bulk_transition_leads(Lead.objects.filter(id__in=[lead.id for lead in self.leads[1:5]]), 'approved')
+        with CaptureQueriesContext(connection) as large:
+            bulk_transition_leads(Lead.objects.filter(id__in=[lead.id for lead in self.leads[5:]]), 'approved')
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_status(self):
+        """
+        Test that unknown statuses are refused
+        """
+        response = self.client.post(reverse('bulk_update_lead_status'), data={'ids': [self.leads[0].id], 'status': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Lead.objects.filter(status='bogus').exists())
+
+    def test_malformed_json(self):
+        """
+        Test that bodies that are not an object, or ids that are not a list of ints, are refused
+        """
+        statuses = dict(Lead.objects.values_list('id', 'status'))
+        for body in (['ids'], 12, {'ids': str(self.leads[0].id)}, {'ids': [str(self.leads[0].id)]},
+                     {'ids': [self.leads[0].id, None]}, {'ids': [self.leads[0].id], 'status': ['approved']}):
+            response = self.client.post(
+                reverse('bulk_update_lead_status'), data=json.dumps(body), content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(dict(Lead.objects.values_list('id', 'status')), statuses)
+
+    def test_admin_action(self):
+        """
+        Test that the admin action rejects the selected leads
+        """
+        self.client.post(reverse('admin:leads_lead_changelist'), {
+            'action': 'mark_rejected',
+            '_selected_action': [lead.id for lead in self.leads[:5]],
+        })
+        self.assertEqual(Lead.objects.filter(status='rejected').count(), 5)
+
+class FilterSuggestionCacheTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads in two locations with a cold cache
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.lead = Lead.objects.create(name='A', email='a@example.com', location='Austin', user=self.user)
+        Lead.objects.create(name='B', email='b@example.com', location='Boston', user=self.user)
+
+    def lead_locations(self):
+        return SearchConfiguration.get_filter_suggestions('lead')['lead']['locations']
+
+    def test_suggestions_are_cached(self):
+        """
+        Test that repeated requests do not query the database
+        """
+        self.assertEqual(self.lead_locations(), ['Austin', 'Boston'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.lead_locations(), ['Austin', 'Boston'])
+
+    def test_invalidated_only_by_location_changes(self):
+        """
+        Test that only saves which add or change a location invalidate the cache
+        """
+        self.lead_locations()
+
+        # Same location and a non-location edit keep the cache warm
+        Lead.objects.create(name='C', email='c@example.com', location='Austin', user=self.user)
+        self.lead.name = 'Renamed'
+        self.lead.save()
+        with self.assertNumQueries(0):
+            self.lead_locations()
+
+        self.lead.location = 'Chicago'
+        self.lead.save()
+        self.assertEqual(self.lead_locations(), ['Austin', 'Boston', 'Chicago'])
+
+        Lead.objects.create(name='D', email='d@example.com', location='Denver', user=self.user)
+        self.assertIn('Denver', self.lead_locations())
+
+class SearchResultCacheTests(TestCase):
+    def setUp(self):
+        """
+        Set up searchable leads with an empty result cache
+        """
+        cache.clear()
+        search_result_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        for i in range(3):
+            Lead.objects.create(name=f'Cached Lead {i}', email=f'cached{i}@example.com', user=self.user)
+
+    def test_repeated_search_is_served_from_cache(self):
+        """
+        Test that an identical search reuses the cached ids
+        """
+        first = SearchConfiguration.advanced_search(query='Cached', model='lead')
+        second = SearchConfiguration.advanced_search(query='  CACHED ', model=['lead'])
+
+        self.assertEqual([r['id'] for r in first], [r['id'] for r in second])
+        self.assertEqual(search_result_cache.stats()['hits'], 1)
+        self.assertEqual(search_result_cache.stats()['misses'], 1)
+
+    def test_writes_invalidate_cached_results(self):
+        """
+        Test that a write to a searched model is visible on the next search
+        """
+        self.assertEqual(len(SearchConfiguration.advanced_search(query='Cached', model='lead')), 3)
+        Lead.objects.create(name='Cached Lead 3', email='cached3@example.com', user=self.user)
+        self.assertEqual(len(SearchConfiguration.advanced_search(query='Cached', model='lead')), 4)
+        self.assertEqual(search_result_cache.stats()['hits'], 0)
+
+    def test_merged_search_is_cached(self):
+        """
+        Test that the count and page ids of a paginated search are cached until a write
+        """
+        first = SearchConfiguration.merged_search(query='Cached', model='lead')
+        self.assertEqual(first.count(), 3)
+        expected = [r['id'] for r in first[0:2]]
+
+        second = SearchConfiguration.merged_search(query='cached', model=['lead'])
+        with self.assertNumQueries(1):
+            self.assertEqual(second.count(), 3)
+            self.assertEqual([r['id'] for r in second[0:2]], expected)
+        self.assertEqual(search_result_cache.stats()['hits'], 2)
+
+        Lead.objects.create(name='Cached Lead 3', email='cached3@example.com', user=self.user)
+        self.assertEqual(SearchConfiguration.merged_search(query='Cached', model='lead').count(), 4)
+
+    def test_bounded_size(self):
+        """
+        Test that the least recently used entry is evicted
+        """
+        result_cache = SearchResultCache(maxsize=2, timeout=60)
+        for key in ['a', 'b', 'c']:
+            result_cache.set(key, [('lead', 1)])
+        self.assertIsNone(result_cache.get('a'))
+        self.assertEqual(result_cache.get('c'), (('lead', 1),))
+        self.assertEqual(result_cache.stats()['evictions'], 1)
+
+    def test_stats_endpoint_requires_staff(self):
+        """
+        Test that cache statistics are only exposed to staff users
+        """
+        self.client.login(username='testuser', password='12345')
+        response = self.client.get(reverse('search_cache_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('search_cache_stats'))
+        self.assertEqual(response.json()['maxsize'], search_result_cache.maxsize)
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads and a biometric with a freshly built suggestion index
+        """
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        self.lead = Lead.objects.create(name='Jonas Berg', email='jonas@example.com', location='Joliet', user=self.user)
+        Lead.objects.create(name='Jonas Berg', email='jonas.b@example.com', location='Austin', user=self.user)
+        Biometric.objects.create(name='Joanna Biometric', location='Austin', user=self.user)
+        suggestion_index.reset()
+        suggestion_index.ensure_built()
+
+    def suggest(self, prefix):
+        response = self.client.get(reverse('search_suggest'), {'q': prefix})
+        self.assertEqual(response.status_code, 200)
+        return [(s['value'], s['source'], s['field']) for s in response.json()['suggestions']]
+
+    def test_prefix_suggestions(self):
+        """
+        Test that suggestions cover every indexed field and are deduplicated
+        """
+        self.assertEqual(self.suggest('JO'), [
+            ('Joanna Biometric', 'biometric', 'name'),
+            ('Joliet', 'lead', 'location'),
+            ('Jonas Berg', 'lead', 'name'),
+            ('jonas.b@example.com', 'lead', 'email'),
+            ('jonas@example.com', 'lead', 'email'),
+        ])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_index_follows_model_changes(self):
+        """
+        Test that saves and deletes update the index incrementally
+        """
+        self.lead.location = 'Kalamazoo'
+        self.lead.save()
+        self.assertNotIn(('Joliet', 'lead', 'location'), self.suggest('jol'))
+        self.assertIn(('Kalamazoo', 'lead', 'location'), self.suggest('kal'))
+
+        # The name is shared with another lead, so it stays after one delete
+        self.lead.delete()
+        self.assertEqual(self.suggest('kal'), [])
+        self.assertIn(('Jonas Berg', 'lead', 'name'), self.suggest('jonas b'))
+
+    def test_search_never_builds(self):
+        """
+        Test that searching runs no queries, so an unbuilt index finds nothing until it is built
+        """
+        suggestion_index.reset()
+        with self.assertNumQueries(0):
+            self.assertEqual(suggestion_index.search('jo'), [])
+        suggestion_index.refresh()
+        self.assertEqual(len(suggestion_index.search('jo')), 5)
+
+    def test_writes_during_rebuild_survive_the_swap(self):
+        """
+        Test that rows saved while a rebuild reads the tables are replayed on the new index exactly once
+        """
+        build = suggestion_index.build
+
+        def build_with_concurrent_writes(chunk_size=2000):
+            # Seen by the rebuild and replayed on top of it
+            self.lead.location = 'Kalamazoo'
+            self.lead.save()
+            index = build(chunk_size)
+            # Missed by the rebuild
+            Lead.objects.create(name='Zelda Quinn', email='zelda@example.com', location='Austin', user=self.user)
+            return index
+
+        suggestion_index.build = build_with_concurrent_writes
+        try:
+            suggestion_index.refresh()
+        finally:
+            del suggestion_index.build
+
+        self.assertEqual(self.suggest('kal'), [('Kalamazoo', 'lead', 'location')])
+        self.assertEqual(self.suggest('jol'), [])
+        self.assertIn(('Zelda Quinn', 'lead', 'name'), self.suggest('zel'))
+
+        # The replayed change was not counted twice
+        self.lead.delete()
+        self.assertEqual(self.suggest('kal'), [])
+
+    def test_prefix_index_refcounts(self):
+        """
+        Test that shared values survive until every reference is removed
+        """
+        index = PrefixIndex()
+        index.add('Austin', 'lead', 'location')
+        index.add('Austin', 'lead', 'location')
+        index.remove('Austin', 'lead', 'location')
+        self.assertEqual(len(index.search('aus')), 1)
+        index.remove('Austin', 'lead', 'location')
+        self.assertEqual(index.search('aus'), [])
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads with similar names and a freshly built trigram index
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+
+        self.jonathan = Lead.objects.create(
+            name='Jonathan Smith', email='jsmith@example.com', location='Chicago', user=self.user
+        )
+        self.jonas = Lead.objects.create(
+            name='Jonas Smithers', email='jonas@example.com', location='Boston', user=self.user
+        )
+        fuzzy_index.reset()
+        fuzzy_index.ensure_built()
+
+    def fuzzy_ids(self, query):
+        results = SearchConfiguration.advanced_search(query=query, model='lead', mode='fuzzy')
+        return [result['id'] for result in results]
+
+    def test_misspellings_are_ranked_by_similarity(self):
+        """
+        Test that misspelled queries still find the closest lead first
+        """
+        self.assertEqual(SearchConfiguration.advanced_search(query='Jonathon Smiht', model='lead'), [])
+        self.assertEqual(self.fuzzy_ids('Jonathon Smiht')[0], self.jonathan.id)
+        self.assertEqual(self.fuzzy_ids('Chicgo'), [self.jonathan.id])
+        self.assertEqual(self.fuzzy_ids('Jonas Smithers')[0], self.jonas.id)
+
+    def test_index_follows_model_changes(self):
+        """
+        Test that saves and deletes update the trigram index
+        """
+        self.jonathan.location = 'Milwaukee'
+        self.jonathan.save()
+        self.assertEqual(self.fuzzy_ids('Chicgo'), [])
+        self.assertEqual(self.fuzzy_ids('Milwauke'), [self.jonathan.id])
+
+        self.jonathan.delete()
+        self.assertEqual(self.fuzzy_ids('Milwauke'), [])
+
+    def test_email_domains_are_not_indexed(self):
+        """
+        Test that a misspelled shared domain matches no lead, while the local part still does
+        """
+        self.assertEqual(self.fuzzy_ids('exmaple'), [])
+        self.assertEqual(self.fuzzy_ids('jsmiht'), [self.jonathan.id])
+
+    def test_limit_applies_after_model_filter(self):
+        """
+        Test that limit counts only matches from the requested models
+        """
+        Biometric.objects.create(name='Jonas Smithers', location='Boston', user=self.user)
+        matches = fuzzy_index.search('Jonas Smithers', models=['lead'], limit=1)
+        self.assertEqual([key for key, score in matches], [('lead', self.jonas.id)])
+
+    def test_search_never_builds(self):
+        """
+        Test that a fuzzy search does not build the index on the request path
+        """
+        fuzzy_index.reset()
+        with self.assertNumQueries(0):
+            self.assertEqual(fuzzy_index.search('Chicgo'), [])
+
+    def test_search_view_fuzzy_mode(self):
+        """
+        Test that the search view accepts the fuzzy match mode
+        """
+        response = self.client.get(reverse('global_search'), {'query': 'Bostn', 'match': 'fuzzy'})
+        self.assertEqual(response.context['match'], 'fuzzy')
+        self.assertEqual([r['id'] for r in response.context['results']], [self.jonas.id])
+
+    def test_trigram_index_drops_unused_words(self):
+        """
+        Test that removing the last row of a word removes it from the vocabulary
+        """
+        index = TrigramIndex()
+        index.add(('lead', 1), ['Austin'])
+        index.remove(('lead', 1))
+        self.assertEqual(index.search('Austin'), [])
+        self.assertEqual(len(index), 0)
+
+class PhoneLookupTests(TestCase):
+    def setUp(self):
+        """
+        Set up a lead with a formatted phone number
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        self.lead = Lead.objects.create(
+            name='Caller', email='caller@example.com', phone='+1 (555) 010-2030', user=self.user
+        )
+
+    def test_normalize_phone(self):
+        """
+        Test that formatting and international prefixes are removed
+        """
+        self.assertEqual(normalize_phone('+1 (555) 010-2030'), '15550102030')
+        self.assertEqual(normalize_phone('001 555 010 2030'), '15550102030')
+        self.assertIsNone(normalize_phone(' - '))
+
+    def test_normalized_column_is_maintained(self):
+        """
+        Test that save, bulk_create and update keep the shadow column filled
+        """
+        self.assertEqual(self.lead.phone_normalized, '15550102030')
+        Lead.objects.bulk_create([Lead(name='Bulk', email='bulk@example.com', phone='555.777.8888')])
+        self.assertTrue(Lead.objects.filter(phone_normalized='5557778888').exists())
+
+        Lead.objects.filter(id=self.lead.id).update(phone='555 111 2222')
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.phone_normalized, '5551112222')
+
+    def test_lookup_endpoint(self):
+        """
+        Test exact phone lookups regardless of formatting
+        """
+        response = self.client.get(reverse('lead_phone_lookup'), {'phone': '1-555-010-2030'})
+        self.assertEqual([lead['id'] for lead in response.json()['leads']], [self.lead.id])
+
+        response = self.client.get(reverse('lead_phone_lookup'), {'phone': ''})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_matches_differently_formatted_phone(self):
+        """
+        Test that a phone search matches on the normalized prefix
+        """
+        results = SearchConfiguration.advanced_search(query='1555010', model='lead')
+        self.assertEqual([r['id'] for r in results], [self.lead.id])
+
+class SearchExportTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads and a biometric to export
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        for i in range(5):
+            Lead.objects.create(name=f'Export Lead {i}', email=f'export{i}@example.com', location='Pune', user=self.user)
+        Biometric.objects.create(name='Export Biometric', location='Pune', user=self.user)
+
+    def test_ndjson_export(self):
+        """
+        Test that every match is streamed as one JSON object per line
+        """
+        response = self.client.get(reverse('search_export'), {'query': 'Export', 'type': 'lead'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row['model'] == 'lead' for row in rows))
+
+    def test_csv_export_across_models(self):
+        """
+        Test the CSV export header and that filters are applied
+        """
+        response = self.client.get(reverse('search_export'), {
+            'query': 'Export', 'format': 'csv', 'lead_location': 'Mumbai'
+        })
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('model,id,name,email'))
+        exported_models = [line.split(',')[0] for line in lines[1:]]
+        self.assertIn('biometric', exported_models)
+        self.assertNotIn('lead', exported_models)
+
+    def test_export_rows_are_lazy(self):
+        """
+        Test that no query runs until the export is consumed
+        """
+        with self.assertNumQueries(0):
+            rows = SearchConfiguration.export_rows(query='Export', model='lead', chunk_size=2)
+        self.assertEqual(len(list(rows)), 5)
+
+    def test_unknown_format(self):
+        """
+        Test that an unsupported format is rejected
+        """
+        response = self.client.get(reverse('search_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_notifications_scoped_to_user(self):
+        """
+        Test that notifications are left out by default and only the user's own are exported
+        """
+        other = User.objects.create_user(username='other', password='12345')
+        Notification.objects.create(user=other, type='system_alert', message='Export secret')
+        Notification.objects.create(user=self.user, type='system_alert', message='Export mine')
+
+        response = self.client.get(reverse('search_export'), {'query': 'Export'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertNotIn('notification', {row['model'] for row in rows})
+
+        response = self.client.get(reverse('search_export'), {'query': 'Export', 'type': 'notification'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['message'] for row in rows], ['Export mine'])
+
+class RecordExportTests(TestCase):
+    def setUp(self):
+        """
+        Set up a staff user, leads in two statuses and a biometric
+        """
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='staffuser', password='12345', is_staff=True)
+        self.client.login(username='staffuser', password='12345')
+        self.leads = [
+            Lead.objects.create(name=f'Lead {i}', email=f'lead{i}@example.com', user=self.user,
+                                status='rejected' if i % 2 else 'new')
+            for i in range(6)
+        ]
+        Lead.objects.filter(id=self.leads[0].id).update(created_at=timezone.now() - timedelta(days=30))
+        Biometric.objects.create(name='Export Biometric', location='Pune', user=self.user)
+
+    def export(self, model_key, **params):
+        response = self.client.get(reverse('record_export', args=[model_key]), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_csv_uses_resource_fields(self):
+        """
+        Test that the CSV columns follow the import/export resources
+        """
+        lines = self.export('lead')
+        self.assertEqual(lines[0], 'id,name,email,location,status,created_at')
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(self.export('biometric')[1].split(',')[1], 'staffuser')
+
+    def test_filters_and_resume(self):
+        """
+        Test status and date filters and resuming after the last received id
+        """
+        self.assertEqual(len(self.export('lead', status='rejected')), 4)
+        self.assertEqual(len(self.export('lead', created_from=timezone.localdate().isoformat())), 6)
+
+        rows = [json.loads(line) for line in self.export('lead', format='ndjson', after_id=self.leads[3].id)]
+        self.assertEqual([row['id'] for row in rows], [lead.id for lead in self.leads[4:]])
+
+    def test_invalid_filters(self):
+        """
+        Test that unknown models, statuses and dates are rejected
+        """
+        self.assertEqual(self.client.get(reverse('record_export', args=['user'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('record_export', args=['lead']), {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('record_export', args=['lead']), {'created_to': '2024-13-01'}).status_code, 400)
+
+    def test_admin_action_streams(self):
+        """
+        Test that the admin export action streams the selected rows
+        """
+        self.user.is_superuser = True
+        self.user.save()
+        response = self.client.post(reverse('admin:leads_lead_changelist'), {
+            'action': 'export_csv_stream',
+            '_selected_action': [lead.id for lead in self.leads[:2]],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
+
+class LeadImportTests(TestCase):
+    def setUp(self):
+        """
+        Set up a staff user, an existing lead and an import file
+        """
+        cache.clear()
+        self.user = User.objects.create_superuser(username='admin', password='12345', email='admin@example.com')
+        self.client.login(username='admin', password='12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            Lead.objects.create(name='Existing', email='taken@example.com', user=self.user)
+        self.csv = (
+            'Name,Email,Location,Phone,Status\n'
+            'Asha,asha@example.com,Pune,+91 98765 43210,new\n'
+            'Ravi,RAVI@example.com,Mumbai,,Approved\n'
+            'Ravi Again,ravi@example.com,Mumbai,,new\n'
+            'Taken,taken@example.com,Pune,,new\n'
+            'Broken,not-an-email,Pune,,new\n'
+            'Odd,odd@example.com,Pune,,closed\n'
+        )
+
+    def test_command_imports_in_bulk(self):
+        """
+        Test that valid rows are inserted once and the rest reported
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self.csv)
+        self.addCleanup(os.unlink, handle.name)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_leads', handle.name, user='admin', chunk_size=2, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Imported 2 leads from 6 rows (2 duplicates, 2 invalid)', output)
+        self.assertIn('rows/s', output)
+        self.assertIn('Line 6: Invalid email', output)
+
+        ravi = Lead.objects.get(email_normalized='ravi@example.com')
+        self.assertEqual(ravi.status, 'approved')
+        self.assertTrue(Biometric.objects.filter(lead=ravi).exists())
+        self.assertEqual(Lead.objects.get(email='asha@example.com').phone_normalized, '919876543210')
+        self.assertTrue(Notification.objects.filter(lead=ravi, type='lead_assigned').exists())
+        self.assertEqual(counters.reconcile(['lead', 'biometric', 'notification']), [])
+
+    def test_xlsx_rows(self):
+        """
+        Test that XLSX sheets are read like CSV files
+        """
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(['name', 'email', 'created_at'])
+        workbook.active.append(['Sheet Lead', 'sheet@example.com', timezone.datetime(2024, 1, 5)])
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as handle:
+            workbook.save(handle.name)
+        self.addCleanup(os.unlink, handle.name)
+
+        result = LeadImporter().run(read_rows(handle.name, 'xlsx'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Lead.objects.get(email='sheet@example.com').created_at.year, 2024)
+
+    def test_admin_upload(self):
+        """
+        Test the bulk import page of the lead admin
+        """
+        url = reverse('admin:leads_lead_bulk_import')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {'file': SimpleUploadedFile('leads.csv', self.csv.encode())})
+        self.assertRedirects(response, reverse('admin:leads_lead_changelist'))
+        self.assertEqual(Lead.objects.filter(user=self.user).count(), 3)
+
+class ParallelImportTests(TestCase):
+    def setUp(self):
+        """
+        Set up a CSV file with a quoted multi-line field, a duplicate and an invalid row
+        """
+        cache.clear()
+        rows = ['name,email,location,status']
+        for i in range(40):
+            rows.append(f'Lead {i},lead{i}@example.com,Pune,new')
+        rows[10] = '"Multi\nLine, Lead",multi@example.com,"Pune\n""East""",new'
+        rows[20] = 'Broken,not-an-email,Pune,new'
+        rows.append('Again,LEAD1@example.com,Pune,new')
+        self.content = '\n'.join(rows) + '\n'
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self.content)
+        self.addCleanup(os.unlink, handle.name)
+        self.path = handle.name
+
+    def test_blocks_keep_records_whole(self):
+        """
+        Test that CSV blocks never end inside a quoted field
+        """
+        header, blocks = csv_blocks(io.BytesIO(self.content.encode()), block_size=64)
+        blocks = list(blocks)
+        self.assertEqual(header, ['name', 'email', 'location', 'status'])
+        self.assertGreater(len(blocks), 5)
+        self.assertTrue(all(block.endswith(b'\n') and block.count(b'"') % 2 == 0 for block in blocks))
+        self.assertEqual(b''.join(blocks).decode(), self.content.split('\n', 1)[1])
+
+    def test_parallel_matches_sequential(self):
+        """
+        Test that workers validate the same rows, in order, as the sequential import
+        """
+        result = LeadImporter(chunk_size=7).run_file(self.path, 'csv', workers=2, block_size=64)
+
+        self.assertEqual((result.rows, result.created, result.duplicates, result.invalid), (41, 39, 1, 1))
+        self.assertEqual(result.errors, [(21, 'Invalid email: not-an-email')])
+        self.assertEqual(Lead.objects.get(email='multi@example.com').location, 'Pune\n"East"')
+        self.assertEqual(counters.reconcile(['lead']), [])
+
+class EmailUniquenessTests(TestCase):
+    def setUp(self):
+        """
+        Set up leads with a mixed-case email and with the placeholder email
+        """
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lead = Lead.objects.create(name='Asha', email='Asha@Example.com')
+            Lead.objects.create(name='Nobody')
+
+    def test_normalized_email(self):
+        """
+        Test that the lowercased email is stored and the placeholder left out of the index
+        """
+        self.assertEqual(self.lead.email_normalized, 'asha@example.com')
+        self.assertIsNone(Lead.objects.get(name='Nobody').email_normalized)
+        Lead.objects.filter(pk=self.lead.pk).update(email='ASHA.K@example.com')
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).email_normalized, 'asha.k@example.com')
+
+    def test_saving_unindexed_duplicates(self):
+        """
+        Test that leads left sharing an email by the migration can still be saved and updated
+        """
+        duplicate = Lead.objects.create(name='Asha Copy', email='other@example.com')
+        Lead.objects.filter(pk=duplicate.pk).update(email='ASHA@example.com')
+        duplicate.refresh_from_db()
+        self.assertIsNone(duplicate.email_normalized)
+
+        duplicate.status = 'in_progress'
+        duplicate.save()
+        duplicate.email = 'asha.copy@example.com'
+        duplicate.save()
+        self.assertEqual(Lead.objects.get(pk=duplicate.pk).email_normalized, 'asha.copy@example.com')
+
+        Lead.objects.filter(name__startswith='Asha').update(email='shared@example.com')
+        self.assertFalse(Lead.objects.filter(email_normalized='shared@example.com').exists())
+
+    def test_case_variant_duplicates_rejected(self):
+        """
+        Test that creating a lead, or changing its email, to a case variant of a taken email fails
+        """
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Lead.objects.create(name='Asha Again', email='ASHA@example.com')
+        other = Lead.objects.create(name='Other', email='other@example.com')
+        other.email = 'asha@EXAMPLE.com'
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            other.save()
+        with self.assertRaises(ValidationError):
+            other.full_clean()
+
+    def test_form_rejects_case_variants(self):
+        """
+        Test that the lead form rejects an existing email in another case but lets a lead keep its own
+        """
+        form = LeadForm(data={'name': 'Other', 'email': 'ASHA@example.com', 'location': 'Pune'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+        form = LeadForm(data={'name': 'Asha K', 'email': 'asha@example.com', 'location': 'Pune'}, instance=self.lead)
+        self.assertTrue(form.is_valid())
+        self.assertFalse(email_taken(Lead.PLACEHOLDER_EMAIL))
+
+    def test_batch_check_is_one_query(self):
+        """
+        Test that a batch is checked with one IN query and duplicates within it are caught
+        """
+        rows = [{'email': 'asha@EXAMPLE.com'}, {'email': 'ravi@example.com'}, {'email': 'Ravi@example.com'}]
+        with self.assertNumQueries(1):
+            unique, duplicates = EmailDeduplicator().split(rows)
+        self.assertEqual(unique, [{'email': 'ravi@example.com'}])
+        self.assertEqual(len(duplicates), 2)
+
+    def test_admin_import_skips_duplicates(self):
+        """
+        Test that the import-export resource skips emails already in use
+        """
+        from tablib import Dataset
+
+        dataset = Dataset(headers=['name', 'email', 'location', 'status'])
+        dataset.append(['Asha Again', 'ASHA@example.com', 'Pune', 'new'])
+        dataset.append(['Ravi', 'ravi@example.com', 'Mumbai', 'new'])
+        dataset.append(['Ravi Again', 'RAVI@example.com', 'Mumbai', 'new'])
+        with self.captureOnCommitCallbacks(execute=True):
+            result = LeadResource().import_data(dataset)
+
+        self.assertFalse(result.has_errors())
+        self.assertEqual(result.totals['new'], 1)
+        self.assertEqual(result.totals['skip'], 2)
+        self.assertEqual(Lead.objects.filter(email_normalized__in=['asha@example.com', 'ravi@example.com']).count(), 2)
+
 class ErrorHandlerTests(TestCase):
     def setUp(self):
         """
@@ -0,0 +1,249 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from . import counters
+from .autocomplete import suggestion_index
+from .caching import bump_generation, location_suggestions
+from .fuzzy import fuzzy_index
+from .models import Lead, Biometric, Notification
+from .notifications import notification_writer
+from .search_index import get_search_index
+
+DEFAULT_OWNER_CACHE_KEY = 'leads:default_owner'
+
+
+def default_owner_id():
+    """
+    Id of the user who owns records saved without one, the first user by id
+
+    The id is cached until a user is created or deleted.
+    """
+    user_id = cache.get(DEFAULT_OWNER_CACHE_KEY)
+    if user_id is None:
+        user_id = User.objects.order_by('pk').values_list('pk', flat=True).first()
+        if user_id is not None:
+            cache.set(DEFAULT_OWNER_CACHE_KEY, user_id, timeout=None)
+    return user_id
+
+
+def forget_default_owner():
+    cache.delete(DEFAULT_OWNER_CACHE_KEY)
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class StateMachine:
+    """
+    Allowed status transitions of a model and the side effects of entering a status
+
+    Side effects run from the model's save() only when the saved status
+    differs from the one loaded from the database, so saves that leave the
+    status alone never pay for them, whichever code path made the save.
+    """
+    def __init__(self, model, transitions):
+        self.model = model
+        self.transitions = transitions
+        self._side_effects = {}
+
+    def allowed(self, status):
+        return self.transitions.get(status, ())
+
+    def on_enter(self, *statuses):
+        """
+        Register a side effect run with the instance that entered one of the statuses
+        """
+        def register(side_effect):
+            for status in statuses:
+                self._side_effects.setdefault(status, []).append(side_effect)
+            return side_effect
+        return register
+
+    def transition(self, instance, status, **fields):
+        """
+        Move an instance to a status, saving only the fields whose value changes
+
+        :param fields: Other field values to save with the transition
+        :raises InvalidTransition: The status cannot be reached from the current one
+        :return: True if anything was saved
+        """
+        if status != instance.status and status not in self.allowed(instance.status):
+            raise InvalidTransition(
+                f'{self.model._meta.verbose_name} cannot go from {instance.status!r} to {status!r}'
+            )
+
+        fields['status'] = status
+        changed = [name for name, value in fields.items() if getattr(instance, name) != value]
+        if not changed:
+            return False
+        for name in changed:
+            setattr(instance, name, fields[name])
+        instance.save(update_fields=changed)
+        return True
+
+    def entered(self, instance, previous):
+        """
+        Run the side effects of the status an instance was just saved with
+
+        :param previous: Tracked field values before the save, or None for a new row
+        """
+        if previous is not None and previous['status'] == instance.status:
+            return
+        for side_effect in self._side_effects.get(instance.status, ()):
+            side_effect(instance)
+
+
+lead_states = StateMachine(Lead, {
+    'new': ('in_progress', 'approved', 'rejected'),
+    'in_progress': ('new', 'approved', 'rejected'),
+    'approved': ('in_progress', 'rejected'),
+    'rejected': ('new', 'in_progress', 'approved'),
+})
+
+biometric_states = StateMachine(Biometric, {
+    'pending': ('approved', 'rejected'),
+    'approved': ('pending', 'rejected'),
+    'rejected': ('pending', 'approved'),
+})
+
+
+@lead_states.on_enter('approved')
+def open_biometric(lead):
+    """
+    An approved lead gets a pending biometric; a rejected one is reopened
+    """
+    try:
+        biometric = lead.biometric
+    except Biometric.DoesNotExist:
+        Biometric.objects.create(
+            lead=lead,
+            user_id=lead.user_id or default_owner_id(),
+            name=lead.name,
+            location=lead.location or '',
+            status='pending'
+        )
+        return
+    if biometric.status == 'rejected':
+        biometric_states.transition(biometric, 'pending')
+
+
+@biometric_states.on_enter('approved', 'rejected')
+def settle_lead(biometric):
+    """
+    The lead of a verified biometric follows its outcome
+    """
+    if biometric.lead_id is not None:
+        lead_states.transition(biometric.lead, biometric.status)
+
+
+def record_bulk_insert(model_key, instances):
+    """
+    Apply the work of the post_save receivers to rows inserted with bulk_create
+    """
+    if not instances:
+        return
+    counters.record_bulk_create(model_key, instances)
+    get_search_index().update_many(model_key, instances)
+    for instance in instances:
+        suggestion_index.record_save(model_key, instance)
+        fuzzy_index.record_save(model_key, instance)
+    location_suggestions[model_key].invalidate()
+    bump_generation(model_key)
+
+
+def bulk_transition_leads(queryset, status, batch_size=500):
+    """
+    Move every lead of a queryset that can reach a status there with set-based queries
+
+    The bulk counterpart of lead_states.transition() and its side effects:
+    each batch of leads is moved with one UPDATE, approved leads get their
+    missing biometrics with one bulk_create and rejected ones reopened with
+    one UPDATE, and all notifications are written as one batch on commit.
+    Leads already in the status, or unable to reach it, are left alone.
+
+    :raises InvalidTransition: The status is not a lead status
+    :return: Number of leads moved
+    """
+    if status not in lead_states.transitions:
+        raise InvalidTransition(f'Unknown lead status {status!r}')
+    sources = [source for source, targets in lead_states.transitions.items() if status in targets]
+    label = dict(Lead.STATUS_CHOICES)[status]
+
+    moved = 0
+    with transaction.atomic():
+        rows = list(
+            Lead.objects.filter(pk__in=queryset.values('pk'), status__in=sources)
+            .order_by('id').values('id', 'user_id', 'name', 'location')
+        )
+        owner_id = default_owner_id() if any(row['user_id'] is None for row in rows) else None
+        notifications = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            ids = [row['id'] for row in batch]
+            moved += counters.update_status(Lead.objects.filter(id__in=ids), status)
+            notifications.extend(
+                Notification(
+                    user_id=row['user_id'] or owner_id,
+                    type='lead_status_change',
+                    message=f'Lead status changed to {label}',
+                    lead_id=row['id'],
+                    verb=status
+                )
+                for row in batch
+                if row['user_id'] or owner_id
+            )
+            if status == 'approved':
+                notifications.extend(open_biometrics(batch, owner_id))
+
+        notification_writer.add_many(notifications)
+    return moved
+
+
+def open_biometrics(leads, owner_id):
+    """
+    open_biometric() for a batch of lead rows with 'id', 'user_id', 'name' and 'location'
+
+    :return: Notifications about the created and reopened biometrics
+    """
+    existing = {
+        row['lead_id']: row for row in
+        Biometric.objects.filter(lead_id__in=[lead['id'] for lead in leads]).values('id', 'lead_id', 'user_id', 'status')
+    }
+    created = Biometric.objects.bulk_create([
+        Biometric(
+            lead_id=lead['id'],
+            user_id=lead['user_id'] or owner_id,
+            name=lead['name'],
+            location=lead['location'] or '',
+            status='pending'
+        )
+        for lead in leads
+        if lead['id'] not in existing
+    ])
+    reopened = [row for row in existing.values() if row['status'] == 'rejected']
+    if reopened:
+        counters.update_status(Biometric.objects.filter(id__in=[row['id'] for row in reopened]), 'pending')
+
+    record_bulk_insert('biometric', created)
+
+    return [
+        Notification(
+            user_id=biometric.user_id,
+            type='biometric_status_change',
+            message=f'New biometric record created for {biometric.name}',
+            biometric_id=biometric.id,
+            verb='created'
+        )
+        for biometric in created
+    ] + [
+        Notification(
+            user_id=row['user_id'],
+            type='biometric_status_change',
+            message='Biometric status changed to Pending',
+            biometric_id=row['id'],
+            verb='pending'
+        )
+        for row in reopened
+    ]
@@ -4,7 +4,8 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordChangeForm
 from django.contrib.auth.decorators import login_required
-from .models import Lead, Biometric, User, Notification
+from django.contrib.admin.views.decorators import staff_member_required
+from .models import Lead, Biometric, User, Notification, ArchivedNotification, BroadcastNotification
 from django.core.mail import send_mail
 from django.contrib import messages
 from django.db.models import (
@@ -13,7 +14,10 @@ from django.db.models import (
 )
 from django.db.models.functions import TruncMonth
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 import json
 from datetime import timedelta
 from django.utils import timezone
@@ -21,6 +25,18 @@ from django.db import transaction
 from .forms import LeadForm
 from dateutil.relativedelta import relativedelta
 from .search_config import SearchConfiguration
+from .pagination import CountedPaginator, keyset_page
+from . import counters
+from .caching import search_result_cache
+from .autocomplete import suggestion_index
+from .normalization import normalize_phone
+from .transitions import InvalidTransition, biometric_states, bulk_transition_leads, lead_states
+from .streaming import EXPORT_FORMATS, sse_event, streaming_export_response
+from .resources import EXPORT_RESOURCES, export_columns, export_queryset, export_rows
+from .notifications import (
+    NotificationFeed, mark_broadcasts_read, notification_events, notification_writer,
+    seed_welcome_notifications, serialize_notification
+)
 from django.contrib.auth import update_session_auth_hash
 
 # Create your views here.
@@ -30,6 +46,11 @@ class SignUpView(CreateView):
     success_url = reverse_lazy('login')
     template_name = 'registration/signup.html'
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        seed_welcome_notifications(self.object)
+        return response
+
 class LoginView(auth_views.LoginView):
     template_name = 'registration/login.html'
     form_class = AuthenticationForm
@@ -50,6 +71,9 @@ def custom_logout(request):
 def home(request):
     """
     Home page view with paginated new leads (max 50)
+
+    Passing a ``cursor`` parameter (empty for the first page) switches to
+    keyset pagination, which keeps deep pages as cheap as the first one.
     """
     # Get sorting parameters
     sort_by = request.GET.get('sort', 'created_at')
@@ -75,8 +99,30 @@ def home(request):
     # Get only new leads with sorting
     new_leads_queryset = Lead.objects.filter(status='new').order_by(f'{order_prefix}{valid_sort_fields[sort_by]}')
 
+    # Read the queue size from the status counters instead of COUNT(*)
+    total_leads_count = counters.get_count('lead', 'new')
+
+    # Cursor mode: constant-cost page fetches keyed on (sort field, id)
+    if 'cursor' in request.GET:
+        new_leads = keyset_page(
+            request,
+            Lead.objects.filter(status='new'),
+            50,
+            sort_field=valid_sort_fields[sort_by],
+            descending=order == 'desc'
+        )
+        context = {
+            'new_leads': new_leads,
+            'current_sort': sort_by,
+            'current_order': order,
+            'use_cursor': True,
+            'is_paginated': new_leads.has_other_pages(),
+            'total_leads_count': total_leads_count
+        }
+        return render(request, 'home.html', context)
+
     # Paginate the results (limit to 50)
-    paginator = Paginator(new_leads_queryset, 50)
+    paginator = CountedPaginator(new_leads_queryset, 50, count=total_leads_count)
     
     try:
         new_leads = paginator.page(page)
@@ -92,7 +138,7 @@ def home(request):
         'current_sort': sort_by,
         'current_order': order,
         'is_paginated': paginator.num_pages > 1,
-        'total_leads_count': new_leads_queryset.count()
+        'total_leads_count': paginator.count
     }
     
     return render(request, 'home.html', context)
@@ -105,37 +151,8 @@ def update_lead_status(request, lead_id, new_status):
     try:
         lead = get_object_or_404(Lead, id=lead_id)
         
-        # Track the original status for comparison
-        original_status = lead.status
-        
-        # Update lead status
-        lead.status = new_status
-        lead.save()
-        
-        # Create a detailed notification
-        # Notification.objects.create(
-        #     user=request.user,
-        #     lead=lead,
-        #     message=f"Lead status changed from {original_status} to {new_status}",
-        #     notification_type='lead'
-        # )
-        
-        # Automatic biometric creation or update for approved leads
-        if new_status == 'approved':
-            # Create or update biometric
-            biometric, created = Biometric.objects.get_or_create(
-                lead=lead,
-                defaults={
-                    'user': request.user,
-                    'name': lead.name,
-                    'location': lead.location,
-                    'status': 'pending'
-                }
-            )
-            
-            if not created:
-                biometric.status = 'pending'
-                biometric.save()
+        # Saves only the status; approving also opens the lead's biometric
+        lead_states.transition(lead, new_status)
         
         # Optional: Add logging or additional processing
         messages.success(request, f"Lead status updated to {new_status}")
@@ -147,6 +164,51 @@ def update_lead_status(request, lead_id, new_status):
         messages.error(request, f"Error updating lead status: {str(e)}")
         return redirect('home')
 
+@login_required
+def bulk_update_lead_status(request):
+    """
+    Move many leads to one status in a single transaction
+
+    Accepts a JSON body {"ids": [...], "status": "..."} or the same fields as
+    form data; leads that are already in the status or cannot reach it are skipped.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse({'error': 'JSON body must be an object'}, status=400)
+        ids, new_status = payload.get('ids', []), payload.get('status', '')
+        # A string would otherwise be read one digit at a time
+        if not isinstance(ids, list) or not all(type(lead_id) is int for lead_id in ids):
+            return JsonResponse({'error': 'ids must be a list of lead ids'}, status=400)
+        if not isinstance(new_status, str):
+            return JsonResponse({'error': 'status must be a string'}, status=400)
+    else:
+        new_status = request.POST.get('status', '')
+        try:
+            ids = [int(lead_id) for lead_id in request.POST.getlist('ids')]
+        except ValueError:
+            return JsonResponse({'error': 'ids must be a list of lead ids'}, status=400)
+    if not ids:
+        return JsonResponse({'error': 'At least one lead id is required'}, status=400)
+
+    try:
+        updated = bulk_transition_leads(Lead.objects.filter(id__in=ids), new_status)
+    except InvalidTransition as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'status': new_status,
+        'requested': len(ids),
+        'updated': updated,
+        'error': None
+    })
+
 @login_required
 def create_lead(request):
     """
@@ -159,15 +221,17 @@ def create_lead(request):
             lead = form.save(commit=False)
             lead.user = request.user
             lead.status = 'new'  # Explicitly set default status
-            lead.save()
-            
-            # Create a notification for the new lead
-            Notification.objects.create(
-                user=request.user,
-                type='lead_assigned',
-                message=f'New lead created: {lead.name}',
-                lead=lead
-            )
+            with transaction.atomic():
+                lead.save()
+                
+                # Create a notification for the new lead; the writer merges it with
+                # the lead_assigned event queued by the post_save receiver
+                notification_writer.add(
+                    user=request.user,
+                    type='lead_assigned',
+                    message=f'New lead created: {lead.name}',
+                    lead=lead
+                )
             
             messages.success(request, f'Lead for {lead.name} created successfully!')
             return redirect('leads_list')
@@ -182,32 +246,19 @@ def process_biometric(request, biometric_id, action):
     Comprehensive biometric processing with status updates and notifications
     """
     try:
-        biometric = get_object_or_404(Biometric, id=biometric_id, user=request.user)
-        
-        # Track original status
-        original_status = biometric.status
+        biometric = get_object_or_404(
+            Biometric.objects.select_related('lead'), id=biometric_id, user=request.user
+        )
         
-        # Update status based on action
+        # Update status based on action; the associated lead follows the outcome
         if action == 'approve':
-            biometric.status = 'approved'
+            biometric_states.transition(biometric, 'approved')
         elif action == 'reject':
-            biometric.status = 'rejected'
-            biometric.rejection_reason = request.POST.get('rejection_reason', '')
-        
-        biometric.save()
-        
-        # Create notification
-        # Notification.objects.create(
-        #     user=request.user,
-        #     biometric=biometric,
-        #     message=f"Biometric status changed from {original_status} to {biometric.status}",
-        #     notification_type='biometric'
-        # )
-        
-        # Update associated lead if exists
-        if biometric.lead:
-            biometric.lead.status = 'approved' if action == 'approve' else 'rejected'
-            biometric.lead.save()
+            biometric_states.transition(
+                biometric, 'rejected', rejection_reason=request.POST.get('rejection_reason', '')
+            )
+        else:
+            raise InvalidTransition(f'Unknown action {action!r}')
         
         messages.success(request, f"Biometric {action}d successfully")
         return redirect('biometric_list')
@@ -224,6 +275,9 @@ def global_search(request):
     # Extract search parameters
     query = request.GET.get('query', '').strip()
     search_type = request.GET.get('type', '').strip()
+    match = request.GET.get('match', 'exact').strip()
+    if match not in SearchConfiguration.SEARCH_MODES:
+        match = 'exact'
     
     # Prepare advanced filters
     filters = {}
@@ -256,13 +310,23 @@ def global_search(request):
     elif search_type == 'biometric':
         models = ['biometric']
     
-    # Perform advanced search
+    # Perform advanced search; exact rows are merged, ordered and paginated in the
+    # database, fuzzy matches come back as a bounded list ranked by similarity
     try:
-        all_results = SearchConfiguration.advanced_search(
-            query=query, 
-            model=models, 
-            filters=filters
-        )
+        if match == 'fuzzy' and query:
+            all_results = SearchConfiguration.advanced_search(
+                query=query,
+                model=models,
+                filters=filters,
+                mode='fuzzy'
+            )
+        else:
+            all_results = SearchConfiguration.merged_search(
+                query=query, 
+                model=models, 
+                filters=filters
+            )
+            all_results.count()
     except Exception as e:
         messages.error(request, f"Search error: {str(e)}")
         all_results = []
@@ -283,19 +347,126 @@ def global_search(request):
     context = {
         'query': query,
         'type': search_type,
+        'match': match,
         'lead_status': lead_status,
         'lead_location': lead_location,
         'biometric_status': biometric_status,
         'biometric_location': biometric_location,
         'results': page_obj,
-        'total_results': len(all_results),
-        'is_paginated': len(all_results) > 10,
+        'total_results': paginator.count,
+        'is_paginated': paginator.num_pages > 1,
         'search_fields': SearchConfiguration.get_search_fields(),
         'filter_suggestions': filter_suggestions
     }
     
     return render(request, 'global_search_results.html', context)
 
+@login_required
+def search_export(request):
+    """
+    Stream every search match as NDJSON (default) or CSV
+
+    Accepts the same parameters as the search page plus 'format'. Rows are
+    read with chunked iterators and written as they arrive, so reports no
+    longer need to page through the search view.
+    """
+    query = request.GET.get('query', '').strip()
+    search_type = request.GET.get('type', '').strip()
+    match = request.GET.get('match', 'exact').strip()
+    export_format = request.GET.get('format', 'ndjson').strip()
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unsupported export format: {export_format}'}, status=400)
+
+    models = [search_type] if search_type in SearchConfiguration.FILTER_FIELDS else ['lead', 'biometric']
+    filters = {
+        key: value.strip() for key, value in request.GET.items()
+        if key.split('_', 1)[0] in SearchConfiguration.FILTER_FIELDS and value.strip()
+    }
+
+    rows = SearchConfiguration.export_rows(
+        query=query, model=models, filters=filters, mode=match, user=request.user
+    )
+    return streaming_export_response(
+        rows,
+        export_format,
+        f"search-export-{timezone.now():%Y%m%d-%H%M%S}",
+        columns=SearchConfiguration.export_columns(models)
+    )
+
+@staff_member_required
+def record_export(request, model_key):
+    """
+    Stream every lead or biometric as CSV (default) or NDJSON, in id order
+
+    Accepts 'status', 'created_from' and 'created_to' (YYYY-MM-DD) filters and
+    'after_id' to resume an interrupted download after the last id received.
+    Columns follow the model's import/export resource.
+    """
+    if model_key not in EXPORT_RESOURCES:
+        return JsonResponse({'error': f'Unsupported export model: {model_key}'}, status=404)
+    export_format = request.GET.get('format', 'csv').strip()
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unsupported export format: {export_format}'}, status=400)
+
+    try:
+        queryset = export_queryset(
+            model_key,
+            status=request.GET.get('status', '').strip(),
+            created_from=request.GET.get('created_from', '').strip(),
+            created_to=request.GET.get('created_to', '').strip(),
+            after_id=request.GET.get('after_id', '').strip()
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return streaming_export_response(
+        export_rows(model_key, queryset),
+        export_format,
+        f"{model_key}-export-{timezone.now():%Y%m%d-%H%M%S}",
+        columns=export_columns(model_key)
+    )
+
+@login_required
+def lead_phone_lookup(request):
+    """
+    Exact caller ID lookup against the normalized phone index
+    """
+    phone = request.GET.get('phone', '').strip()
+    digits = normalize_phone(phone)
+    if not digits:
+        return JsonResponse({'phone': phone, 'error': 'A phone number is required', 'leads': []}, status=400)
+
+    leads = Lead.objects.filter(phone_normalized=digits).values(
+        'id', 'name', 'email', 'phone', 'location', 'status', 'created_at'
+    )[:50]
+    return JsonResponse({
+        'phone': phone,
+        'normalized': digits,
+        'leads': [dict(lead, detail_url=f"/lead/{lead['id']}/") for lead in leads],
+        'error': None
+    })
+
+@login_required
+def search_suggest(request):
+    """
+    Prefix suggestions for the search box, answered from the in-memory typeahead index
+    """
+    prefix = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    suggestions = suggestion_index.search(prefix, limit) if prefix else []
+    return JsonResponse({'query': prefix, 'suggestions': suggestions})
+
+@staff_member_required
+def search_cache_stats(request):
+    """
+    Hit, miss and eviction statistics of this process's search result cache
+    """
+    return JsonResponse(search_result_cache.stats())
+
 @login_required
 def about(request):
     return render(request, 'about.html')
@@ -330,12 +501,13 @@ def user_details(request):
     """
     Comprehensive user details view with statistics and recent activities
     """
-    # Biometric status count
+    # Biometric status count, read from the per-user status counters
+    user_counts = counters.get_counts('biometric', user=request.user)
     biometric_status_count = {
-        'total': Biometric.objects.filter(user=request.user).count(),
-        'pending': Biometric.objects.filter(user=request.user, status='pending').count(),
-        'approved': Biometric.objects.filter(user=request.user, status='approved').count(),
-        'rejected': Biometric.objects.filter(user=request.user, status='rejected').count()
+        'total': user_counts['total'],
+        'pending': user_counts.get('pending', 0),
+        'approved': user_counts.get('approved', 0),
+        'rejected': user_counts.get('rejected', 0)
     }
 
     # Recent biometrics (last 30 days)
@@ -383,10 +555,17 @@ def approved_biometrics(request):
     leads = leads.order_by(sort_by)
     biometrics = biometrics.order_by(sort_by)
     
+    # Unfiltered totals come from the status counters instead of COUNT(*)
+    if location_filter or date_from or date_to:
+        total_leads = leads.count()
+        total_biometrics = biometrics.count()
+    else:
+        total_leads = counters.get_count('lead', 'approved')
+        total_biometrics = counters.get_count('biometric', 'approved')
+    
     # Pagination
-    from django.core.paginator import Paginator
-    paginator_leads = Paginator(leads, 10)
-    paginator_biometrics = Paginator(biometrics, 10)
+    paginator_leads = CountedPaginator(leads, 10, count=total_leads)
+    paginator_biometrics = CountedPaginator(biometrics, 10, count=total_biometrics)
     
     page_number = request.GET.get('page')
     leads_page = paginator_leads.get_page(page_number)
@@ -396,8 +575,8 @@ def approved_biometrics(request):
     context = {
         'leads': leads_page,
         'biometrics': biometrics_page,
-        'total_leads': leads.count(),
-        'total_biometrics': biometrics.count(),
+        'total_leads': total_leads,
+        'total_biometrics': total_biometrics,
         'unique_locations': set(list(leads.values_list('location', flat=True)) + 
                                 list(biometrics.values_list('location', flat=True))),
         'approval_trend': leads.annotate(
@@ -441,10 +620,17 @@ def rejected_biometrics(request):
     leads = leads.order_by(sort_by)
     biometrics = biometrics.order_by(sort_by)
     
+    # Unfiltered totals come from the status counters instead of COUNT(*)
+    if location_filter or date_from or date_to:
+        total_leads = leads.count()
+        total_biometrics = biometrics.count()
+    else:
+        total_leads = counters.get_count('lead', 'rejected')
+        total_biometrics = counters.get_count('biometric', 'rejected')
+    
     # Pagination
-    from django.core.paginator import Paginator
-    paginator_leads = Paginator(leads, 10)
-    paginator_biometrics = Paginator(biometrics, 10)
+    paginator_leads = CountedPaginator(leads, 10, count=total_leads)
+    paginator_biometrics = CountedPaginator(biometrics, 10, count=total_biometrics)
     
     page_number = request.GET.get('page')
     leads_page = paginator_leads.get_page(page_number)
@@ -454,8 +640,8 @@ def rejected_biometrics(request):
     context = {
         'leads': leads_page,
         'biometrics': biometrics_page,
-        'total_leads': leads.count(),
-        'total_biometrics': biometrics.count(),
+        'total_leads': total_leads,
+        'total_biometrics': total_biometrics,
         'unique_locations': set(list(leads.values_list('location', flat=True)) + 
                                 list(biometrics.values_list('location', flat=True))),
         'rejection_trend': leads.annotate(
@@ -490,24 +676,42 @@ def lead_history(request):
     if date_to:
         leads = leads.filter(created_at__date__lte=date_to)
 
+    # Without location or date filters the counts come from the per-user status counters
+    if location or date_from or date_to:
+        total_leads = leads.count()
+        approved_leads_count = leads.filter(status='approved').count()
+        rejected_leads_count = leads.filter(status='rejected').count()
+
+        # Status breakdown
+        status_breakdown = leads.values('status').annotate(
+            count=Count('id')
+        ).order_by('-count')
+    else:
+        user_counts = counters.get_counts('lead', user=request.user)
+        if status:
+            user_counts = {status: user_counts.get(status, 0)}
+        total_leads = sum(count for key, count in user_counts.items() if key != 'total')
+        approved_leads_count = user_counts.get('approved', 0)
+        rejected_leads_count = user_counts.get('rejected', 0)
+
+        # Status breakdown
+        status_breakdown = sorted(
+            (
+                {'status': key, 'count': count}
+                for key, count in user_counts.items()
+                if key != 'total' and count
+            ),
+            key=lambda row: -row['count']
+        )
+
     # Pagination
-    paginator = Paginator(leads, 10)  # 10 leads per page
+    paginator = CountedPaginator(leads, 10, count=total_leads)  # 10 leads per page
     page_number = request.GET.get('page', 1)
     
     try:
         page_obj = paginator.page(page_number)
     except (PageNotAnInteger, EmptyPage):
         page_obj = paginator.page(1)
-    
-    # Pre-calculate counts and breakdowns
-    total_leads = leads.count()
-    approved_leads_count = leads.filter(status='approved').count()
-    rejected_leads_count = leads.filter(status='rejected').count()
-
-    # Status breakdown
-    status_breakdown = leads.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
 
     # Location breakdown
     location_breakdown = leads.values('location').annotate(
@@ -549,53 +753,34 @@ def biometric_detail(request, biometric_id):
     biometric = get_object_or_404(Biometric, id=biometric_id)
     return render(request, 'biometric_detail.html', {'biometric': biometric})
 
+# Notifications shown in the header dropdown unless ?limit= says otherwise
+RECENT_NOTIFICATIONS_LIMIT = 10
+
 @login_required
 def notifications_list(request):
     """
-    Display user notifications with fallback for empty notifications and error handling
+    Display user notifications with error handling
+
+    This is a pure read: welcome notifications are seeded at sign-up, never here.
     """
+    if request.GET.get('recent'):
+        return recent_notifications(request)
+
     try:
-        # Fetch existing notifications
-        notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-        
-        # If no notifications, create some dummy notifications
-        if not notifications.exists():
-            dummy_notifications = [
-                {
-                    'type': 'system_alert',
-                    'message': 'Welcome to Biometric Leads! You have no active notifications yet.',
-                    'created_at': timezone.now(),
-                    'is_read': False
-                },
-                {
-                    'type': 'weekly_report',
-                    'message': 'Your weekly system overview will be available soon.',
-                    'created_at': timezone.now() - timedelta(days=1),
-                    'is_read': False
-                }
-            ]
-            
-            # Create dummy notifications for the current user
-            for dummy in dummy_notifications:
-                Notification.objects.create(
-                    user=request.user,
-                    type=dummy['type'],
-                    message=dummy['message'],
-                    is_read=dummy['is_read']
-                )
-            
-            # Refetch notifications
-            notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-        
-        # Pagination
-        paginator = Paginator(notifications, 10)  # Show 10 notifications per page
+        # Personal notifications merged with broadcasts, paginated in the database
+        notifications = NotificationFeed(
+            request.user,
+            personal_count=counters.get_counts('notification', user=request.user)['total']
+        )
+
+        paginator = CountedPaginator(notifications, 10, count=notifications.count())  # Show 10 notifications per page
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         
         context = {
             'notifications': page_obj,
             'total_notifications': notifications.count(),
-            'unread_notifications': notifications.filter(is_read=False).count(),
+            'unread_notifications': counters.unread_count(request.user),
             'error': None
         }
     
@@ -605,43 +790,43 @@ def notifications_list(request):
         logger = logging.getLogger(__name__)
         logger.error(f"Error loading notifications: {str(e)}")
         
-        # Create a system alert notification about the error
-        Notification.objects.create(
-            user=request.user,
-            type='system_alert',
-            message='Unable to load notifications. Please try again later.',
-            is_read=False
-        )
-        
-        # Prepare context with error notification
         context = {
             'notifications': [],
             'total_notifications': 0,
-            'unread_notifications': 1,
+            'unread_notifications': 0,
             'error': 'Unable to load notifications. Please try again later.'
         }
     
     return render(request, 'notifications/notifications_list.html', context)
 
+def recent_notifications(request):
+    """
+    Latest notifications and the unread count for the header dropdown, as JSON
+
+    One LIMIT query merging the (user, -created_at) index with the
+    broadcasts; the unread count comes from the cached per-user counter.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', RECENT_NOTIFICATIONS_LIMIT)), 1), 50)
+    except ValueError:
+        limit = RECENT_NOTIFICATIONS_LIMIT
+
+    notifications = NotificationFeed(request.user)[:limit]
+    return JsonResponse({
+        'notifications': [serialize_notification(notification) for notification in notifications],
+        'unread_count': counters.unread_count(request.user),
+        'error': None
+    })
+
 @login_required
 def get_unread_notifications_count(request):
     """
     Get count of unread notifications with error handling
+
+    Read-only: badge polling must never write, so an idle user simply gets 0.
     """
     try:
-        unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
-        
-        # If no notifications, create dummy system alert
-        if unread_count == 0:
-            Notification.objects.create(
-                user=request.user,
-                type='system_alert',
-                message='No new notifications. Stay tuned for updates!',
-                is_read=False
-            )
-            unread_count = 1
-        
-        return JsonResponse({'unread_count': unread_count, 'error': None})
+        return JsonResponse({'unread_count': counters.unread_count(request.user), 'error': None})
     
     except Exception as e:
         # Log the error
@@ -649,25 +834,84 @@ def get_unread_notifications_count(request):
         logger = logging.getLogger(__name__)
         logger.error(f"Error getting unread notifications count: {str(e)}")
         
-        # Create a system alert notification about the error
-        Notification.objects.create(
-            user=request.user,
-            type='system_alert',
-            message='Unable to load notifications. Please try again later.',
-            is_read=False
-        )
-        
         return JsonResponse({
-            'unread_count': 1,
+            'unread_count': 0,
             'error': 'Unable to load notifications. Please try again later.'
         })
 
+@login_required
+def notification_archive(request):
+    """
+    Browse notifications moved to the archive by the retention job
+    """
+    archived = ArchivedNotification.objects.filter(user=request.user)
+    notification_type = request.GET.get('type', '').strip()
+    if notification_type:
+        archived = archived.filter(type=notification_type)
+
+    # Cursor pagination keeps deep pages of a large archive cheap
+    page_obj = keyset_page(request, archived, 20)
+
+    context = {
+        'notifications': page_obj,
+        'type': notification_type,
+        'notification_types': Notification.NOTIFICATION_TYPES,
+    }
+    return render(request, 'notifications/archive.html', context)
+
+async def notification_stream(request):
+    """
+    Push unread counts and new notifications to the header badge over Server-Sent Events
+
+    Under an ASGI server every connection is a coroutine waiting on the
+    in-process broker, so no thread is held per client. Under WSGI an endless
+    response would pin a worker thread, so only the current count is sent and
+    the browser reconnects after NOTIFICATION_STREAM_WSGI_RETRY milliseconds.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    if isinstance(request, ASGIRequest):
+        events = notification_events(user.pk)
+    else:
+        count = await sync_to_async(counters.unread_count)(user)
+        events = [sse_event(
+            'unread_count',
+            {'unread_count': count},
+            retry=getattr(settings, 'NOTIFICATION_STREAM_WSGI_RETRY', 30000)
+        )]
+
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def mark_all_notifications_read(request):
     """
     Mark all user notifications as read
     """
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    # One UPDATE that also moves the user's read/unread counters, plus read
+    # markers for the broadcasts the user had not read yet
+    counters.update_status(Notification.objects.filter(user=request.user), True)
+    mark_broadcasts_read(request.user)
+    return redirect('notifications_list')
+
+@login_required
+def mark_broadcast_read(request, broadcast_id):
+    """
+    Mark a broadcast as read for the current user
+    """
+    broadcast = get_object_or_404(BroadcastNotification, id=broadcast_id)
+    mark_broadcasts_read(request.user, [broadcast.id])
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'status': 'success',
+            'message': 'Notification marked as read',
+            'unread_count': counters.unread_count(request.user)
+        })
     return redirect('notifications_list')
 
 @login_required
@@ -680,16 +924,16 @@ def mark_notification_read(request, notification_id):
     # If it's an AJAX request, return JSON response
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         notification.is_read = True
-        notification.save()
+        notification.save(update_fields=['is_read'])
         return JsonResponse({
             'status': 'success',
             'message': 'Notification marked as read',
-            'unread_count': Notification.objects.filter(user=request.user, is_read=False).count()
+            'unread_count': counters.unread_count(request.user)
         })
     
     # Regular request
     notification.is_read = True
-    notification.save()
+    notification.save(update_fields=['is_read'])
     
     # Redirect based on notification type
     if notification.lead: